@@ -1,21 +1,111 @@
 import sys
 import os
 import json
+import contextvars
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 from crewai import Agent, Task, Crew,LLM,Process
+from crewai.tasks.task_output import TaskOutput
+from agent.llm_config import AGENT_LLM_DEFAULTS, create_agent_llms
 from tools.company_intelligence_tool import CompanyIntelligenceTool
 from tools.market_research_tool import MarketResearchTool
+from services.company_index_service import CompanyIndexService
+from services.market_report_index import company_query, format_chunks
+from agent.output_models import CompanyInsight, OutreachLead, as_item_list, validate_item, example_json
+from utils.json_utils import parse_json_tolerant
+from utils.envutils import EnvUtils
+from utils.company_keys import normalize_company_name
+from utils.context_compaction import ContextCompactor, estimate_text_tokens
+from utils.deadline import check_deadline, current_deadline
+from utils.metrics import CONTEXT_TOKENS_SAVED, OUTPUT_REASKS, observe_stage, record_token_usage
+from utils.llm_usage import track_llm_usage
 class ResearchCrew:
-    def __init__(self):
-        #self.task_callback = task_callback
+    def __init__(self, task_callback=None, llm=None, company_service=None, market_service=None,
+                 company_index=None, llms=None):
+        """
+        Args:
+            task_callback (callable, optional): Receives progress events (dicts) as each task finishes
+            llm (LLM, optional): One LLM for every agent, overriding the per-agent settings
+            company_service (CompanyIntelligenceService, optional): Shared service for the company tool
+            market_service (MarketResearchService, optional): Shared service for the market tool
+            company_index (CompanyIndexService, optional): Shared index of analysed companies
+            llms (dict, optional): Shared per-agent LLMs from create_agent_llms; created when omitted
+        """
+        self.task_callback = task_callback
+        self.company_service = company_service
+        self.market_service = market_service
+
+        # Market research only needs industry/product, so it can run while
+        # the company research task is still going
+        config = EnvUtils().get_config({
+            'RESEARCH_PREFETCH_MARKET': 'true',
+            'RESEARCH_OUTREACH_FANOUT': 'true',
+            'RESEARCH_OUTREACH_CONCURRENCY': 4,
+            'RESEARCH_REASK_ATTEMPTS': 1,
+            'COMPANY_INDEX_ENABLED': 'true',
+            'CONTEXT_COMPACTION_ENABLED': 'true',
+            'CONTEXT_BUDGET_MARKET_TRENDS': 3000,
+            'CONTEXT_BUDGET_OUTREACH': 4000,
+            'CONTEXT_BUDGET_OUTREACH_COMPANY': 800,
+            'MARKET_RETRIEVAL_ENABLED': 'true',
+            'MARKET_RETRIEVAL_TOP_K': 3,
+            'MARKET_CHUNK_WORDS': 120
+        })
+        self.prefetch_market_research = str(config['RESEARCH_PREFETCH_MARKET']).lower() == 'true'
+
+        # Write each company's email in its own LLM call instead of one call
+        # producing the whole array
+        self.outreach_fanout = str(config['RESEARCH_OUTREACH_FANOUT']).lower() == 'true'
+        self.outreach_concurrency = int(config['RESEARCH_OUTREACH_CONCURRENCY'])
+
+        # Invalid task output is repaired locally first; only what is still
+        # invalid is sent back to the LLM, at most this many times per item
+        self.reask_attempts = int(config['RESEARCH_REASK_ATTEMPTS'])
+
+        # Token usage of each task: the run's usage since the previous task finished
+        self._run_usage = {}
+        self._usage_snapshot = {}
+        self._task_usage = {}
+
+        # Companies returned by the company search during the current run
+        self.companies_found = []
+
+        # Set when the run was cut short by its request deadline and the
+        # leads returned are only those finished in time
+        self.partial = False
+
+        # Companies analysed recently are reused from the index; only new or
+        # stale ones are sent to the company research agent
+        if company_index is None and str(config['COMPANY_INDEX_ENABLED']).lower() == 'true':
+            company_index = CompanyIndexService()
+        self.company_index = company_index
+        self._known_companies = {}
+        self._pending_companies = {}
+
+        # Upstream outputs are compacted to a token budget per task before
+        # they are injected as context; 0 disables the budget for a task
+        self.context_budgets = {
+            "market_trends": int(config['CONTEXT_BUDGET_MARKET_TRENDS']),
+            "outreach": int(config['CONTEXT_BUDGET_OUTREACH']),
+            "outreach_company": int(config['CONTEXT_BUDGET_OUTREACH_COMPANY'])
+        } if str(config['CONTEXT_COMPACTION_ENABLED']).lower() == 'true' else None
+        self._context_tokens = {}
+        self._context_lock = threading.Lock()
+
+        # Market trends and outreach get the report chunks that match each
+        # company (BM25 over the report) instead of the whole report
+        self.market_retrieval = str(config['MARKET_RETRIEVAL_ENABLED']).lower() == 'true'
+        self.market_top_k = int(config['MARKET_RETRIEVAL_TOP_K'])
+        self.market_chunk_words = int(config['MARKET_CHUNK_WORDS'])
         
-        # Initialize LLM
-        self.llm = LLM(
-            model="gpt-4",
-            temperature=0.8,
-            max_tokens=5000
+        # Each agent has its own model settings (see agent/llm_config.py)
+        self.llms = llms or (
+            {agent: llm for agent in AGENT_LLM_DEFAULTS} if llm else create_agent_llms()
         )
         
         # Initialize everything
@@ -24,21 +114,80 @@ class ResearchCrew:
 
     def _on_task_complete(self, task_output) -> None:
         """Task completion callback handling both string outputs and task objects"""
+        agent_name = getattr(task_output, 'agent', None)
+        if self.company_index and agent_name == self.company_research_agent.role:
+            self._update_company_index(task_output)
+        if self.context_budgets:
+            self._compact_downstream_context(agent_name)
+
         if self.task_callback:
             if isinstance(task_output, str):
                 # If it's a direct string output
-                self.task_callback("Task completed with output")
-            else:
-                # If it's a task object
-                agent_name = getattr(task_output, 'agent', None)
-                print(f"Agent name: {agent_name}")
-                if agent_name and hasattr(agent_name, 'role'):
-                    self.task_callback(f"{agent_name.role} has completed their task")
-                else:
-                    self.task_callback(f"{agent_name} has completed their task")
+                self.task_callback({"event": "task_completed", "stage": None, "output": task_output})
+                return
+
+            # If it's a task output object
+            agent_name = getattr(task_output, 'agent', None)
+            if agent_name and hasattr(agent_name, 'role'):
+                agent_name = agent_name.role
+            stage = self._stage_for_agent(agent_name)
+            self.task_callback({
+                "event": "task_completed",
+                "stage": stage,
+                "agent": agent_name,
+                "output": getattr(task_output, 'raw', str(task_output))
+            })
+
+            # Emit outreach emails one by one so clients can render leads early
+            if stage == "outreach":
+                try:
+                    leads = as_item_list(parse_json_tolerant(task_output.raw))
+                except ValueError:
+                    return
+                for lead in leads:
+                    self.task_callback({"event": "lead", "stage": stage, "lead": lead})
+
+    def _kickoff(self, crew: Crew, inputs: dict = None):
+        """Run a sequential crew, attributing the LLM usage of each task to its agent"""
+        with track_llm_usage() as usage:
+            self._run_usage, self._usage_snapshot, self._task_usage = usage, dict(usage), {}
+            return crew.kickoff(inputs=inputs)
+
+    def _track_task_usage(self, task_output) -> None:
+        """
+        Task callback of sequential crews: the run's usage since the previous
+        task belongs to the agent of the task that just finished
+        """
+        usage, previous = dict(self._run_usage), self._usage_snapshot
+        self._task_usage[task_output.agent] = {name: value - previous.get(name, 0) for name, value in usage.items()}
+        self._usage_snapshot = usage
+        self._on_task_complete(task_output)
+
+    def _record_run_metrics(self, tasks) -> None:
+        """Report task latencies and per-agent token usage and cost after a crew run"""
+        for task in tasks:
+            role = task.agent.role
+            observe_stage("crew_task", self._stage_for_agent(role) or role, task.execution_duration)
+            record_token_usage(
+                role,
+                getattr(task.agent.llm, 'model', str(task.agent.llm)),
+                self._task_usage.get(role, {}),
+                task.execution_duration
+            )
+
+    def _stage_for_agent(self, agent_name):
+        """Map an agent role to the pipeline stage name used in progress events"""
+        stages = {
+            self.company_research_agent.role: "company_research",
+            self.market_trends_agent.role: "market_trends",
+            self.outreach_agent.role: "outreach"
+        }
+        return stages.get(agent_name)
 
     def _initialize_agents(self) -> None:
         """Initialize all agents"""
+        self.company_tool = self._create_company_tool()
+
         # Supervisor Agent
         self.supervisor_agent = Agent(
             role="Research Supervisor",
@@ -48,7 +197,7 @@ class ResearchCrew:
                 "complex research and outreach campaigns. You ensure all team members "
                 "work efficiently and maintain high quality standards."
             ),
-            llm=self.llm,
+            llm=self.llms["supervisor"],
             allow_delegation=True,
             verbose=True
         )
@@ -63,10 +212,20 @@ class ResearchCrew:
                 "lies in gathering and analyzing company information from multiple "
                 "sources to provide actionable insights."
             ),
-            llm=self.llm,
+            llm=self.llms["company_research"],
             allow_delegation=False,
             verbose=True,
-            tools=[CompanyIntelligenceTool()]
+            tools=[self.company_tool]
+        )
+
+        market_options = {
+            "companies": lambda: list(self.companies_found),
+            "top_k": self.market_top_k,
+            "chunk_words": self.market_chunk_words
+        } if self.market_retrieval else {}
+        self.market_research_tool = (
+            MarketResearchTool(service=self.market_service, **market_options) if self.market_service
+            else MarketResearchTool(**market_options)
         )
 
         # Market Research Agent
@@ -78,14 +237,124 @@ class ResearchCrew:
                 "of industry trends and market dynamics. Your expertise lies in "
                 "identifying emerging patterns and market opportunities."
             ),
-            llm=self.llm,
+            llm=self.llms["market_trends"],
             allow_delegation=False,
             verbose=True,
-            tools=[MarketResearchTool()]
+            tools=[self.market_research_tool]
         )
 
         # Outreach Agent
-        self.outreach_agent = Agent(
+        self.outreach_agent = self._create_outreach_agent()
+
+    def _create_company_tool(self) -> CompanyIntelligenceTool:
+        options = {
+            "on_company": self._on_company_found,
+            "company_filter": self._filter_known_companies if self.company_index else None
+        }
+        if self.company_service:
+            return CompanyIntelligenceTool(service=self.company_service, **options)
+        return CompanyIntelligenceTool(**options)
+
+    def _on_company_found(self, company) -> None:
+        """Collect each company and emit it as soon as the search streams it in"""
+        # A search repeated within the run reports the same companies again
+        if company in self.companies_found:
+            return
+        self.companies_found.append(company)
+        if self.task_callback:
+            self.task_callback({"event": "company_found", "stage": "company_research", "company": company})
+
+    def _all_companies_known(self, inputs: dict) -> bool:
+        """
+        Run the company search up front and check it against the index
+
+        The result is cached, so the agent's own tool call does not search again.
+        Returns True if every company found has a fresh analysis.
+        """
+        company_stage = inputs.get('company_stage')
+        try:
+            result = json.loads(self.company_tool.service.get_company_intelligence(
+                industry=inputs.get('industry'),
+                company_stage=company_stage.lower() if company_stage else None,
+                geography=inputs.get('geography'),
+                funding_stage=inputs.get('funding_stage'),
+                on_company=self._on_company_found
+            ))
+        except Exception as e:
+            print(f"Company search before research failed: {str(e)}")
+            return False
+        companies = result.get("companies") or []
+        return bool(companies) and not self._filter_known_companies(companies)
+
+    def _filter_known_companies(self, companies: list) -> list:
+        """Return the companies that need analysis; fresh analyses are kept for the run"""
+        pending = []
+        for company in companies:
+            if not isinstance(company, dict):
+                pending.append(company)
+                continue
+            key = normalize_company_name(company.get("name") or company.get("company_name"))
+            if key in self._known_companies:
+                continue
+            if key not in self._pending_companies:
+                entry = self.company_index.lookup(company)
+                if entry and entry["status"] == CompanyIndexService.FRESH:
+                    self._known_companies[key] = entry["analysis"]
+                    continue
+                self._pending_companies[key] = company
+            pending.append(company)
+        return pending
+
+    def _update_company_index(self, task_output) -> None:
+        """
+        Store the agent's analysis of each newly researched company and add the
+        stored analyses of known companies to the task output, so later tasks
+        see every company
+        """
+        raw = task_output.raw or ""
+        for company, analysis in self._split_by_company(raw, list(self._pending_companies.values())):
+            self.company_index.save_analysis(company, analysis)
+        if self._known_companies:
+            known = "\n\n".join(self._known_companies.values())
+            task_output.raw = f"{raw.rstrip()}\n\n{known}" if raw.strip() else known
+
+    @staticmethod
+    def _split_by_company(text: str, companies: list) -> list:
+        """
+        Cut research text into per-company sections
+
+        A section starts at the line that introduces the company (its name at
+        the start of a line, optionally after numbering, markdown or
+        "Company Name:") and runs to the next company's section. Companies
+        without such a line are left out.
+
+        Returns:
+            list: (company, section text) pairs
+        """
+        starts = []
+        for company in companies:
+            name = (company.get("name") or company.get("company_name")) if isinstance(company, dict) else None
+            if not name:
+                continue
+            match = re.search(
+                rf"^[\s#*>\-\d.)]*(?:company(?: name)?\s*:\s*)?[\s*_]*{re.escape(name)}",
+                text, re.IGNORECASE | re.MULTILINE
+            )
+            if match:
+                starts.append((match.start(), company))
+        starts.sort(key=lambda start: start[0])
+
+        sections = []
+        for index, (start, company) in enumerate(starts):
+            end = starts[index + 1][0] if index + 1 < len(starts) else len(text)
+            section = text[start:end].strip()
+            if section:
+                sections.append((company, section))
+        return sections
+
+    def _create_outreach_agent(self) -> Agent:
+        """Create an Outreach Specialist; fan-out runs need one per concurrent call"""
+        return Agent(
             role="Outreach Specialist",
             goal="Create compelling, personalized outreach emails",
             backstory=(
@@ -93,7 +362,7 @@ class ResearchCrew:
                 "personalized, engaging outreach messages. You combine company research "
                 "and market insights to create compelling value propositions."
             ),
-            llm=self.llm,
+            llm=self.llms["outreach"],
             allow_delegation=False,
             verbose=True
         )
@@ -213,42 +482,90 @@ class ResearchCrew:
     agent=self.outreach_agent
 )
 
+        # Hold the compacted context of the later tasks; they are never executed
+        self._compacted_context = {
+            stage: Task(
+                description=f"Compacted context for the {stage} task",
+                expected_output="Context"
+            )
+            for stage in ("market_trends", "outreach")
+        }
+
         # Supervisor Task is not needed as the supervisor agent will manage tasks automatically in hierarchical process
         # self.supervisor_task = Task(...
 
     def execute_research(self, inputs: dict) -> dict:
-        """Execute the complete research and outreach process"""
+        """
+        Execute the complete research and outreach process
+
+        Runs under the caller's request deadline, if any. When the deadline
+        passes, in-flight calls are cut off, the leads finished so far are
+        returned and self.partial is set.
+        """
+        self.companies_found = []
+        self._known_companies, self._pending_companies = {}, {}
+        self.partial = False
         try:
+            # A job that waited in the queue past its deadline does no work
+            check_deadline("Research run")
+
             # Prepare inputs with optional product info
             research_inputs = inputs.copy()
             product = inputs.get('product', '')
             research_inputs['product_info'] = f"Product/Technology focus: {product}\n" if product else ""
+
+            # Start the market research tool call alongside company research
+            self.market_research_tool.clear_prefetched()
+            if self.prefetch_market_research:
+                self.market_research_tool.prefetch(inputs.get('industry'), product)
             
             # Setup task dependencies
-            self.market_trends_task.context = [self.company_research_task]
-            self.outreach_task.context = [self.company_research_task, self.market_trends_task]
+            if self.context_budgets:
+                # Outputs of the previous run must not be compacted into this one
+                for task in [self.company_research_task, self.market_trends_task,
+                             *self._compacted_context.values()]:
+                    task.output = None
+                self._context_tokens = {}
+                self.market_trends_task.context = [self._compacted_context["market_trends"]]
+                self.outreach_task.context = [self._compacted_context["outreach"]]
+            else:
+                self.market_trends_task.context = [self.company_research_task]
+                self.outreach_task.context = [self.company_research_task, self.market_trends_task]
             
+            # In fan-out mode outreach runs per company after the crew finishes
+            agents = [self.company_research_agent, self.market_trends_agent]
+            tasks = [self.company_research_task, self.market_trends_task]
+
+            # When every company found was analysed recently, the stored
+            # analyses stand in for the company research task
+            if self.company_index and self._all_companies_known(inputs):
+                print(f"All {len(self._known_companies)} companies analysed recently, skipping company research")
+                self.company_research_task.output = TaskOutput(
+                    description=self.company_research_task.description,
+                    raw="",
+                    agent=self.company_research_agent.role
+                )
+                self._on_task_complete(self.company_research_task.output)
+                agents, tasks = agents[1:], tasks[1:]
+            if not self.outreach_fanout:
+                agents.append(self.outreach_agent)
+                tasks.append(self.outreach_task)
+
             # Create the crew with hierarchical process
             research_crew = Crew(
-                agents=[
-                    self.company_research_agent,
-                    self.market_trends_agent,
-                    self.outreach_agent
-                ],
-                tasks=[
-                    self.company_research_task,
-                    self.market_trends_task,
-                    self.outreach_task
-                ],
+                agents=agents,
+                tasks=tasks,
                   # Set supervisor as manager
                 verbose=True,
                 process=Process.sequential,
-                memory=False
+                memory=False,
+                task_callback=self._track_task_usage
             )
 
             # Execute the process
             print("Starting research process...")
-            results = research_crew.kickoff(inputs=research_inputs)
+            results = self._kickoff(research_crew, research_inputs)
+            self._record_run_metrics(tasks)
             #print(f"Raw Output: {results.raw}")
             #if results.json_dict:
                  #print(f"JSON Output: {json.dumps(results.json_dict, indent=2)}")
@@ -263,21 +580,347 @@ class ResearchCrew:
             #print("Results Dir:", dir(results))
             #json_results = json.loads(str(results))
             #tasks_output = results.get('tasks_output', [])
-            
+
+            if self.outreach_fanout:
+                leads = self._run_outreach_fanout(research_inputs)
+            else:
+                leads = json.dumps(self._validated_items(results.raw, OutreachLead, "outreach"), indent=2)
+            if self.context_budgets:
+                self._report_context_compaction()
+
             print("Returning Results")
-            return results.raw
+            return leads
 
         except Exception as e:
+            # Agents wrap or retry failed calls, so check the deadline itself
+            deadline = current_deadline()
+            if deadline and deadline.expired:
+                print(f"Research deadline of {deadline.seconds:g}s passed, returning no leads: {str(e)}")
+                self.partial = True
+                return "[]"
             print(f"An error occurred during research: {str(e)}")
             raise
 
+    def _run_outreach_fanout(self, research_inputs: dict) -> str:
+        """
+        Write outreach emails per company in parallel and merge them into the
+        JSON array the single outreach task would have produced
+        """
+        try:
+            company_insights = self._validated_items(
+                self.market_trends_task.output.raw, CompanyInsight, "market_trends"
+            )
+        except ValueError as e:
+            print(f"Market trends output could not be parsed: {str(e)}")
+            company_insights = []
+
+        # Without a per-company breakdown, fall back to the single outreach task
+        if not company_insights:
+            print("Market trends output has no per-company entries, running single outreach task")
+            outreach_crew = Crew(
+                agents=[self.outreach_agent],
+                tasks=[self.outreach_task],
+                verbose=True,
+                process=Process.sequential,
+                memory=False,
+                task_callback=self._track_task_usage
+            )
+            output = self._kickoff(outreach_crew, research_inputs)
+            self._record_run_metrics([self.outreach_task])
+            return json.dumps(self._validated_items(output.raw, OutreachLead, "outreach"), indent=2)
+
+        research_by_company = self._company_research_context(
+            self.company_research_task.output.raw, company_insights
+        )
+        market_by_company = self._market_context(research_inputs, company_insights)
+        print(f"Writing outreach emails for {len(company_insights)} companies...")
+        executor = ThreadPoolExecutor(max_workers=self.outreach_concurrency, thread_name_prefix="outreach")
+        # Copy the context so calls keep the request's rate limiter priority and deadline
+        futures = [
+            executor.submit(
+                contextvars.copy_context().run,
+                self._write_company_email, research_by_company[insight['company_name']], insight,
+                market_by_company[insight['company_name']]
+            )
+            for insight in company_insights
+        ]
+        deadline = current_deadline()
+        done, _ = wait(futures, timeout=deadline.remaining() if deadline else None)
+        # Emails not started yet are dropped. Running ones fail at the deadline
+        # on their own (call timeouts are cut to it); they are waited for so
+        # they cannot report into the crew's next run.
+        executor.shutdown(wait=True, cancel_futures=True)
+
+        leads = [future.result() for future in futures if future in done]
+        leads = [lead for lead in leads if lead]
+        if deadline and deadline.expired and len(leads) < len(company_insights):
+            print(f"Research deadline passed, returning {len(leads)} of {len(company_insights)} leads")
+            self.partial = True
+        return json.dumps(leads, indent=2)
+
+    def _compact_downstream_context(self, finished_agent: str) -> None:
+        """Compact the outputs a finished task feeds into the next one"""
+        if finished_agent == self.company_research_agent.role:
+            stage, upstream = "market_trends", [self.company_research_task]
+        elif finished_agent == self.market_trends_agent.role:
+            stage, upstream = "outreach", [self.company_research_task, self.market_trends_task]
+        else:
+            return
+        context = self._compact_context(
+            stage, [task.output.raw for task in upstream if task.output is not None]
+        )
+        self._compacted_context[stage].output = TaskOutput(
+            description=self._compacted_context[stage].description,
+            raw=context,
+            agent="Context Compaction"
+        )
+
+    def _company_research_context(self, company_research: str, company_insights: list) -> dict:
+        """
+        Research text for each company's outreach email: only that company's
+        section, compacted, instead of the whole research output
+        """
+        names = [insight['company_name'] for insight in company_insights]
+        if not self.context_budgets:
+            return {name: company_research for name in names}
+        sections = {
+            company["name"]: section
+            for company, section in self._split_by_company(company_research, [{"name": name} for name in names])
+        }
+        return {
+            name: self._compact_context(
+                "outreach_company", [sections.get(name, company_research)], original=company_research
+            )
+            for name in names
+        }
+
+    def _market_context(self, research_inputs: dict, company_insights: list) -> dict:
+        """Market report excerpts matching each company, for its outreach email"""
+        names = [insight['company_name'] for insight in company_insights]
+        if not self.market_retrieval:
+            return {name: "" for name in names}
+        try:
+            report = self.market_research_tool.get_report(
+                research_inputs.get('industry'), research_inputs.get('product')
+            )
+        except Exception as e:
+            print(f"Market report unavailable for outreach: {str(e)}")
+            return {name: "" for name in names}
+
+        companies = {
+            normalize_company_name(company.get("name") or company.get("company_name")): company
+            for company in self.companies_found if isinstance(company, dict)
+        }
+        excerpts = {}
+        for insight in company_insights:
+            company = companies.get(normalize_company_name(insight['company_name']))
+            # Companies the search did not return are matched on their market insights
+            query = company_query(company) if company else ""
+            query = query or " ".join([insight.get('business_focus', ''), insight.get('matched_opportunities', '')])
+            excerpts[insight['company_name']] = format_chunks(
+                self.market_research_tool.search_report(report, query)
+            ) if query.strip() else ""
+        return excerpts
+
+    def _compact_context(self, stage: str, texts: list, original: str = None) -> str:
+        """
+        Compact texts to the stage's token budget and record the tokens saved
+
+        Args:
+            stage (str): Budget name
+            texts (list): Upstream outputs
+            original (str, optional): What the prompt would carry without
+                                      compaction, when that is more than texts
+
+        Returns:
+            str: Compacted context
+        """
+        context, tokens_before, tokens_after = ContextCompactor(self.context_budgets[stage]).compact(texts)
+        if original is not None:
+            tokens_before = estimate_text_tokens(original)
+        with self._context_lock:
+            before, after = self._context_tokens.get(stage, (0, 0))
+            self._context_tokens[stage] = (before + tokens_before, after + tokens_after)
+        CONTEXT_TOKENS_SAVED.labels(stage).inc(max(tokens_before - tokens_after, 0))
+        return context
+
+    def _report_context_compaction(self) -> None:
+        """Log and emit the context tokens saved in this run"""
+        with self._context_lock:
+            stages = {
+                stage: {"tokens_before": before, "tokens_after": after, "tokens_saved": before - after}
+                for stage, (before, after) in self._context_tokens.items()
+            }
+        saved = sum(stage["tokens_saved"] for stage in stages.values())
+        print(f"Context compaction saved ~{saved} prompt tokens")
+        if self.task_callback:
+            self.task_callback({"event": "context_compaction", "tokens_saved": saved, "stages": stages})
+
+    def _write_company_email(self, company_research: str, company_insight: dict, market_excerpts: str = ""):
+        """Generate one company's outreach email; returns None if it fails"""
+        company_name = company_insight['company_name']
+        agent = self._create_outreach_agent()
+        market_section = (
+            f"Relevant market research for {company_name}:\n{market_excerpts}\n\n" if market_excerpts else ""
+        )
+        task = Task(
+            description=(
+                f"Write a personalized outreach email for {company_name} following these rules:\n"
+                "1. The entry must contain: company_name, website, headquarters, funding_status, email_subject, and email_body\n"
+                "2. Email subject should be brief, focused on growth and technology adoption\n"
+                "3. Email body must:\n"
+                f"   - Start with 'Dear {company_name}'\n"
+                "   - Be between 50-125 words\n"
+                "   - Include company's market position and specific technology benefits\n"
+                "   - Mention growth potential and competitive advantages\n"
+                "4. Funding status should be in format: 'Series X' or 'IPO'\n"
+                "5. Website should be in format: 'www.company.com'\n"
+                "6. Headquarters should include city and country\n\n"
+                f"Company research (use only the part about {company_name}):\n{company_research}\n\n"
+                f"Market insights for {company_name}:\n{json.dumps(company_insight, indent=2)}\n\n"
+                f"{market_section}"
+                "Return ONLY a JSON object with this exact structure:\n"
+                "{\n"
+                '  "company_name": "Example Corp",\n'
+                '  "website": "www.example.com",\n'
+                '  "headquarters": "City, Country",\n'
+                '  "funding_status": "Series A",\n'
+                '  "email_subject": "Subject line here",\n'
+                '  "email_body": "Dear Example Corp, customized email content here..."\n'
+                "}"
+            ),
+            expected_output=(
+                "A JSON object with:\n"
+                "- company_name (string)\n"
+                "- website (string in www format)\n"
+                "- headquarters (string as City, Country)\n"
+                "- funding_status (string as Series X or IPO)\n"
+                "- email_subject (string)\n"
+                "- email_body (string, 50-125 words)"
+            ),
+            agent=agent
+        )
+        try:
+            # No inputs: the description is already complete and contains JSON braces.
+            # Emails are written concurrently, so each counts its own usage.
+            with track_llm_usage() as usage:
+                output = Crew(
+                    agents=[agent],
+                    tasks=[task],
+                    verbose=True,
+                    process=Process.sequential,
+                    memory=False,
+                    task_callback=self._on_task_complete
+                ).kickoff()
+            observe_stage("crew_task", "outreach", task.execution_duration)
+            record_token_usage(
+                agent.role,
+                getattr(agent.llm, 'model', str(agent.llm)),
+                usage,
+                task.execution_duration
+            )
+            leads = self._validated_items(output.raw, OutreachLead, "outreach")
+            if not leads:
+                raise ValueError("Outreach output has no valid lead")
+            return leads[0]
+        except Exception as e:
+            print(f"Outreach email for {company_name} failed: {str(e)}")
+            if self.task_callback:
+                self.task_callback({
+                    "event": "lead_failed",
+                    "stage": "outreach",
+                    "company_name": company_name,
+                    "error": str(e)
+                })
+            return None
+
+    def _validated_items(self, raw_output: str, model, stage: str) -> list:
+        """
+        Parse and validate a task's JSON output item by item
+
+        Defects are repaired locally where possible. If the output still cannot
+        be parsed it is sent back to the LLM once for correction; otherwise only
+        the items that fail validation are, one at a time. Items that stay
+        invalid are dropped.
+
+        Args:
+            raw_output (str): Raw task output
+            model (type): Output model for each item
+            stage (str): Pipeline stage, for logs and metrics
+
+        Returns:
+            list: Validated items as dicts, in output order
+
+        Raises:
+            ValueError: If the output cannot be parsed even after correction
+        """
+        for attempt in range(self.reask_attempts + 1):
+            try:
+                items = as_item_list(parse_json_tolerant(raw_output))
+                break
+            except ValueError as e:
+                if attempt == self.reask_attempts:
+                    raise
+                print(f"{stage} output is not valid JSON, asking for a corrected version: {str(e)}")
+                raw_output = self._reask(
+                    stage, raw_output, str(e),
+                    f"a JSON array of objects, each like:\n{example_json(model)}"
+                )
+
+        validated = []
+        for item in items:
+            result, error = validate_item(item, model)
+            for _ in range(self.reask_attempts):
+                if result is not None:
+                    break
+                print(f"{stage} item is invalid, asking for a corrected version: {error}")
+                try:
+                    corrected = parse_json_tolerant(self._reask(
+                        stage, json.dumps(item, indent=2), error,
+                        f"a single JSON object like:\n{example_json(model)}"
+                    ))
+                    result, error = validate_item(corrected, model)
+                except ValueError as e:
+                    error = str(e)
+            if result is None:
+                print(f"Dropping invalid {stage} item: {error}")
+                continue
+            validated.append(result.model_dump())
+        return validated
+
+    def _reask(self, stage: str, raw_output: str, error: str, expected: str) -> str:
+        """Ask the LLM to correct one invalid output; a single call without tools or task context"""
+        OUTPUT_REASKS.labels(stage).inc()
+        llm = self.llms["repair"]
+        started = time.time()
+        with track_llm_usage() as usage:
+            corrected = llm.call([
+                {
+                    "role": "system",
+                    "content": "You correct malformed JSON. Respond with ONLY the corrected JSON, no explanation."
+                },
+                {
+                    "role": "user",
+                    "content": (
+                        f"The following output should be {expected}\n\n"
+                        f"It is invalid: {error}\n\n"
+                        f"Output:\n{raw_output}\n\n"
+                        "Keep every value that is already present and fill missing fields from the "
+                        "rest of the output where possible. Return ONLY the corrected JSON."
+                    )
+                }
+            ])
+        record_token_usage("JSON Repair", llm.model, usage, time.time() - started)
+        return corrected
+
+
 # Example usage for local testing
 def example_task_callback(message):
     print(f"\n{message}")
 
 def main():
     """Main function to test the research functionality"""
-    crew = ResearchCrew()
+    crew = ResearchCrew(task_callback=example_task_callback)
 
     # Test inputs
     test_inputs = {
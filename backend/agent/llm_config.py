@@ -0,0 +1,67 @@
+from typing import Any, Dict
+import sys
+import os
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+from agent.research_llm import ResearchLLM
+from utils.envutils import EnvUtils
+
+# Structured steps (searching, JSON analysis, JSON repair) run on a fast model
+# with a tight completion budget; the slow model is kept for outreach copy.
+# "repair" is the model asked to correct invalid task output.
+AGENT_LLM_DEFAULTS = {
+    "supervisor": {"model": "gpt-4o-mini", "temperature": 0.2, "max_tokens": 1000},
+    "company_research": {"model": "gpt-4o-mini", "temperature": 0.2, "max_tokens": 2000},
+    "market_trends": {"model": "gpt-4o-mini", "temperature": 0.3, "max_tokens": 2000},
+    "outreach": {"model": "gpt-4", "temperature": 0.8, "max_tokens": 2000},
+    "repair": {"model": "gpt-4o-mini", "temperature": 0.0, "max_tokens": 2000}
+}
+
+
+def agent_llm_config() -> Dict[str, Dict[str, Any]]:
+    """
+    Model settings per agent
+
+    Each agent reads LLM_<AGENT>_MODEL, LLM_<AGENT>_TEMPERATURE and
+    LLM_<AGENT>_MAX_TOKENS, e.g. LLM_OUTREACH_MODEL=gpt-4o. LLM_MODEL, when
+    set, replaces every default model, for running all agents on one model.
+    LLM_TIMEOUT_SECONDS bounds every call.
+
+    Returns:
+        dict: Agent name -> {"model", "temperature", "max_tokens", "timeout"}
+    """
+    env_utils = EnvUtils()
+    shared = env_utils.get_config({'LLM_MODEL': None, 'LLM_TIMEOUT_SECONDS': 120})
+    default_model = shared['LLM_MODEL']
+    settings = {}
+    for agent, defaults in AGENT_LLM_DEFAULTS.items():
+        prefix = f"LLM_{agent.upper()}"
+        config = env_utils.get_config({
+            f'{prefix}_MODEL': default_model or defaults["model"],
+            f'{prefix}_TEMPERATURE': defaults["temperature"],
+            f'{prefix}_MAX_TOKENS': defaults["max_tokens"]
+        })
+        settings[agent] = {
+            "model": config[f'{prefix}_MODEL'],
+            "temperature": float(config[f'{prefix}_TEMPERATURE']),
+            "max_tokens": int(config[f'{prefix}_MAX_TOKENS']),
+            "timeout": float(shared['LLM_TIMEOUT_SECONDS'])
+        }
+    return settings
+
+
+def create_agent_llms() -> Dict[str, ResearchLLM]:
+    """
+    Create the LLM of every agent; agents with identical settings share one instance
+
+    Returns:
+        dict: Agent name -> LLM
+    """
+    llms, shared = {}, {}
+    for agent, settings in agent_llm_config().items():
+        key = tuple(sorted(settings.items()))
+        if key not in shared:
+            shared[key] = ResearchLLM(**settings)
+        llms[agent] = shared[key]
+    return llms
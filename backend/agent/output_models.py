@@ -0,0 +1,95 @@
+from typing import Any, List, Optional, Tuple, Type
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator
+
+
+class TaskOutputModel(BaseModel):
+    """Base for task output models: unknown keys are dropped, scalars and lists become text"""
+    model_config = ConfigDict(extra="ignore", str_strip_whitespace=True)
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def _coerce_text(cls, value: Any) -> Any:
+        # Models sometimes answer text fields with numbers, nulls or bullet lists
+        if value is None:
+            return ""
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value)
+        if isinstance(value, list):
+            return "; ".join(str(item) for item in value)
+        return value
+
+
+class CompanyInsight(TaskOutputModel):
+    """One entry of the market trends task output"""
+    company_name: str
+    business_focus: str = ""
+    relevant_trends: str = ""
+    matched_opportunities: str = ""
+    specific_challenges: str = ""
+    growth_potential: str = ""
+
+    @field_validator("company_name")
+    @classmethod
+    def _require_name(cls, value: str) -> str:
+        if not value:
+            raise ValueError("company_name must not be empty")
+        return value
+
+
+class OutreachLead(TaskOutputModel):
+    """One entry of the outreach task output"""
+    company_name: str
+    website: str
+    headquarters: str
+    funding_status: str
+    email_subject: str
+    email_body: str
+
+    @field_validator("company_name", "email_subject", "email_body")
+    @classmethod
+    def _require_text(cls, value: str) -> str:
+        if not value:
+            raise ValueError("must not be empty")
+        return value
+
+
+def example_json(model: Type[BaseModel]) -> str:
+    """Field skeleton of a model, for prompts asking the LLM to fix its output"""
+    fields = ",\n".join(f'  "{name}": "..."' for name in model.model_fields)
+    return "{\n" + fields + "\n}"
+
+
+def as_item_list(data: Any) -> List[Any]:
+    """
+    Treat parsed JSON as a list of items; a single object becomes a one-item list
+
+    Raises:
+        ValueError: If data is neither an array nor an object
+    """
+    if isinstance(data, dict):
+        return [data]
+    if not isinstance(data, list):
+        raise ValueError(f"Expected a JSON array, got {type(data).__name__}")
+    return data
+
+
+def validate_item(item: Any, model: Type[BaseModel]) -> Tuple[Optional[BaseModel], Optional[str]]:
+    """
+    Validate one output item against a model
+
+    Args:
+        item (Any): Parsed JSON item; a one-item array is unwrapped
+        model (type): Pydantic model to validate against
+
+    Returns:
+        tuple: (validated model, None) or (None, error message)
+    """
+    if isinstance(item, list) and len(item) == 1:
+        item = item[0]
+    try:
+        return model.model_validate(item), None
+    except ValidationError as e:
+        return None, "; ".join(
+            f"{'.'.join(str(part) for part in error['loc']) or 'item'}: {error['msg']}"
+            for error in e.errors()
+        )
@@ -0,0 +1,85 @@
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+import sys
+import os
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+from agent.lead_generation_crew import ResearchCrew
+from agent.llm_config import create_agent_llms
+from services.company_research_service import CompanyIntelligenceService
+from services.market_research_service import MarketResearchService
+from services.company_index_service import CompanyIndexService
+from utils.envutils import EnvUtils
+from utils.deadline import DeadlineExceededError, call_timeout
+
+
+class ResearchCrewPool:
+    """
+    Pool of pre-built ResearchCrew instances
+
+    Building a crew creates the LLMs, agents, tasks, tools and services, so
+    crews are built once at startup and lent to one request at a time. The
+    LLMs and the Perplexity services are stateless and shared by every crew;
+    agents, tasks and tools hold per-run state and stay private to a crew.
+    """
+
+    def __init__(self, size: Optional[int] = None):
+        config = EnvUtils().get_config({
+            'RESEARCH_CREW_POOL_SIZE': None,
+            'RESEARCH_MAX_WORKERS': 4,
+            'COMPANY_INDEX_ENABLED': 'true'
+        })
+        self.size = int(size or config['RESEARCH_CREW_POOL_SIZE'] or config['RESEARCH_MAX_WORKERS'])
+
+        self.llms = create_agent_llms()
+        self.company_service = CompanyIntelligenceService()
+        self.market_service = MarketResearchService()
+        self.company_index = (
+            CompanyIndexService() if str(config['COMPANY_INDEX_ENABLED']).lower() == 'true' else None
+        )
+
+        self._available: "queue.Queue[ResearchCrew]" = queue.Queue()
+        self._lock = threading.Lock()
+        self.in_use = 0
+        for _ in range(self.size):
+            self._available.put(self._create_crew())
+
+    def _create_crew(self) -> ResearchCrew:
+        return ResearchCrew(
+            llms=self.llms,
+            company_service=self.company_service,
+            market_service=self.market_service,
+            company_index=self.company_index
+        )
+
+    @contextmanager
+    def acquire(self, task_callback: Optional[Callable] = None) -> Iterator[ResearchCrew]:
+        """
+        Borrow a crew for one research run, waiting if all crews are busy
+
+        Args:
+            task_callback (callable, optional): Progress callback for this run only
+
+        Yields:
+            ResearchCrew: A crew reserved for the caller until the block exits
+
+        Raises:
+            DeadlineExceededError: If the request deadline passes before a crew is free
+        """
+        try:
+            crew = self._available.get(timeout=call_timeout(None, "waiting for a research crew"))
+        except queue.Empty:
+            raise DeadlineExceededError("No research crew became free before the request deadline")
+        with self._lock:
+            self.in_use += 1
+        crew.task_callback = task_callback
+        try:
+            yield crew
+        finally:
+            crew.task_callback = None
+            with self._lock:
+                self.in_use -= 1
+            self._available.put(crew)
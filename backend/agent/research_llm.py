@@ -0,0 +1,93 @@
+import copy
+from typing import Any, Dict, List, Optional
+import litellm
+from crewai import LLM
+import sys
+import os
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+from utils.rate_limiter import get_rate_limiter, estimate_tokens
+from utils.metrics import time_stage
+from utils.llm_recorder import get_recorder
+from utils.deadline import DeadlineExceededError, current_deadline
+from utils.llm_usage import add_llm_usage
+
+
+class ResearchLLM(LLM):
+    """
+    CrewAI LLM that waits on the shared OpenAI rate limiter before each call,
+    so concurrent crews queue by priority instead of hitting 429s. Calls go
+    through the LLM recorder when LLM_RECORD_MODE is set. Under a request
+    deadline the call timeout is cut to the time left. Token usage is added
+    to the enclosing track_llm_usage block as each call returns.
+    """
+
+    def call(self, messages: List[Dict[str, str]], callbacks: Optional[List[Any]] = None) -> str:
+        recorder = get_recorder()
+        if recorder:
+            request = {
+                "model": self.model,
+                "messages": messages,
+                "temperature": self.temperature,
+                "max_tokens": self.max_tokens,
+                # CrewAI merges stop words through a set, so their order varies
+                "stop": sorted(self.stop or [])
+            }
+            return recorder.call("openai", request, lambda: self._send(messages, callbacks))
+        return self._send(messages, callbacks)
+
+    def _send(self, messages: List[Dict[str, str]], callbacks: Optional[List[Any]]) -> str:
+        limiter = get_rate_limiter("openai", self.model)
+        if limiter:
+            limiter.acquire(estimate_tokens(messages, self.max_tokens or self.max_completion_tokens))
+        llm = self
+        deadline = current_deadline()
+        if deadline:
+            # The LLM is shared by concurrent runs, so the shorter timeout goes on
+            # a copy. Client retries would each get the full remaining time again.
+            llm = copy.copy(self)
+            llm.timeout = deadline.timeout(self.timeout, f"{self.model} call")
+            llm.kwargs = {**self.kwargs, "max_retries": 0}
+        with time_stage("llm_call", self.model):
+            try:
+                return self._complete(llm, messages, callbacks)
+            except Exception as e:
+                if deadline and deadline.expired:
+                    raise DeadlineExceededError(f"{self.model} call was cut off by the request deadline") from e
+                raise
+
+    @staticmethod
+    def _complete(llm: LLM, messages: List[Dict[str, str]], callbacks: Optional[List[Any]]) -> str:
+        """
+        The completion LLM.call makes, keeping the response so its usage is
+        counted before the call returns; litellm reports usage to callbacks
+        from a background thread, too late to attribute it to a task
+        """
+        if callbacks:
+            llm.set_callbacks(callbacks)
+        params = {
+            "model": llm.model,
+            "messages": messages,
+            "timeout": llm.timeout,
+            "temperature": llm.temperature,
+            "top_p": llm.top_p,
+            "n": llm.n,
+            "stop": llm.stop,
+            "max_tokens": llm.max_tokens or llm.max_completion_tokens,
+            "presence_penalty": llm.presence_penalty,
+            "frequency_penalty": llm.frequency_penalty,
+            "logit_bias": llm.logit_bias,
+            "response_format": llm.response_format,
+            "seed": llm.seed,
+            "logprobs": llm.logprobs,
+            "top_logprobs": llm.top_logprobs,
+            "api_base": llm.base_url,
+            "api_version": llm.api_version,
+            "api_key": llm.api_key,
+            "stream": False,
+            **llm.kwargs,
+        }
+        response = litellm.completion(**{name: value for name, value in params.items() if value is not None})
+        add_llm_usage(response.get("usage"))
+        return response["choices"][0]["message"]["content"]
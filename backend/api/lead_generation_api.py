@@ -1,6 +1,8 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Query, Response
 from pydantic import BaseModel
 import json
+import asyncio
+from typing import List, Optional
 import uvicorn
 import sys
 import os
@@ -10,9 +12,18 @@ if parent_dir not in sys.path:
 # Assuming these are imported from existing modules
 from services.user_prompt_extractor_service import UserPromptExtractor
 from services.read_json_test import JSONFileReader
-from agent.lead_generation_crew import ResearchCrew
-import json
-from fastapi.responses import JSONResponse
+from agent.research_crew_pool import ResearchCrewPool
+from services.research_job_service import ResearchJobService, ResearchJob, JobQueueFullError, PartialResult
+from services.lead_store_service import LeadStoreService
+from utils.json_utils import parse_json_tolerant
+from utils.envutils import EnvUtils
+from utils.result_cache import cache_stats, ResultCache
+from utils.rate_limiter import rate_limiter_stats, request_priority, PRIORITY_BATCH
+from utils.llm_usage import llm_usage_stats
+from utils.circuit_breaker import circuit_breaker_stats
+from utils.deadline import Deadline, request_deadline
+from utils.metrics import render_metrics
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import time
 
@@ -20,6 +31,9 @@ import time
 class QueryRequest(BaseModel):
     query: str
 
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+
 class LeadGenerationAPI:
     def __init__(self):
         self.app = FastAPI()
@@ -32,34 +46,277 @@ class LeadGenerationAPI:
         )
         # THIS FLAG IS ONLY TO DO TEST THE UI WITHOUT LLM, 
         self.use_agent_json = True # Turn it false to make any UI change to avoid hitting backend and LLM
-        @self.app.post("/research")
-        def execute_research(request: QueryRequest):
+        # For realistic offline runs keep it on and set LLM_RECORD_MODE=replay instead
+        # Research runs take minutes, so they execute on a bounded worker pool
+        # and clients poll for the result by job id
+        self.job_service = ResearchJobService()
+        # Crews are expensive to build, so they are created once and reused
+        self.crew_pool = ResearchCrewPool() if self.use_agent_json else None
+        # Generated leads are kept so repeat searches can be served without the crew
+        self.lead_store = LeadStoreService()
+        batch_config = EnvUtils().get_config({
+            'BATCH_MAX_QUERIES': 1000,
+            'BATCH_EXTRACTION_CONCURRENCY': 8,
+            'BATCH_MAX_RUNS': 0,
+            'RESEARCH_DEADLINE_SECONDS': 300
+        })
+        self.batch_max_queries = int(batch_config['BATCH_MAX_QUERIES'])
+        self.batch_extraction_concurrency = int(batch_config['BATCH_EXTRACTION_CONCURRENCY'])
+        # Crew runs all batches may have queued or running at once. The job queue
+        # is FIFO, so this keeps workers and pending-job budget free for
+        # interactive requests; 0 leaves one worker for them.
+        batch_runs = int(batch_config['BATCH_MAX_RUNS']) or self.job_service.max_workers - 1
+        self.batch_run_slots = asyncio.Semaphore(max(1, min(batch_runs, self.job_service.max_pending // 2)))
+        # Time from a /research request to its answer; past it the run is cut
+        # short and returns the leads finished so far. 0 disables the deadline.
+        self.research_deadline_seconds = float(batch_config['RESEARCH_DEADLINE_SECONDS'])
+
+        @self.app.on_event("shutdown")
+        async def shutdown_workers():
+            self.job_service.shutdown()
+            self.prompt_extractor.transport.close()
+            await self.prompt_extractor.transport.aclose()
+
+        @self.app.post("/research", status_code=202)
+        async def execute_research(request: QueryRequest):
+            # The deadline covers extraction, time in the job queue and the crew run
+            deadline = self._new_deadline()
+            # Extract structured info on the event loop; only the crew run
+            # needs a worker thread
+            extracted_json = None
             if self.use_agent_json:
-                
-                # Extract structured info from user query
-                extracted_json = self.prompt_extractor.extract_lead_info(request.query)
-            # print(extracted_json)
-                # Define callback for UI status updates
-                #def example_task_callback(status: str):
-                    # This can be modified to send updates to UI
-                    #print(status)
-                # Initialize research crew with callback
-                crew = ResearchCrew()
-                
+                try:
+                    with request_deadline(deadline):
+                        extracted_json = await self.prompt_extractor.aextract_lead_info(request.query)
+                except Exception as e:
+                    print(f"Prompt extraction failed: {str(e)}")
+                    raise HTTPException(status_code=502, detail=f"Prompt extraction failed: {str(e) or type(e).__name__}")
+            # Concurrent requests with the same extracted criteria share one run
+            dedupe_key = ResultCache.make_key(**extracted_json) if isinstance(extracted_json, dict) else None
+            try:
+                job, coalesced = self.job_service.submit(
+                    request.query,
+                    lambda job: self.run_research(extracted_json, job.publish, deadline),
+                    dedupe_key=dedupe_key
+                )
+            except JobQueueFullError as e:
+                raise HTTPException(status_code=503, detail=str(e))
+            return {**job.to_dict(), "coalesced": coalesced}
+
+        @self.app.post("/research/batch")
+        async def execute_research_batch(request: BatchQueryRequest):
+            if len(request.queries) > self.batch_max_queries:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"A batch may contain at most {self.batch_max_queries} queries"
+                )
+            return StreamingResponse(
+                self._run_batch(request.queries),
+                media_type="application/x-ndjson"
+            )
+
+        @self.app.get("/research/{job_id}")
+        def get_research(job_id: str):
+            job = self.job_service.get(job_id)
+            if job is None:
+                raise HTTPException(status_code=404, detail=f"Research job '{job_id}' not found")
+            return job.to_dict()
+
+        @self.app.get("/research/{job_id}/events")
+        async def stream_research_events(job_id: str, last_event_id: Optional[str] = Header(None)):
+            job = self.job_service.get(job_id)
+            if job is None:
+                raise HTTPException(status_code=404, detail=f"Research job '{job_id}' not found")
+            start = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
+            return StreamingResponse(
+                self._format_sse(job.aiter_events(start=start)),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+
+        @self.app.get("/leads")
+        def query_leads(industry: Optional[str] = None,
+                        geography: Optional[str] = None,
+                        funding_status: Optional[str] = None,
+                        domain: Optional[str] = None,
+                        company_stage: Optional[str] = None,
+                        limit: int = Query(50, ge=1, le=500),
+                        offset: int = Query(0, ge=0)):
+            return self.lead_store.query_leads(
+                industry=industry,
+                geography=geography,
+                funding_status=funding_status,
+                domain=domain,
+                company_stage=company_stage,
+                limit=limit,
+                offset=offset
+            )
+
+        @self.app.get("/leads/stats")
+        def get_lead_stats():
+            return self.lead_store.stats()
+
+        @self.app.get("/cache/stats")
+        def get_cache_stats():
+            return cache_stats()
+
+        @self.app.get("/rate-limits/stats")
+        def get_rate_limit_stats():
+            return rate_limiter_stats()
+
+        @self.app.get("/circuit-breakers/stats")
+        def get_circuit_breaker_stats():
+            return circuit_breaker_stats()
+
+        @self.app.get("/llm/stats")
+        def get_llm_stats():
+            return llm_usage_stats()
+
+        @self.app.get("/metrics")
+        def get_metrics():
+            body, content_type = render_metrics()
+            return Response(content=body, media_type=content_type)
+
+    async def _run_batch(self, queries: List[str]):
+        """
+        Research a batch of queries, streaming one NDJSON line per query
+
+        Identical query texts are extracted once, and queries whose extracted
+        criteria match share one crew run. Batch work runs at batch priority
+        so interactive requests overtake it at the rate limiters. At most
+        batch_run_slots runs are queued or running at once across all batches.
+        """
+        with request_priority(PRIORITY_BATCH):
+            # Extract criteria once per distinct query text, with bounded concurrency
+            texts = {" ".join(query.lower().split()): query for query in queries}
+            semaphore = asyncio.Semaphore(self.batch_extraction_concurrency)
+
+            async def extract(query):
+                """Returns (criteria, error); a failed extraction only fails its own queries"""
+                if not self.use_agent_json:
+                    return None, None
+                async with semaphore:
+                    try:
+                        with request_deadline(self._new_deadline()):
+                            return await self.prompt_extractor.aextract_lead_info(query), None
+                    except Exception as e:
+                        print(f"Batch extraction failed for '{query}': {str(e)}")
+                        return None, str(e) or type(e).__name__
+
+            extracted = dict(zip(texts, await asyncio.gather(*(extract(q) for q in texts.values()))))
+
+            # Group queries by extracted criteria; each group is one crew run
+            groups = {}
+            failed = []
+            for index, query in enumerate(queries):
+                criteria, error = extracted[" ".join(query.lower().split())]
+                if error:
+                    failed.append((index, query, error))
+                    continue
+                key = ResultCache.make_key(**criteria) if isinstance(criteria, dict) else f"query:{index}"
+                groups.setdefault(key, {"criteria": criteria, "members": []})["members"].append((index, query))
+
+            yield json.dumps({
+                "event": "batch_started",
+                "queries": len(queries),
+                "unique_runs": len(groups)
+            }) + "\n"
+
+            for index, query, error in failed:
+                yield json.dumps({
+                    "event": "result",
+                    "index": index,
+                    "query": query,
+                    "criteria": None,
+                    "job_id": None,
+                    "status": ResearchJob.FAILED,
+                    "result": None,
+                    "partial": False,
+                    "error": f"Extraction failed: {error}"
+                }) + "\n"
+
+            async def run_group(key, group):
+                criteria = group["criteria"]
+                first_query = group["members"][0][1]
+                async with self.batch_run_slots:
+                    try:
+                        job, _ = self.job_service.submit(
+                            first_query,
+                            lambda job: self.run_research(criteria, job.publish),
+                            dedupe_key=key if isinstance(criteria, dict) else None,
+                            priority=PRIORITY_BATCH
+                        )
+                    except JobQueueFullError as e:
+                        return group, None, str(e)
+                    await asyncio.wrap_future(job.completion)
+                return group, job, None
+
+            for finished in asyncio.as_completed([run_group(k, g) for k, g in groups.items()]):
+                group, job, error = await finished
+                for index, query in group["members"]:
+                    line = {
+                        "event": "result",
+                        "index": index,
+                        "query": query,
+                        "criteria": group["criteria"],
+                        "job_id": job.job_id if job else None,
+                        "status": job.status if job else ResearchJob.FAILED,
+                        "result": job.result if job else None,
+                        "partial": job.partial if job else False,
+                        "error": job.error if job else error
+                    }
+                    yield json.dumps(line) + "\n"
+
+            yield json.dumps({"event": "batch_completed"}) + "\n"
+
+    @staticmethod
+    async def _format_sse(events):
+        """Render job events as Server-Sent Events, with keep-alive comments while idle"""
+        async for event in events:
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+    def _new_deadline(self) -> Optional[Deadline]:
+        return Deadline(self.research_deadline_seconds) if self.research_deadline_seconds > 0 else None
+
+    def run_research(self, extracted_json, progress_callback=None, deadline=None):
+        """
+        Run the research crew for extracted lead criteria. Executed on a job worker.
+
+        Args:
+            extracted_json (dict): Criteria from UserPromptExtractor.extract_lead_info
+            progress_callback (callable, optional): Receives progress event dicts
+            deadline (Deadline, optional): Request deadline; batch runs get a
+                                           fresh one when their job starts
+
+        Returns:
+            list or PartialResult: The leads, wrapped in PartialResult when the
+                                   deadline cut the run short
+        """
+        if self.use_agent_json:
+            if progress_callback:
+                progress_callback({"event": "extraction_completed", "criteria": extracted_json})
+
+            # Borrow a pre-built research crew with progress callback
+            with request_deadline(deadline or self._new_deadline()), \
+                    self.crew_pool.acquire(task_callback=progress_callback) as crew:
                 # Execute research with extracted JSON
                 results = crew.execute_research(extracted_json)
-                results = results.replace("```json", "").replace("```", "")
-                results = results.strip()
-                structured_json = json.loads(results)
-                json.dumps(structured_json, indent=4) 
-                return structured_json
-                #response = JSONResponse(content=results)
-                #print("Serialized Response Content:", response.body.decode())
-                #print(structured_json)
-            else:
-                time.sleep(20)
-                structured_json=JSONFileReader().read_json()
-                return structured_json
+                companies = list(crew.companies_found)
+                partial = crew.partial
+            structured_json = parse_json_tolerant(results)
+            try:
+                self.lead_store.save_leads(structured_json, extracted_json, companies)
+            except Exception as e:
+                # The run itself succeeded, so a storage problem must not fail it
+                print(f"Failed to store leads: {str(e)}")
+            return PartialResult(structured_json) if partial else structured_json
+        else:
+            time.sleep(20)
+            structured_json=JSONFileReader().read_json()
+            return structured_json
 
 def create_app():
     api = LeadGenerationAPI()
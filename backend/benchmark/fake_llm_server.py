@@ -0,0 +1,306 @@
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+import sys
+import os
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+DEFAULT_PAYLOAD_PATH = os.path.join(parent_dir, "retail_startup.json")
+
+
+class LatencyModel:
+    """
+    Response delay distribution, in milliseconds
+
+    Supported distributions:
+        fixed: always mean_ms
+        uniform: mean_ms +/- jitter_ms
+        lognormal: long-tailed with the given mean and standard deviation (jitter_ms),
+                   closest to real LLM latencies
+    """
+
+    def __init__(self, distribution: str = "lognormal", mean_ms: float = 0.0, jitter_ms: float = 0.0):
+        if distribution not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution '{distribution}'")
+        self.distribution = distribution
+        self.mean_ms = mean_ms
+        self.jitter_ms = jitter_ms
+
+    def sample(self, rng: random.Random) -> float:
+        """Return one delay in seconds"""
+        if self.mean_ms <= 0:
+            return 0.0
+        if self.distribution == "fixed" or self.jitter_ms <= 0:
+            delay_ms = self.mean_ms
+        elif self.distribution == "uniform":
+            delay_ms = rng.uniform(self.mean_ms - self.jitter_ms, self.mean_ms + self.jitter_ms)
+        else:
+            sigma2 = math.log(1 + (self.jitter_ms / self.mean_ms) ** 2)
+            delay_ms = rng.lognormvariate(math.log(self.mean_ms) - sigma2 / 2, math.sqrt(sigma2))
+        return max(delay_ms, 0.0) / 1000.0
+
+
+class CannedPayloads:
+    """
+    Builds fake Perplexity and OpenAI answers from a leads file shaped like
+    retail_startup.json, so every stage of the pipeline gets parseable input
+    """
+
+    def __init__(self, payload_path: str = DEFAULT_PAYLOAD_PATH):
+        with open(payload_path, "r", encoding="utf-8") as f:
+            self.leads: List[Dict[str, str]] = json.load(f)
+
+    def perplexity_reply(self, prompt: str) -> str:
+        if "Extract structured information" in prompt:
+            return json.dumps({
+                "industry": "retail",
+                "company_stage": "startup",
+                "geography": "California",
+                "funding_stage": "",
+                "product": "AI"
+            })
+        if "JSON array of companies" in prompt:
+            return json.dumps([
+                {
+                    "name": lead["company_name"],
+                    "website": lead["website"],
+                    "description": lead["email_body"],
+                    "headquarters": lead["headquarters"],
+                    "employee_count": "500",
+                    "funding_status": lead["funding_status"],
+                    "product_list": "Platform",
+                    "competitor_list": "Amazon",
+                    "founded_year": "2015",
+                    "revenue_range": "$10M-$50M"
+                }
+                for lead in self.leads
+            ], indent=2)
+        return (
+            "## 1. Market Landscape Analysis\n"
+            "Retailers are consolidating around AI-driven inventory and personalization.\n\n"
+            "## 2. Strategic Opportunities\n"
+            "Demand forecasting, dynamic pricing and conversational commerce.\n\n"
+            "## 3. Technology and Innovation Insights\n"
+            "Foundation models lower the cost of recommendation systems.\n\n"
+            "## 4. Business Strategy Recommendations\n"
+            "Start with narrow, measurable pilots tied to margin.\n\n"
+            "## 5. Potential Challenges and Mitigation\n"
+            "Data quality and integration with legacy systems."
+        )
+
+    def openai_reply(self, messages: List[Dict[str, Any]]) -> str:
+        """Answer a crew agent in the ReAct format CrewAI parses"""
+        system = str(messages[0].get("content", "")) if messages else ""
+        conversation = "\n".join(str(message.get("content", "")) for message in messages)
+        role_match = re.search(r"You are (.+?)\.", system)
+        role = role_match.group(1) if role_match else ""
+
+        tool_names = re.search(r"only one name of \[(.+?)\]", conversation)
+        # The system prompt explains the Observation format, so only later messages count
+        used_tool = any("Observation:" in str(message.get("content", "")) for message in messages[1:])
+        if tool_names and not used_tool:
+            return self._tool_call(tool_names.group(1).split(",")[0].strip(), conversation)
+
+        if role == "Market Trends Analyst":
+            answer = json.dumps([
+                {
+                    "company_name": lead["company_name"],
+                    "business_focus": lead["email_subject"],
+                    "relevant_trends": "AI adoption",
+                    "matched_opportunities": "Personalization",
+                    "specific_challenges": "Integration cost",
+                    "growth_potential": "High"
+                }
+                for lead in self.leads
+            ])
+        elif role == "Outreach Specialist":
+            company = re.search(r"Write a personalized outreach email for (.+?) following", conversation)
+            if company:
+                lead = next(
+                    (lead for lead in self.leads if lead["company_name"] == company.group(1)),
+                    {**self.leads[0], "company_name": company.group(1)}
+                )
+                answer = json.dumps(lead)
+            else:
+                answer = json.dumps(self.leads)
+        else:
+            answer = "\n\n".join(
+                f"Company Name: {lead['company_name']}\nWebsite: {lead['website']}\n"
+                f"Headquarters: {lead['headquarters']}\nFunding Status: {lead['funding_status']}"
+                for lead in self.leads
+            )
+        return f"Thought: I now know the final answer\nFinal Answer: {answer}"
+
+    @staticmethod
+    def _tool_call(tool_name: str, conversation: str) -> str:
+        arguments = {}
+        for field in ("industry", "company_stage", "geography", "funding_stage", "product"):
+            # Tool schemas require every parameter, so empty ones are passed too
+            match = re.search(rf"^{field}:(.*)$", conversation, re.MULTILINE)
+            if match:
+                arguments[field] = match.group(1).strip()
+        return (
+            "Thought: I should use the tool\n"
+            f"Action: {tool_name}\n"
+            f"Action Input: {json.dumps(arguments)}"
+        )
+
+
+class FakeLLMServer:
+    """
+    Local stand-in for the Perplexity and OpenAI chat completion APIs
+
+    Perplexity requests are served on /chat/completions and OpenAI requests
+    on /v1/chat/completions, so both services can point at the same server
+    through PERPLEXITY_BASE_URL and OPENAI_API_BASE=<url>/v1.
+    """
+
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 0,
+                 perplexity_latency: Optional[LatencyModel] = None,
+                 openai_latency: Optional[LatencyModel] = None,
+                 error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0,
+                 payload_path: str = DEFAULT_PAYLOAD_PATH,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            host (str): Interface to bind
+            port (int): Port to bind; 0 picks a free port
+            perplexity_latency (LatencyModel, optional): Delay of Perplexity responses
+            openai_latency (LatencyModel, optional): Delay of OpenAI responses
+            error_rate (float): Share of requests answered with HTTP 500
+            rate_limit_rate (float): Share of requests answered with HTTP 429
+            payload_path (str): Leads file the canned answers are built from
+            seed (int, optional): Seed for latency and error sampling
+        """
+        self.perplexity_latency = perplexity_latency or LatencyModel()
+        self.openai_latency = openai_latency or LatencyModel()
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.payloads = CannedPayloads(payload_path)
+        self.requests: Dict[str, int] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def configure_environment(self) -> None:
+        """Point the Perplexity transport and the crew LLM at this server"""
+        os.environ["PERPLEXITY_BASE_URL"] = self.url
+        os.environ["OPENAI_API_BASE"] = f"{self.url}/v1"
+        os.environ.setdefault("PERPLEXITY_API_KEY", "benchmark")
+        os.environ.setdefault("PERPLEXITY_MODEL_NAME", "benchmark-sonar")
+        os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+    def _sample(self, latency: LatencyModel):
+        """Return (delay seconds, status code) for one request"""
+        with self._lock:
+            delay = latency.sample(self._rng)
+            roll = self._rng.random()
+        if roll < self.error_rate:
+            return delay, 500
+        if roll < self.error_rate + self.rate_limit_rate:
+            return delay, 429
+        return delay, 200
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                messages = body.get("messages", [])
+                is_openai = self.path.startswith("/v1/")
+                server._count("openai" if is_openai else "perplexity")
+
+                delay, status = server._sample(server.openai_latency if is_openai else server.perplexity_latency)
+                time.sleep(delay)
+                if status != 200:
+                    self._send_json(status, {"error": {"message": f"Simulated HTTP {status}"}},
+                                    {"Retry-After": "1"} if status == 429 else None)
+                    return
+
+                if is_openai:
+                    content = server.payloads.openai_reply(messages)
+                else:
+                    content = server.payloads.perplexity_reply(str(messages[-1].get("content", "")) if messages else "")
+                if body.get("stream"):
+                    self._send_stream(content)
+                    return
+                self._send_json(200, {
+                    "id": "fake",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model"),
+                    "choices": [{
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": content}
+                    }],
+                    "usage": {
+                        "prompt_tokens": sum(len(str(m.get("content", ""))) for m in messages) // 4,
+                        "completion_tokens": len(content) // 4,
+                        "total_tokens": (sum(len(str(m.get("content", ""))) for m in messages) + len(content)) // 4
+                    }
+                })
+
+            def _send_json(self, status, payload, headers=None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, content):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                chunks = [content[i:i + 16] for i in range(0, len(content), 16)]
+                events = [
+                    f"data: {json.dumps({'choices': [{'index': 0, 'delta': {'content': chunk}}]})}\n\n"
+                    for chunk in chunks
+                ] + ["data: [DONE]\n\n"]
+                for event in events:
+                    data = event.encode()
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
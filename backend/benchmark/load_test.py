@@ -0,0 +1,302 @@
+"""
+Offline load test for the research API
+
+Starts a local fake of the Perplexity and OpenAI APIs, points the backend at
+it, serves the API with uvicorn and drives POST /research at each requested
+concurrency level. Each request is timed until its job finishes (via the
+job event stream). Reports throughput, p50/p95/p99 latency and memory per run.
+
+Usage (from the backend directory):
+    python benchmark/load_test.py --concurrency 1,4,8 --requests 20
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional
+import httpx
+import sys
+import os
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+from benchmark.fake_llm_server import FakeLLMServer, LatencyModel, DEFAULT_PAYLOAD_PATH
+from utils.envutils import EnvUtils
+
+INDUSTRIES = ["retail", "fintech", "healthcare", "logistics", "education", "insurance"]
+GEOGRAPHIES = ["California", "Texas", "New York", "Europe", "India", "Canada"]
+PRODUCTS = ["AI inventory forecasting", "fraud detection", "customer analytics", "route optimization"]
+
+
+def build_queries(count: int, distinct: int, run_index: int) -> List[str]:
+    """
+    Build the request queries for one run
+
+    Queries differ per run, so a run does not hit results cached by an
+    earlier one; within a run they repeat after `distinct` queries.
+    """
+    queries = []
+    for i in range(count):
+        n = run_index * distinct + i % distinct
+        queries.append(
+            f"{INDUSTRIES[n % len(INDUSTRIES)]} startups in {GEOGRAPHIES[n // len(INDUSTRIES) % len(GEOGRAPHIES)]} "
+            f"interested in {PRODUCTS[n % len(PRODUCTS)]} {n}"
+        )
+    return queries
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Linear-interpolated percentile of values (pct in 0-100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def current_rss_mb() -> Optional[float]:
+    """Resident memory of this process, where the platform exposes it"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Peak rather than current RSS, but the best available without /proc
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class MemorySampler:
+    """Samples RSS in the background to find the peak of a run"""
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.peak_mb: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+
+    def __enter__(self) -> "MemorySampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _sample(self) -> None:
+        while True:
+            rss = current_rss_mb()
+            if rss is not None:
+                self.peak_mb = rss if self.peak_mb is None else max(self.peak_mb, rss)
+            if self._stop.wait(self.interval):
+                return
+
+
+async def timed_research(client: httpx.AsyncClient, query: str, timeout: float) -> Dict[str, Any]:
+    """Submit one query and wait for its job to finish"""
+    started = time.perf_counter()
+    try:
+        response = await client.post("/research", json={"query": query})
+        response.raise_for_status()
+        job = response.json()
+        status = None
+        async with client.stream("GET", f"/research/{job['job_id']}/events", timeout=timeout) as events:
+            async for line in events.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                event = json.loads(line[len("data: "):])
+                if event["event"] in ("job_completed", "job_failed"):
+                    status = "completed" if event["event"] == "job_completed" else "failed"
+                    break
+        return {
+            "status": status or "failed",
+            "coalesced": job.get("coalesced", False),
+            "latency": time.perf_counter() - started
+        }
+    except (httpx.HTTPError, ValueError, KeyError) as e:
+        return {"status": "error", "error": str(e), "coalesced": False, "latency": time.perf_counter() - started}
+
+
+async def drive(base_url: str, queries: List[str], concurrency: int, timeout: float) -> List[Dict[str, Any]]:
+    """Run all queries with at most `concurrency` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency * 2 + 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def run(query):
+            async with semaphore:
+                return await timed_research(client, query, timeout)
+        return await asyncio.gather(*(run(query) for query in queries))
+
+
+def run_level(base_url: str, server: FakeLLMServer, concurrency: int, args, run_index: int) -> Dict[str, Any]:
+    """Benchmark one concurrency level"""
+    from utils.result_cache import clear_caches
+
+    if not args.warm_cache:
+        clear_caches()
+    queries = build_queries(args.requests, args.distinct_queries or args.requests, run_index)
+    upstream_before = dict(server.requests)
+    rss_start = current_rss_mb()
+
+    started = time.perf_counter()
+    with MemorySampler() as memory:
+        results = asyncio.run(drive(base_url, queries, concurrency, args.timeout))
+    duration = time.perf_counter() - started
+
+    latencies = [result["latency"] for result in results if result["status"] == "completed"]
+    errors = [result["error"] for result in results if result.get("error")]
+    if errors:
+        print(f"  {len(errors)} client errors, first: {errors[0]}")
+    upstream = {
+        name: count - upstream_before.get(name, 0) for name, count in server.requests.items()
+    }
+
+    def ms(seconds):
+        return round(seconds * 1000, 1) if seconds is not None else None
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "completed": len(latencies),
+        "failed": len(results) - len(latencies),
+        "coalesced": sum(1 for result in results if result["coalesced"]),
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 3) if duration else 0.0,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "rss_start_mb": round(rss_start, 1) if rss_start is not None else None,
+        "rss_peak_mb": round(memory.peak_mb, 1) if memory.peak_mb is not None else None,
+        "upstream_requests": upstream
+    }
+
+
+def start_api(port: int):
+    """Serve the API with uvicorn on a background thread"""
+    import uvicorn
+    from api.lead_generation_api import create_app
+
+    server = uvicorn.Server(uvicorn.Config(create_app(), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="benchmark-api", daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("API server failed to start")
+        time.sleep(0.05)
+    return server, thread
+
+
+def print_report(runs: List[Dict[str, Any]]) -> None:
+    columns = ["concurrency", "requests", "completed", "failed", "coalesced", "duration_s",
+               "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "rss_start_mb", "rss_peak_mb"]
+    widths = [max(len(column), *(len(str(run[column])) for run in runs)) for column in columns]
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for run in runs:
+        print("  ".join(str(run[column]).rjust(width) for column, width in zip(columns, widths)))
+
+
+def print_llm_report(llm_usage: Dict[str, Dict[str, Any]]) -> None:
+    """Per-agent latency and cost over all runs; costs use the fake's token counts"""
+    columns = ["agent", "model", "runs", "requests", "avg_seconds_per_run", "cost_usd", "avg_cost_usd_per_run"]
+    rows = sorted(llm_usage.values(), key=lambda entry: entry["agent"])
+    if not rows:
+        return
+    widths = [max(len(column), *(len(str(row[column])) for row in rows)) for column in columns]
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row[column]).rjust(width) for column, width in zip(columns, widths)))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load test for the SalesSphere research API")
+    parser.add_argument("--concurrency", default="1,4,8",
+                        help="Comma-separated concurrency levels, one run each")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per run")
+    parser.add_argument("--distinct-queries", type=int, default=0,
+                        help="Distinct queries per run (default: all distinct)")
+    parser.add_argument("--latency-distribution", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--perplexity-latency-ms", type=float, default=200)
+    parser.add_argument("--perplexity-jitter-ms", type=float, default=50)
+    parser.add_argument("--openai-latency-ms", type=float, default=300)
+    parser.add_argument("--openai-jitter-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of upstream calls failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of upstream calls failing with 429")
+    parser.add_argument("--payload", default=DEFAULT_PAYLOAD_PATH, help="Leads file for canned answers")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--api-port", type=int, default=8181)
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds to wait for one job")
+    parser.add_argument("--warm-cache", action="store_true", help="Keep caches between runs and enable the company index")
+    parser.add_argument("--llm-extraction", action="store_true",
+                        help="Disable the local prompt extractor so every query calls the LLM")
+    parser.add_argument("--no-rate-limits", action="store_true", help="Disable the client-side rate limiters")
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Load .env first so it cannot override the fake endpoints
+    EnvUtils()
+    server = FakeLLMServer(
+        perplexity_latency=LatencyModel(args.latency_distribution, args.perplexity_latency_ms, args.perplexity_jitter_ms),
+        openai_latency=LatencyModel(args.latency_distribution, args.openai_latency_ms, args.openai_jitter_ms),
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        payload_path=args.payload,
+        seed=args.seed
+    ).start()
+    server.configure_environment()
+    os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+    os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+    # Keep results out of the on-disk cache used by the real server
+    os.environ.setdefault("COMPANY_CACHE_BACKEND", "memory")
+    os.environ.setdefault("MARKET_CACHE_BACKEND", "memory")
+    os.environ.setdefault("LEAD_STORE_PATH", ":memory:")
+    os.environ.setdefault("COMPANY_INDEX_PATH", ":memory:")
+    if not args.warm_cache:
+        # The fake returns the same companies for every query, so a shared
+        # index would skip company research after the first request
+        os.environ.setdefault("COMPANY_INDEX_ENABLED", "false")
+    if args.llm_extraction:
+        os.environ["LOCAL_EXTRACTION_ENABLED"] = "false"
+    if args.no_rate_limits:
+        os.environ["PERPLEXITY_RPM"] = "0"
+        os.environ["OPENAI_RPM"] = "0"
+
+    print(f"Fake LLM server at {server.url}")
+    api_server, api_thread = start_api(args.api_port)
+    base_url = f"http://127.0.0.1:{args.api_port}"
+
+    runs = []
+    try:
+        for run_index, concurrency in enumerate(int(level) for level in args.concurrency.split(",")):
+            print(f"Running {args.requests} requests at concurrency {concurrency}...")
+            runs.append(run_level(base_url, server, concurrency, args, run_index))
+    finally:
+        api_server.should_exit = True
+        api_thread.join(timeout=10)
+        server.stop()
+
+    from utils.llm_usage import llm_usage_stats
+    llm_usage = llm_usage_stats()
+
+    print()
+    print_report(runs)
+    print()
+    print_llm_report(llm_usage)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "runs": runs, "llm_usage": llm_usage}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
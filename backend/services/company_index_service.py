@@ -0,0 +1,152 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from difflib import SequenceMatcher
+from typing import Any, Dict, Optional
+import sys
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+from utils.envutils import EnvUtils
+from utils.company_keys import normalize_company_name, normalize_domain
+from utils.metrics import COMPANY_INDEX_LOOKUPS
+
+
+class CompanyIndexService:
+    """
+    Entity-resolution index of analysed companies
+
+    Keeps the latest company research analysis per company with the time it
+    was written. Companies are resolved by normalized website domain first,
+    then by fuzzy match on the normalized name, so "Instacart, Inc." found in
+    one search and "Instacart" found in another are the same entry. Names
+    whose domains disagree are never merged.
+    """
+
+    FRESH = "fresh"
+    STALE = "stale"
+    NEW = "new"
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path (str, optional): SQLite file; defaults to COMPANY_INDEX_PATH
+        """
+        config = EnvUtils().get_config({
+            'COMPANY_INDEX_PATH': os.path.join(os.path.dirname(__file__), '..', 'cache', 'salessphere_companies.db'),
+            'COMPANY_INDEX_TTL_SECONDS': 604800,
+            'COMPANY_INDEX_NAME_SIMILARITY': 0.9
+        })
+        self.path = path or config['COMPANY_INDEX_PATH']
+        self.ttl_seconds = float(config['COMPANY_INDEX_TTL_SECONDS'])
+        self.name_similarity = float(config['COMPANY_INDEX_NAME_SIMILARITY'])
+        self._lock = threading.Lock()
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS companies ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, domain TEXT NOT NULL, "
+                "name_key TEXT NOT NULL, name_block TEXT NOT NULL, name TEXT NOT NULL, "
+                "company TEXT NOT NULL, analysis TEXT NOT NULL, analyzed_at REAL NOT NULL)"
+            )
+            for column in ("domain", "name_key", "name_block"):
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_companies_{column} ON companies ({column})")
+
+    def lookup(self, company: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Find the stored entry for a company from search results
+
+        Args:
+            company (dict): Company with at least a name or website
+
+        Returns:
+            dict or None: {"name", "analysis", "analyzed_at", "status"} where status
+                          is FRESH or STALE, or None if the company is new
+        """
+        with self._lock:
+            row = self._resolve(company)
+        if row is None:
+            COMPANY_INDEX_LOOKUPS.labels(result=self.NEW).inc()
+            return None
+        status = self.FRESH if time.time() - row[3] <= self.ttl_seconds else self.STALE
+        COMPANY_INDEX_LOOKUPS.labels(result=status).inc()
+        return {"name": row[1], "analysis": row[2], "analyzed_at": row[3], "status": status}
+
+    def save_analysis(self, company: Dict[str, Any], analysis: str) -> None:
+        """
+        Store the latest analysis of a company, replacing any earlier one
+
+        Args:
+            company (dict): Company from search results
+            analysis (str): Research text written for the company
+        """
+        name = self._name(company)
+        name_key = normalize_company_name(name)
+        if not name_key or not analysis:
+            return
+        values = (
+            normalize_domain(company.get("website")), name_key, name_key[:3], name,
+            json.dumps(company), analysis, time.time()
+        )
+        with self._lock, self._conn:
+            row = self._resolve(company)
+            if row is None:
+                self._conn.execute(
+                    "INSERT INTO companies (domain, name_key, name_block, name, company, analysis, analyzed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", values
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE companies SET domain = ?, name_key = ?, name_block = ?, name = ?, "
+                    "company = ?, analysis = ?, analyzed_at = ? WHERE id = ?", values + (row[0],)
+                )
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM companies")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            companies, stale = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(analyzed_at < ?), 0) FROM companies",
+                (time.time() - self.ttl_seconds,)
+            ).fetchone()
+        return {"companies": companies, "stale": stale, "ttl_seconds": self.ttl_seconds}
+
+    @staticmethod
+    def _name(company: Dict[str, Any]) -> str:
+        return str(company.get("name") or company.get("company_name") or "").strip()
+
+    def _resolve(self, company: Dict[str, Any]):
+        """Return (id, name, analysis, analyzed_at) of the matching entry. Caller must hold the lock."""
+        domain = normalize_domain(company.get("website"))
+        name_key = normalize_company_name(self._name(company))
+        columns = "id, name, analysis, analyzed_at, domain, name_key"
+
+        if domain:
+            row = self._conn.execute(
+                f"SELECT {columns} FROM companies WHERE domain = ? ORDER BY analyzed_at DESC LIMIT 1", (domain,)
+            ).fetchone()
+            if row is not None:
+                return row[:4]
+        if not name_key:
+            return None
+
+        # Fuzzy name match within the block of names sharing a prefix
+        best, best_score = None, self.name_similarity
+        candidates = self._conn.execute(
+            f"SELECT {columns} FROM companies WHERE name_block = ?", (name_key[:3],)
+        ).fetchall()
+        for row in candidates:
+            if domain and row[4] and row[4] != domain:
+                continue
+            score = 1.0 if row[5] == name_key else SequenceMatcher(None, row[5], name_key).ratio()
+            if score >= best_score and (best is None or score > best_score or row[3] > best[3]):
+                best, best_score = row, score
+        return best[:4] if best else None
@@ -1,16 +1,20 @@
-from typing import Dict, List, Optional
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
 import json
-from datetime import datetime
-import os
-import pathlib
-from dotenv import load_dotenv
-from openai import OpenAI
 import sys
 import os
 parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 from utils.envutils import EnvUtils
+from utils.http_transport import PerplexityTransport
+from utils.result_cache import get_cache, ResultCache
+from utils.single_flight import AsyncSingleFlight, SingleFlight
+from utils.json_utils import JSONArrayStreamParser
+
+# Identical lookups from concurrent crews wait for one Perplexity call
+_in_flight_lookups = SingleFlight()
+_in_flight_async_lookups = AsyncSingleFlight()
+
 class CompanyIntelligenceService:
     def __init__(self):
         """Initialize the service with Perplexity API"""
@@ -21,11 +25,15 @@ class CompanyIntelligenceService:
         if not self.api_key:
             raise ValueError("Please set the PERPLEXITY_API_KEY environment variable")
             
-        # Initialize Perplexity client
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url="https://api.perplexity.ai"
-        )
+        # Shared pooled Perplexity client
+        self.transport = PerplexityTransport()
+
+        # Shared across service instances so every crew benefits from earlier lookups
+        self.cache = get_cache("company_intelligence", "COMPANY_CACHE")
+
+        # Stream the company list and parse each company as soon as it is complete
+        config = self.env_utils.get_config({'COMPANY_STREAMING': 'true'})
+        self.streaming = str(config['COMPANY_STREAMING']).lower() == 'true'
 
     def get_company_intelligence(self, 
                                industry: Optional[str] = None,
@@ -33,37 +41,202 @@ class CompanyIntelligenceService:
                                product: Optional[str] = None,
                                company_stage: Optional[str] = None,
                                geography: Optional[str] = None,
-                               funding_stage: Optional[str] = None
+                               funding_stage: Optional[str] = None,
+                               on_company: Optional[Callable[[Dict[str, Any]], None]] = None
                                ) -> str:
-        """Get detailed company intelligence based on provided criteria"""
-        
-        # Get company data from Perplexity
-        prompt = self.construct_perplexity_prompt(
-            industry, company_name, product, 
-            company_stage, geography, funding_stage
-        )
-        companies_data = self.get_perplexity_data(prompt)
-        
-        # Parse and validate the response
+        """
+        Get detailed company intelligence based on provided criteria
+
+        Args:
+            on_company (callable, optional): Called with each company as soon as
+                                             it has been parsed from the stream, or
+                                             once the cached/full response is read
+
+        Returns:
+            str: JSON search result. When Perplexity fails it holds the last cached
+                 companies with "stale": true, or no companies and an "error"
+        """
+        criteria = {
+            "industry": industry,
+            "company_name": company_name,
+            "product": product,
+            "company_stage": company_stage,
+            "geography": geography,
+            "funding_stage": funding_stage
+        }
+        cache_key = ResultCache.make_key(**criteria)
+        cached = self.cache.get(cache_key)
+        cache_hit = cached is not None
+
+        if cache_hit:
+            companies, complete = self._parse_companies(cached), True
+            self._notify(companies, on_company)
+        else:
+            try:
+                # Get company data from Perplexity
+                (companies, complete), shared = _in_flight_lookups.do_shared(
+                    cache_key,
+                    lambda: self._fetch_companies(self.construct_perplexity_prompt(**criteria), on_company)
+                )
+                if shared:
+                    # Only the leader's callback saw the companies as they arrived
+                    self._notify(companies, on_company)
+            except Exception as e:
+                return self._failed_result(criteria, cache_key, e, on_company)
+
+        return self._build_result(criteria, cache_key, companies, cache_hit or not complete)
+
+    async def aget_company_intelligence(self, 
+                                      industry: Optional[str] = None,
+                                      company_name: Optional[str] = None,
+                                      product: Optional[str] = None,
+                                      company_stage: Optional[str] = None,
+                                      geography: Optional[str] = None,
+                                      funding_stage: Optional[str] = None,
+                                      on_company: Optional[Callable[[Dict[str, Any]], None]] = None
+                                      ) -> str:
+        """Async variant of get_company_intelligence"""
+        criteria = {
+            "industry": industry,
+            "company_name": company_name,
+            "product": product,
+            "company_stage": company_stage,
+            "geography": geography,
+            "funding_stage": funding_stage
+        }
+        cache_key = ResultCache.make_key(**criteria)
+        cached = self.cache.get(cache_key)
+        cache_hit = cached is not None
+
+        if cache_hit:
+            companies, complete = self._parse_companies(cached), True
+            self._notify(companies, on_company)
+        else:
+            try:
+                # Get company data from Perplexity
+                (companies, complete), shared = await _in_flight_async_lookups.do_shared(
+                    cache_key,
+                    lambda: self._afetch_companies(self.construct_perplexity_prompt(**criteria), on_company)
+                )
+                if shared:
+                    self._notify(companies, on_company)
+            except Exception as e:
+                return self._failed_result(criteria, cache_key, e, on_company)
+
+        return self._build_result(criteria, cache_key, companies, cache_hit or not complete)
+
+    def _fetch_companies(self, prompt: str,
+                         on_company: Optional[Callable[[Dict[str, Any]], None]] = None
+                         ) -> Tuple[List[Any], bool]:
+        """
+        Fetch companies from Perplexity, streamed when streaming is enabled
+
+        Returns:
+            tuple: (companies, complete) where complete is False if a stream
+                   broke off partway
+
+        Raises:
+            Exception: The upstream error when no company was received
+        """
+        if not self.streaming:
+            companies = self.get_perplexity_data(prompt)
+            self._notify(companies, on_company)
+            return companies, True
+
+        companies = []
         try:
-            companies = json.loads(companies_data)
+            for company in self.stream_perplexity_data(prompt):
+                companies.append(company)
+                if on_company:
+                    on_company(company)
+            return companies, True
+        except Exception as e:
+            if not companies:
+                raise
+            print(f"Error streaming from Perplexity API after {len(companies)} companies: {e}")
+            return companies, False
+
+    async def _afetch_companies(self, prompt: str,
+                                on_company: Optional[Callable[[Dict[str, Any]], None]] = None
+                                ) -> Tuple[List[Any], bool]:
+        """Async variant of _fetch_companies"""
+        if not self.streaming:
+            companies = await self.aget_perplexity_data(prompt)
+            self._notify(companies, on_company)
+            return companies, True
+
+        companies = []
+        try:
+            async for company in self.astream_perplexity_data(prompt):
+                companies.append(company)
+                if on_company:
+                    on_company(company)
+            return companies, True
+        except Exception as e:
+            if not companies:
+                raise
+            print(f"Error streaming from Perplexity API after {len(companies)} companies: {e}")
+            return companies, False
+
+    def _failed_result(self, criteria: Dict[str, Optional[str]], cache_key: str, error: Exception,
+                       on_company: Optional[Callable[[Dict[str, Any]], None]] = None) -> str:
+        """
+        Result for a lookup Perplexity failed, so callers can tell it from a
+        search that found no companies
+
+        Serves the companies of an expired cache entry, flagged stale, when the
+        search was ever answered; otherwise no companies and the error.
+        """
+        stale = self.cache.get_stale(cache_key)
+        if stale is None:
+            print(f"Error calling Perplexity API: {error}")
+            return self._build_result(
+                criteria, cache_key, [], True,
+                error=f"Company search failed: {str(error) or type(error).__name__}"
+            )
+        print(f"Error calling Perplexity API: {error}; serving companies cached {stale[1] / 3600:.1f}h ago")
+        companies = self._parse_companies(stale[0])
+        self._notify(companies, on_company)
+        return self._build_result(criteria, cache_key, companies, True, stale=True)
+
+    @staticmethod
+    def _notify(companies: List[Any], on_company: Optional[Callable[[Dict[str, Any]], None]]) -> None:
+        """Pass companies that did not arrive through a stream to on_company"""
+        if on_company:
+            for company in companies:
+                on_company(company)
+
+    @staticmethod
+    def _parse_companies(companies_data: str) -> List[Any]:
+        try:
+            return json.loads(companies_data)
         except json.JSONDecodeError:
             print("Error: Received non-JSON response from Perplexity")
-            companies = []
-        
-        return json.dumps({
+            return []
+
+    def _build_result(self, criteria: Dict[str, Optional[str]], cache_key: str,
+                      companies: List[Any], skip_cache: bool,
+                      stale: bool = False, error: Optional[str] = None) -> str:
+        """
+        Cache successful lookups and format the result
+
+        The result is fed to the next agent LLM call, so it must hold nothing
+        volatile (like a timestamp) or recorded calls could never be replayed.
+        """
+        # Only cache complete, real answers
+        if companies and not skip_cache:
+            self.cache.set(cache_key, json.dumps(companies))
+
+        result = {
             "companies": companies,
-            "search_criteria": {
-                "industry": industry,
-                "company_name": company_name,
-                "product": product,
-                "company_stage": company_stage,
-                "geography": geography,
-                "funding_stage": funding_stage
-            },
-            "total_companies": len(companies),
-            "generated_at": datetime.now().isoformat()
-        }, indent=2)
+            "search_criteria": criteria,
+            "total_companies": len(companies)
+        }
+        if stale:
+            result["stale"] = True
+        if error:
+            result["error"] = error
+        return json.dumps(result, indent=2)
 
     def construct_perplexity_prompt(self,
                                   industry: Optional[str],
@@ -136,44 +309,80 @@ Important instructions:
 7. Do not include any markdown formatting or explanation"""
         return prompt
 
-    def get_perplexity_data(self, prompt: str) -> str:
-        """Get company data from Perplexity API"""
-        try:
-            #print(f"Calling Perplexity API with prompt: {prompt}")
-            # Prepare the messages
-            messages = [
-                {
-                    "role": "system",
-                    "content": "You are a company research assistant. You MUST return ONLY valid JSON arrays with no additional text."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
-            
-            # Make the API call
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.1  # Lower temperature for more consistent JSON
-            )
-            
-            # Extract the response content
-            content = response.choices[0].message.content.strip()
-            
-            # Clean up the response to ensure it's valid JSON
-            # Remove any markdown code block indicators
-            content = content.replace("```json", "").replace("```", "").strip()
-            
-            # Validate JSON
-            json.loads(content)  # This will raise an exception if invalid JSON
-            
-            return content
-            
-        except Exception as e:
-            print(f"Error calling Perplexity API: {e}")
-            return "[]"
+    def get_perplexity_data(self, prompt: str) -> List[Any]:
+        """
+        Get the companies for a search prompt from Perplexity API
+
+        Raises:
+            httpx.HTTPError: On transport errors or non-2xx responses after retries
+            CircuitOpenError: If Perplexity's circuit is open
+            ValueError: If the response is not a JSON array
+        """
+        #print(f"Calling Perplexity API with prompt: {prompt}")
+        response = self.transport.chat_completion(self._build_payload(prompt))
+        return self._extract_companies(response)
+
+    def stream_perplexity_data(self, prompt: str) -> Iterator[Dict[str, Any]]:
+        """
+        Stream company data from Perplexity API
+
+        Yields:
+            dict: Each company as soon as its JSON object is complete
+
+        Raises:
+            httpx.HTTPError: On transport errors
+            ValueError: If the streamed array is malformed or never closed
+        """
+        parser = JSONArrayStreamParser()
+        for chunk in self.transport.stream_chat_completion(self._build_payload(prompt)):
+            yield from parser.feed(chunk)
+        if not parser.finished:
+            raise ValueError("Company stream ended before the JSON array was closed")
+
+    async def astream_perplexity_data(self, prompt: str) -> AsyncIterator[Dict[str, Any]]:
+        """Async variant of stream_perplexity_data"""
+        parser = JSONArrayStreamParser()
+        async for chunk in self.transport.astream_chat_completion(self._build_payload(prompt)):
+            for company in parser.feed(chunk):
+                yield company
+        if not parser.finished:
+            raise ValueError("Company stream ended before the JSON array was closed")
+
+    async def aget_perplexity_data(self, prompt: str) -> List[Any]:
+        """Async variant of get_perplexity_data"""
+        response = await self.transport.achat_completion(self._build_payload(prompt))
+        return self._extract_companies(response)
+
+    def _build_payload(self, prompt: str) -> Dict:
+        """Build the chat completion request for a company search prompt"""
+        # Prepare the messages
+        messages = [
+            {
+                "role": "system",
+                "content": "You are a company research assistant. You MUST return ONLY valid JSON arrays with no additional text."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+        return {
+            "model": self.model,
+            "messages": messages,
+            "temperature": 0.1  # Lower temperature for more consistent JSON
+        }
+
+    def _extract_companies(self, response: Dict) -> List[Any]:
+        """Pull the company JSON array out of a Perplexity response, parsing it once"""
+        # Extract the response content
+        content = response['choices'][0]['message']['content'].strip()
+        
+        # Clean up the response to ensure it's valid JSON
+        # Remove any markdown code block indicators
+        content = content.replace("```json", "").replace("```", "").strip()
+        
+        # Raises if the content is not valid JSON
+        return json.loads(content)
 
 if __name__ == "__main__":
     service = CompanyIntelligenceService()
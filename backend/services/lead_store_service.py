@@ -0,0 +1,183 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import sys
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+from utils.envutils import EnvUtils
+from utils.company_keys import normalize_company_name, normalize_domain, normalize_text
+
+LEAD_FIELDS = ["company_name", "website", "headquarters", "funding_status", "email_subject", "email_body"]
+# Company research fields returned by the company intelligence search
+RESEARCH_FIELDS = ["description", "employee_count", "founded_year", "revenue_range",
+                   "product_list", "competitor_list"]
+CRITERIA_FIELDS = ["industry", "geography", "company_stage", "funding_stage", "product"]
+
+
+class LeadStoreService:
+    """
+    Persistent store of generated leads
+
+    Every lead is kept in SQLite together with the company research it was
+    based on and the search criteria that produced it, indexed on industry,
+    geography, funding status and website domain so repeat searches can be
+    answered without running the crew. A lead is stored once per company
+    (by normalized name) and search criteria; a new run for the same search
+    updates it in place.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path (str, optional): SQLite file; defaults to LEAD_STORE_PATH
+        """
+        config = EnvUtils().get_config({
+            'LEAD_STORE_PATH': os.path.join(os.path.dirname(__file__), '..', 'cache', 'salessphere_leads.db')
+        })
+        self.path = path or config['LEAD_STORE_PATH']
+        self._lock = threading.Lock()
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        columns = ", ".join(f"{field} TEXT" for field in LEAD_FIELDS[1:] + RESEARCH_FIELDS + CRITERIA_FIELDS)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS leads ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, lead_key TEXT NOT NULL UNIQUE, "
+                "company_name TEXT NOT NULL, company_key TEXT NOT NULL, domain TEXT NOT NULL, "
+                f"funding_status_key TEXT NOT NULL, {columns}, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            for column in ("industry", "geography", "funding_status_key", "domain"):
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_leads_{column} ON leads ({column})")
+
+    def save_leads(self, leads: List[Dict[str, Any]], criteria: Dict[str, Any],
+                   companies: Optional[List[Dict[str, Any]]] = None) -> int:
+        """
+        Store the leads of one research run
+
+        Args:
+            leads (list): Lead dicts as returned by the crew
+            criteria (dict): Extracted search criteria of the run
+            companies (list, optional): Company intelligence results of the run;
+                                        matched to leads by domain, then by name
+
+        Returns:
+            int: Number of leads stored
+        """
+        by_domain, by_name = {}, {}
+        for company in companies or []:
+            if not isinstance(company, dict):
+                continue
+            domain = normalize_domain(company.get("website"))
+            if domain:
+                by_domain.setdefault(domain, company)
+            by_name.setdefault(normalize_company_name(company.get("name") or company.get("company_name")), company)
+
+        search = {field: normalize_text((criteria or {}).get(field)) for field in CRITERIA_FIELDS}
+        criteria_key = "|".join(search[field] for field in CRITERIA_FIELDS)
+        now = time.time()
+        rows = []
+        for lead in leads:
+            if not isinstance(lead, dict) or not lead.get("company_name"):
+                continue
+            company_key = normalize_company_name(lead["company_name"])
+            domain = normalize_domain(lead.get("website"))
+            research = by_domain.get(domain) or by_name.get(company_key) or {}
+            row = {field: self._text(lead.get(field)) for field in LEAD_FIELDS}
+            row.update({field: self._text(research.get(field)) for field in RESEARCH_FIELDS})
+            row.update(search)
+            row.update({
+                "lead_key": f"{company_key}|{criteria_key}",
+                "company_key": company_key,
+                "domain": domain,
+                "funding_status_key": normalize_text(lead.get("funding_status")),
+                "created_at": now,
+                "updated_at": now
+            })
+            rows.append(row)
+        if not rows:
+            return 0
+
+        columns = list(rows[0])
+        updates = ", ".join(f"{column} = excluded.{column}" for column in columns
+                            if column not in ("lead_key", "created_at"))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO leads ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+                f"ON CONFLICT(lead_key) DO UPDATE SET {updates}",
+                [tuple(row[column] for column in columns) for row in rows]
+            )
+        return len(rows)
+
+    def query_leads(self,
+                    industry: Optional[str] = None,
+                    geography: Optional[str] = None,
+                    funding_status: Optional[str] = None,
+                    domain: Optional[str] = None,
+                    company_stage: Optional[str] = None,
+                    limit: int = 50,
+                    offset: int = 0) -> Dict[str, Any]:
+        """
+        Find stored leads; filters are exact matches after normalization
+
+        Args:
+            industry (str, optional): Industry the lead was searched under
+            geography (str, optional): Geography the lead was searched under
+            funding_status (str, optional): Lead funding status, e.g. "Series A"
+            domain (str, optional): Company website or domain
+            company_stage (str, optional): Company stage the lead was searched under
+            limit (int): Maximum number of leads returned
+            offset (int): Number of matching leads to skip
+
+        Returns:
+            dict: {"leads": [...], "total": matching lead count}
+        """
+        filters = {
+            "industry": normalize_text(industry),
+            "geography": normalize_text(geography),
+            "funding_status_key": normalize_text(funding_status),
+            "domain": normalize_domain(domain),
+            "company_stage": normalize_text(company_stage)
+        }
+        conditions = [(column, value) for column, value in filters.items() if value]
+        where = " AND ".join(f"{column} = ?" for column, _ in conditions) or "1 = 1"
+        params = [value for _, value in conditions]
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM leads WHERE {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT * FROM leads WHERE {where} ORDER BY updated_at DESC, id LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return {"leads": [self._to_dict(row) for row in rows], "total": total}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            leads, companies = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT company_key) FROM leads"
+            ).fetchone()
+        return {"leads": leads, "companies": companies}
+
+    @staticmethod
+    def _text(value: Any) -> str:
+        if value is None:
+            return ""
+        if isinstance(value, list):
+            return ", ".join(str(item) for item in value)
+        return str(value)
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        lead = {field: row[field] for field in LEAD_FIELDS}
+        lead["research"] = {field: row[field] for field in RESEARCH_FIELDS}
+        lead["search_criteria"] = {field: row[field] for field in CRITERIA_FIELDS}
+        lead["updated_at"] = datetime.fromtimestamp(row["updated_at"]).isoformat()
+        return lead
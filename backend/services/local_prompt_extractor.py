@@ -0,0 +1,331 @@
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+import sys
+import os
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+from utils.envutils import EnvUtils
+
+US_STATES = [
+    "Alabama", "Alaska", "Arizona", "Arkansas", "California", "Colorado", "Connecticut",
+    "Delaware", "Florida", "Georgia", "Hawaii", "Idaho", "Illinois", "Indiana", "Iowa",
+    "Kansas", "Kentucky", "Louisiana", "Maine", "Maryland", "Massachusetts", "Michigan",
+    "Minnesota", "Mississippi", "Missouri", "Montana", "Nebraska", "Nevada", "New Hampshire",
+    "New Jersey", "New Mexico", "New York", "North Carolina", "North Dakota", "Ohio",
+    "Oklahoma", "Oregon", "Pennsylvania", "Rhode Island", "South Carolina", "South Dakota",
+    "Tennessee", "Texas", "Utah", "Vermont", "Virginia", "Washington", "West Virginia",
+    "Wisconsin", "Wyoming"
+]
+
+CITIES_AND_REGIONS = [
+    "San Francisco", "Bay Area", "Silicon Valley", "Los Angeles", "San Diego", "Seattle",
+    "Austin", "Dallas", "Houston", "Boston", "Chicago", "Miami", "Atlanta", "Denver",
+    "New York City", "NYC", "London", "Berlin", "Paris", "Amsterdam", "Stockholm", "Dublin",
+    "Toronto", "Vancouver", "Singapore", "Bangalore", "Bengaluru", "Mumbai", "Tel Aviv",
+    "Sydney", "Tokyo", "Dubai", "North America", "South America", "Latin America", "LATAM",
+    "Europe", "EMEA", "APAC", "Asia", "Southeast Asia", "Middle East", "Africa", "Nordics",
+    "USA", "US", "United States", "UK", "United Kingdom", "Canada", "Germany", "France",
+    "India", "Israel", "Australia", "Japan", "Brazil", "Mexico", "Spain", "Italy",
+    "Netherlands", "Sweden", "Switzerland", "Ireland", "China"
+]
+
+# Canonical value -> phrases that mean it
+COMPANY_STAGES = {
+    "startup": ["startups", "startup", "start-ups", "start-up", "early-stage", "early stage"],
+    "smb": ["smbs", "smb", "small businesses", "small business", "mid-sized", "midsize",
+            "small and medium businesses", "small and medium-sized businesses"],
+    "enterprise": ["enterprises", "enterprise", "large companies", "fortune 500"],
+    "growing": ["high-growth", "high growth", "scale-ups", "scaleups", "scale-up", "growing"]
+}
+
+FUNDING_STAGES = {
+    "pre-seed": ["pre-seed", "preseed"],
+    "seed": ["seed-stage", "seed stage", "seed"],
+    "series a": ["series a"],
+    "series b": ["series b"],
+    "series c": ["series c"],
+    "series d": ["series d"],
+    "series e": ["series e"],
+    "series f": ["series f"],
+    "ipo": ["ipo", "publicly traded", "public companies"],
+    "bootstrapped": ["bootstrapped", "self-funded"]
+}
+
+INDUSTRIES = {
+    "retail": ["retail", "retailers", "retailer"],
+    "e-commerce": ["e-commerce", "ecommerce", "online retail"],
+    "healthcare": ["healthcare", "health care", "healthtech", "medical"],
+    "fintech": ["fintech", "financial technology"],
+    "finance": ["finance", "financial services", "banking", "banks"],
+    "insurance": ["insurance", "insurtech"],
+    "education": ["education", "edtech"],
+    "manufacturing": ["manufacturing", "manufacturers"],
+    "logistics": ["logistics", "supply chain", "shipping"],
+    "real estate": ["real estate", "proptech"],
+    "energy": ["energy", "renewable energy", "cleantech", "climate tech"],
+    "automotive": ["automotive", "mobility"],
+    "travel": ["travel", "hospitality"],
+    "media": ["media", "entertainment"],
+    "gaming": ["gaming", "video games"],
+    "agriculture": ["agriculture", "agtech"],
+    "biotech": ["biotech", "biotechnology", "life sciences"],
+    "pharmaceuticals": ["pharmaceutical", "pharmaceuticals", "pharma"],
+    "cybersecurity": ["cybersecurity", "cyber security", "security"],
+    "software": ["saas", "software"],
+    "technology": ["technology", "tech"],
+    "quantum computing": ["quantum computing"],
+    "artificial intelligence": ["artificial intelligence", "ai companies"],
+    "telecommunications": ["telecommunications", "telecom"],
+    "food and beverage": ["food and beverage", "food", "restaurants", "foodtech"],
+    "fashion": ["fashion", "apparel"],
+    "construction": ["construction"],
+    "legal": ["legal", "legaltech"],
+    "marketing": ["marketing", "advertising", "adtech"]
+}
+
+# Phrases introducing the product/technology focus; the product runs to the end
+# of the clause, or to where another field (a place, stage or funding round) starts
+PRODUCT_MARKERS = [
+    "interested in", "looking for", "that need", "who need", "in need of",
+    "focused on", "focusing on", "working on", "using", "adopting", "that use", "who use"
+]
+
+# Phrases that end a product clause even when the place after them is not in a gazetteer
+LOCATION_PHRASES = ["based in", "based out of", "located in", "headquartered in", "operating in"]
+
+# Words left dangling at the end of a product clause once it is cut short,
+# e.g. the "in the" of "radiology in the US"
+PRODUCT_TRAILERS = {
+    "in", "at", "from", "for", "across", "within", "throughout", "into", "near", "around",
+    "by", "on", "outside", "and", "or", "that", "which", "who", "are", "is", "with", "of",
+    "to", "the", "a", "an"
+}
+
+# Negated criteria ("not seed funded", "outside California") would be read as
+# the criteria themselves, so prompts containing them always go to the LLM
+NEGATION = re.compile(
+    r"\b(?:not|no|none|never|except|excluding|exclude|outside|without|other than)\b(?!-)|n't\b",
+    re.IGNORECASE
+)
+
+# Words that carry no criteria in a lead generation request
+FILLER_WORDS = {
+    "generate", "find", "get", "give", "show", "list", "search", "me", "us", "please",
+    "leads", "lead", "prospects", "prospect", "companies", "company", "businesses",
+    "business", "firms", "organizations", "brands", "players", "targets", "target",
+    "targeting", "for", "in", "the", "a", "an", "of", "and", "or", "with", "that", "which",
+    "who", "are", "is", "based", "located", "headquartered", "operating", "from", "at",
+    "on", "to", "stage", "funded", "funding", "round", "raised", "have", "has", "some",
+    "all", "any", "new", "top", "potential", "sector", "industry", "space", "market"
+}
+
+FIELDS = ["industry", "company_stage", "geography", "funding_stage", "product"]
+
+
+class LocalPromptExtractor:
+    """
+    Rule-based extractor for lead criteria
+
+    Uses gazetteers for industries, geographies, company stages and funding
+    rounds, plus spaCy place entities when a model is installed. Alongside
+    the fields it returns a confidence score: the share of meaningful words
+    in the prompt that the extracted fields account for. Prompts with words
+    it cannot place score low and should go to the LLM instead.
+    """
+    _nlp = None
+    _nlp_loaded = False
+    _nlp_lock = threading.Lock()
+
+    def __init__(self):
+        config = EnvUtils().get_config({'SPACY_MODEL': 'en_core_web_sm'})
+        self.spacy_model = config['SPACY_MODEL']
+        self._geographies = sorted(US_STATES + CITIES_AND_REGIONS, key=len, reverse=True)
+
+    def extract(self, prompt: str) -> Tuple[Dict[str, str], float]:
+        """
+        Extract lead criteria from a prompt
+
+        Args:
+            prompt (str): Natural-language lead generation request
+
+        Returns:
+            tuple: (fields, confidence) where fields has the same keys as
+                   UserPromptExtractor.extract_lead_info and confidence is 0-1,
+                   and 0 for prompts that negate a criterion
+        """
+        text = " ".join(prompt.split())
+        covered: List[Tuple[int, int]] = []
+        fields = {field: "" for field in FIELDS}
+        negated = NEGATION.search(text) is not None
+
+        # Product first: its clause may contain words that look like other fields
+        product_span = self._find_product(text)
+        conflicts: List[Tuple[int, int]] = []
+        if product_span:
+            start, end = product_span
+            fields["product"] = text[start:end].strip(" .,;")
+            covered.append((start - 1, end))
+            conflicts = self._product_conflicts(text, product_span)
+            search_text = text[:start] + " " * (end - start) + text[end:]
+        else:
+            search_text = text
+
+        fields["geography"] = self._match_geography(search_text, covered)
+        fields["company_stage"] = self._match_phrases(search_text, COMPANY_STAGES, covered)
+        fields["funding_stage"] = self._match_phrases(search_text, FUNDING_STAGES, covered)
+        fields["industry"] = self._match_phrases(search_text, INDUSTRIES, covered)
+
+        if product_span:
+            marker_start = self._marker_start(text, product_span[0])
+            covered.append((marker_start, product_span[0]))
+
+        return fields, 0.0 if negated else self._confidence(text, fields, covered, conflicts)
+
+    def _find_product(self, text: str) -> Optional[Tuple[int, int]]:
+        lowered = text.lower()
+        best = None
+        for marker in PRODUCT_MARKERS:
+            match = re.search(rf"\b{re.escape(marker)}\s+", lowered)
+            if match and (best is None or match.start() < best[0]):
+                best = (match.start(), match.end())
+        if best is None:
+            return None
+        start = best[1]
+        end_match = re.search(r"[.;!?]", text[start:])
+        end = start + end_match.start() if end_match else len(text)
+
+        # Cut the clause where another field starts. A hit right at the start
+        # is kept as part of the product ("focused on growing revenue").
+        clause = text[start:end]
+        boundaries = [span_start for span_start, _ in self._field_spans(clause) if span_start > 0]
+        boundaries += [
+            match.start() for phrase in LOCATION_PHRASES
+            for match in re.finditer(rf"\b{re.escape(phrase)}\b", clause, re.IGNORECASE)
+        ]
+        if boundaries:
+            end = start + min(boundaries)
+            end = self._trim_trailers(text, start, end)
+        return (start, end) if text[start:end].strip(" .,;") else None
+
+    @staticmethod
+    def _trim_trailers(text: str, start: int, end: int) -> int:
+        """End of text[start:end] without trailing connectives, spaces and commas"""
+        while True:
+            match = re.search(r"(?:^|[\s,])([\w\-']+)[\s,]*$", text[start:end])
+            if not match or match.group(1).lower() not in PRODUCT_TRAILERS:
+                break
+            end = start + match.start()
+        while end > start and text[end - 1] in " ,":
+            end -= 1
+        return end
+
+    def _field_spans(self, text: str) -> List[Tuple[int, int]]:
+        """Spans of gazetteer geographies, company stages and funding rounds in text"""
+        spans = []
+        for place in self._geographies:
+            flags = 0 if len(place) <= 4 and place.isupper() else re.IGNORECASE
+            spans += [match.span() for match in re.finditer(rf"\b{re.escape(place)}\b", text, flags)]
+        for gazetteer in (COMPANY_STAGES, FUNDING_STAGES):
+            for phrases in gazetteer.values():
+                for phrase in phrases:
+                    spans += [
+                        match.span()
+                        for match in re.finditer(rf"\b{re.escape(phrase)}\b", text, re.IGNORECASE)
+                    ]
+        return spans
+
+    def _product_conflicts(self, text: str, product_span: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """
+        Spans inside the product that look like another field: gazetteer hits
+        kept at its start and places spaCy finds. Their words count as
+        unexplained, so a product that may have swallowed a location scores low.
+        """
+        start, end = product_span
+        product = text[start:end]
+        spans = self._field_spans(product)
+        spans += [
+            (entity_start, entity_end) for entity_start, entity_end, label in self._spacy_entities(product)
+            if label in ("GPE", "LOC")
+        ]
+        return [(start + span_start, start + span_end) for span_start, span_end in spans]
+
+    @staticmethod
+    def _marker_start(text: str, product_start: int) -> int:
+        lowered = text.lower()
+        starts = [
+            match.start() for marker in PRODUCT_MARKERS
+            for match in re.finditer(rf"\b{re.escape(marker)}\s+", lowered)
+            if match.end() == product_start
+        ]
+        return min(starts) if starts else product_start
+
+    def _match_geography(self, text: str, covered: List[Tuple[int, int]]) -> str:
+        for place in self._geographies:
+            # Short abbreviations (US, UK, NYC) must match case-sensitively
+            flags = 0 if len(place) <= 4 and place.isupper() else re.IGNORECASE
+            match = re.search(rf"\b{re.escape(place)}\b", text, flags)
+            if match:
+                covered.append(match.span())
+                return place
+
+        for start, end, label in self._spacy_entities(text):
+            if label in ("GPE", "LOC"):
+                covered.append((start, end))
+                return text[start:end]
+        return ""
+
+    @staticmethod
+    def _match_phrases(text: str, gazetteer: Dict[str, List[str]], covered: List[Tuple[int, int]]) -> str:
+        best = None
+        for canonical, phrases in gazetteer.items():
+            for phrase in phrases:
+                match = re.search(rf"\b{re.escape(phrase)}\b", text, re.IGNORECASE)
+                if match and (best is None or len(phrase) > best[1]):
+                    best = (canonical, len(phrase), match.span())
+        if best is None:
+            return ""
+        covered.append(best[2])
+        return best[0]
+
+    def _spacy_entities(self, text: str) -> List[Tuple[int, int, str]]:
+        nlp = self._load_spacy()
+        if nlp is None:
+            return []
+        return [(ent.start_char, ent.end_char, ent.label_) for ent in nlp(text).ents]
+
+    def _load_spacy(self):
+        cls = self.__class__
+        with cls._nlp_lock:
+            if not cls._nlp_loaded:
+                cls._nlp_loaded = True
+                try:
+                    import spacy
+                    cls._nlp = spacy.load(self.spacy_model)
+                except Exception as e:
+                    print(f"spaCy model '{self.spacy_model}' unavailable, using gazetteers only: {e}")
+                    cls._nlp = None
+            return cls._nlp
+
+    @staticmethod
+    def _confidence(text: str, fields: Dict[str, str], covered: List[Tuple[int, int]],
+                    conflicts: Optional[List[Tuple[int, int]]] = None) -> float:
+        """
+        Share of non-filler words that fall inside an extracted span; words in
+        a conflict span (another field's hit inside the product) never count
+        """
+        if not fields["industry"]:
+            return 0.0
+        words = [
+            (match.start(), match.end()) for match in re.finditer(r"[A-Za-z0-9][\w\-']*", text)
+            if match.group(0).lower() not in FILLER_WORDS
+        ]
+        if not words:
+            return 0.0
+        explained = sum(
+            1 for start, end in words
+            if any(span_start <= start and end <= span_end for span_start, span_end in covered)
+            and not any(span_start <= start and end <= span_end for span_start, span_end in conflicts or [])
+        )
+        return round(explained / len(words), 3)
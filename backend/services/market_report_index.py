@@ -0,0 +1,173 @@
+import hashlib
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional
+import sys
+import os
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "into",
+    "is", "it", "its", "of", "on", "or", "that", "the", "their", "this", "to", "with", "will",
+    "can", "more", "than", "such", "these", "they", "which", "while", "who", "also", "our", "your"
+}
+_HEADING = re.compile(r"^\s*(?:#{1,6}\s*|\**\s*\d+[.)]\s*)\**\s*([^\n]{2,80}?)\s*\**:?\**\s*$")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased words without stopwords, with a naive plural strip"""
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        if len(word) > 4 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+class MarketReportIndex:
+    """
+    BM25 index over the chunks of one market research report
+
+    The report is split at its section headings (the five numbered sections
+    the report prompt asks for), then into paragraph chunks of at most
+    chunk_words words. Each chunk remembers its section, whose title is
+    indexed with the chunk text.
+    """
+
+    def __init__(self, report: str, chunk_words: int = 120, k1: float = 1.5, b: float = 0.75):
+        self.chunks = self.split_report(report, chunk_words)
+        self.k1 = k1
+        self.b = b
+        self._terms = [Counter(tokenize(f"{chunk['section']} {chunk['text']}")) for chunk in self.chunks]
+        self._lengths = [sum(terms.values()) for terms in self._terms]
+        self._average_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+        document_frequency = Counter(term for terms in self._terms for term in terms)
+        count = len(self.chunks)
+        self._idf = {
+            term: math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequency.items()
+        }
+
+    @staticmethod
+    def split_report(report: str, chunk_words: int = 120) -> List[Dict[str, str]]:
+        """
+        Split a report into chunks
+
+        Args:
+            report (str): Market research report text
+            chunk_words (int): Maximum words per chunk
+
+        Returns:
+            list: {"section": heading, "text": chunk text} dicts in report order
+        """
+        chunks = []
+        section = ""
+        pending: List[str] = []
+
+        def flush():
+            words = " ".join(pending).split()
+            pending.clear()
+            if words:
+                chunks.append({"section": section, "text": " ".join(words)})
+
+        for paragraph in re.split(r"\n\s*\n", report or ""):
+            lines = paragraph.strip().splitlines()
+            # A heading may sit directly above its first paragraph
+            if lines and _HEADING.match(lines[0]) and len(lines[0].split()) <= 10:
+                flush()
+                section = re.sub(r"^\d+[.)]\s*", "", _HEADING.match(lines[0]).group(1).strip(" *:#"))
+                lines = lines[1:]
+            # Drop markdown emphasis and bullet markers
+            text = " ".join(
+                re.sub(r"^[-*\u2022]\s+", "", line.replace("**", "").strip())
+                for line in lines if line.strip()
+            )
+            if not text:
+                continue
+            # Long paragraphs are split on sentence boundaries
+            for sentence in _SENTENCE_END.split(text):
+                if pending and len(" ".join(pending).split()) + len(sentence.split()) > chunk_words:
+                    flush()
+                pending.append(sentence)
+            if len(" ".join(pending).split()) >= chunk_words // 2:
+                flush()
+        flush()
+        return chunks
+
+    def search(self, query: str, top_k: int = 3) -> List[Dict[str, str]]:
+        """
+        Return the chunks that best match a query
+
+        Args:
+            query (str): Free text, e.g. a company's description and products
+            top_k (int): Maximum number of chunks
+
+        Returns:
+            list: Matching chunks, best first; chunks sharing no term with the query are left out
+        """
+        terms = set(tokenize(query))
+        scores = []
+        for index, chunk_terms in enumerate(self._terms):
+            score = 0.0
+            length_norm = 1 - self.b + self.b * self._lengths[index] / (self._average_length or 1)
+            for term in terms:
+                frequency = chunk_terms.get(term)
+                if frequency:
+                    score += self._idf[term] * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+            if score > 0:
+                scores.append((score, index))
+        scores.sort(key=lambda item: (-item[0], item[1]))
+        return [self.chunks[index] for _, index in scores[:top_k]]
+
+
+_indexes: "OrderedDict[str, MarketReportIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_report_index(report: str, chunk_words: int = 120, max_indexes: int = 64) -> MarketReportIndex:
+    """
+    Return the index of a report, building it on first use
+
+    Reports are cached for days and serve many runs, so their indexes are
+    kept in a small process-wide LRU keyed by the report content.
+    """
+    key = hashlib.sha1(f"{chunk_words}:{report}".encode("utf-8")).hexdigest()
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+    index = MarketReportIndex(report, chunk_words)
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > max_indexes:
+            _indexes.popitem(last=False)
+    return index
+
+
+def company_query(company: Dict[str, Any]) -> str:
+    """Retrieval query for a company: its description and products"""
+    parts = [company.get("description"), company.get("product_list")]
+    return " ".join(
+        ", ".join(map(str, part)) if isinstance(part, list) else str(part)
+        for part in parts if part
+    )
+
+
+def format_chunks(chunks: List[Dict[str, str]], numbers: Optional[List[int]] = None) -> str:
+    """Render chunks as prompt text, one per line, tagged with their section"""
+    lines = []
+    for position, chunk in enumerate(chunks):
+        prefix = f"[{numbers[position]}] " if numbers else "- "
+        section = f"({chunk['section']}) " if chunk["section"] else ""
+        lines.append(f"{prefix}{section}{chunk['text']}")
+    return "\n".join(lines)
@@ -1,15 +1,12 @@
-import os
-import ast
-import json
-import requests
 from typing import Dict, Any, Optional
-from dotenv import load_dotenv
 import sys
 import os
 parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 from utils.envutils import EnvUtils
+from utils.result_cache import get_cache
+from utils.http_transport import PerplexityTransport
 
 class MarketResearchService:
     def __init__(self):
@@ -23,6 +20,19 @@ class MarketResearchService:
         # Perplexity API Key
         self.perplexity_api_key = os.getenv('PERPLEXITY_API_KEY')
 
+        # Shared pooled Perplexity client
+        self.transport = PerplexityTransport()
+
+        # Reports change slowly: keep them on disk, serve them instantly and
+        # refresh them in the background once they are older than a day
+        self.report_cache = get_cache(
+            "market_research_reports", "MARKET_CACHE",
+            default_ttl_seconds=30 * 86400,
+            default_max_entries=500,
+            default_backend='sqlite',
+            default_fresh_seconds=86400
+        )
+
     def generate_market_research(
         self, 
         industry: Optional[str] = None, 
@@ -38,10 +48,56 @@ class MarketResearchService:
         # Construct search query
         search_query = self._build_search_query(industry, product)
         
-        # Generate insights
-        insights = self._generate_perplexity_insights(search_query)
+        # Validate API key
+        if not self.perplexity_api_key:
+            return "Perplexity API key is missing. Unable to generate insights."
+
+        # Serve the stored report, generating insights only on a cold miss
+        try:
+            return self.report_cache.get_or_load(
+                self._normalize_query(search_query),
+                lambda: self._generate_perplexity_insights(search_query)
+            )
+        except Exception as e:
+            return self._stale_report(self._normalize_query(search_query), e)
+
+    async def agenerate_market_research(
+        self, 
+        industry: Optional[str] = None, 
+        product: Optional[str] = None
+    ) -> str:
+        """
+        Async variant of generate_market_research.
+        
+        :param industry: Target industry
+        :param product: Specific product or technology
+        :return: Comprehensive market research insights as a string
+        """
+        search_query = self._build_search_query(industry, product)
         
-        return insights
+        if not self.perplexity_api_key:
+            return "Perplexity API key is missing. Unable to generate insights."
+
+        cache_key = self._normalize_query(search_query)
+        try:
+            insights = self.report_cache.lookup(
+                cache_key, lambda: self._generate_perplexity_insights(search_query)
+            )
+            if insights is None:
+                insights = await self._agenerate_perplexity_insights(search_query)
+                self.report_cache.set(cache_key, insights)
+            return insights
+        except Exception as e:
+            return self._stale_report(cache_key, e)
+
+    def _stale_report(self, cache_key: str, error: Exception) -> str:
+        """Serve an expired report when Perplexity fails, or the error if none was ever stored"""
+        stale = self.report_cache.get_stale(cache_key)
+        if stale is None:
+            print(f"Error generating insights: {error}")
+            return f"An error occurred while generating insights: {str(error)}"
+        print(f"{error}; serving report cached {stale[1] / 86400:.1f} days ago")
+        return stale[0]
 
     def _build_search_query(self, industry: Optional[str], product: Optional[str]) -> str:
         """
@@ -61,20 +117,49 @@ class MarketResearchService:
         
         return " ".join(query_parts) if query_parts else "technology innovation"
 
+    @staticmethod
+    def _normalize_query(query: str) -> str:
+        """
+        Normalize a search query into a report cache key.
+
+        Case, word order, repeated words and whitespace are ignored, so
+        "AI in Retail" and "retail  ai in" share a report.
+
+        :param query: Search query from _build_search_query
+        :return: Normalized cache key
+        """
+        return " ".join(sorted(set(query.lower().split())))
+
     def _generate_perplexity_insights(self, query: str) -> str:
         """
         Generate market research insights using Perplexity AI.
         
         :param query: Search query
         :return: Comprehensive market research insights as a string
+        :raises Exception: If the API call fails or returns no insights
         """
-        # Validate API key
-        if not self.perplexity_api_key:
-            return "Perplexity API key is missing. Unable to generate insights."
+        # Make API call
+        response_data = self.transport.chat_completion(self._build_insights_payload(query))
+        return self._extract_insights(response_data)
 
-        # Perplexity API endpoint
-        url = "https://api.perplexity.ai/chat/completions"
+    async def _agenerate_perplexity_insights(self, query: str) -> str:
+        """
+        Async variant of _generate_perplexity_insights.
+        
+        :param query: Search query
+        :return: Comprehensive market research insights as a string
+        :raises Exception: If the API call fails or returns no insights
+        """
+        response_data = await self.transport.achat_completion(self._build_insights_payload(query))
+        return self._extract_insights(response_data)
 
+    def _build_insights_payload(self, query: str) -> Dict[str, Any]:
+        """
+        Build the Perplexity request for a market research report.
+        
+        :param query: Search query
+        :return: Chat completion payload
+        """
         # Construct detailed prompt for comprehensive insights
         prompt = f"""You are a top-tier market research analyst conducting an in-depth strategic analysis on {query}. 
 
@@ -114,7 +199,7 @@ Provide specific, data-driven insights with a clear, structured approach that of
 """
 
         # Payload for Perplexity API
-        payload = {
+        return {
             "model": self.model,
             "messages": [
                 {
@@ -128,26 +213,21 @@ Provide specific, data-driven insights with a clear, structured approach that of
             ]
         }
 
-        # API request headers
-        headers = {
-            "Authorization": f"Bearer {self.perplexity_api_key}",
-            "Content-Type": "application/json"
-        }
-
-        try:
-            # Make API call
-            response = requests.post(url, json=payload, headers=headers)
-            response_data = response.json()
-            
-            # Extract and return insights
-            insights = response_data.get('choices', [{}])[0].get('message', {}).get('content', 
-                "Unable to generate insights. Please try again.")
-            
-            return insights
+    @staticmethod
+    def _extract_insights(response_data: Dict[str, Any]) -> str:
+        """
+        Extract the report text from a Perplexity response.
         
-        except Exception as e:
-            print(f"Error generating insights: {e}")
-            return f"An error occurred while generating insights: {str(e)}"
+        :param response_data: Decoded chat completion response
+        :return: Report text
+        :raises ValueError: If the response holds no insights
+        """
+        # Extract and return insights; failures raise so they are never cached
+        insights = response_data.get('choices', [{}])[0].get('message', {}).get('content')
+        if not insights:
+            raise ValueError("Unable to generate insights. Please try again.")
+        
+        return insights
 
 def generate_market_research(
     industry: Optional[str] = None, 
@@ -1,12 +1,15 @@
 import json
+import os
+
+DEFAULT_JSON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "retail_startup.json")
 
 class JSONFileReader:
-    def __init__(self):
+    def __init__(self, file_path=None):
         """
         Initializes the JSONFileReader with the file path.
-        :param file_path: Path to the JSON file
+        :param file_path: Path to the JSON file; defaults to the sample leads in the backend directory
         """
-        self.file_path = r"C:\\SalesSphere\\backend\\retail_startup.json"
+        self.file_path = file_path or DEFAULT_JSON_PATH
 
     def read_json(self):
         """
@@ -26,9 +29,6 @@ class JSONFileReader:
 
 # Main method
 if __name__ == "__main__":
-    # Specify the file path
-    file_path = r"C:\\SalesSphere\\backend\\retail_startup.json"
-
     # Create an instance of the JSONFileReader class
     reader = JSONFileReader()
 
@@ -0,0 +1,300 @@
+import asyncio
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+import sys
+import os
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+from utils.envutils import EnvUtils
+from utils.rate_limiter import request_priority, PRIORITY_INTERACTIVE
+from utils.metrics import RESEARCH_JOBS, RESEARCH_JOBS_FINISHED, RESEARCH_REQUESTS_COALESCED
+
+
+class JobQueueFullError(Exception):
+    """Raised when too many research jobs are already waiting or running"""
+
+
+class PartialResult:
+    """Runner result for a run cut short, e.g. by its deadline; the job completes with partial=True"""
+
+    def __init__(self, result: Any):
+        self.result = result
+
+
+class ResearchJob:
+    """State of a single background research run"""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+    def __init__(self, job_id: str, query: str, dedupe_key: Optional[str] = None,
+                 priority: int = PRIORITY_INTERACTIVE):
+        self.job_id = job_id
+        self.query = query
+        self.dedupe_key = dedupe_key
+        self.priority = priority
+        # Number of later requests that attached to this run instead of starting their own
+        self.coalesced_requests = 0
+        # Resolves once the worker is done with the job (asyncio.wrap_future friendly)
+        self.completion: Optional[Future] = None
+        self.status = self.QUEUED
+        self.result: Any = None
+        # True when the result only holds what was finished before the deadline
+        self.partial = False
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.finished_monotonic: Optional[float] = None
+        self.events: List[Dict[str, Any]] = []
+        self._events_lock = threading.RLock()
+        # (event loop, asyncio.Event) of every open event stream
+        self._listeners: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (self.COMPLETED, self.FAILED)
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        """
+        Record a progress event and wake up any stream listeners
+
+        Args:
+            event (dict): Event payload; must contain an "event" name
+        """
+        with self._events_lock:
+            self.events.append({"id": len(self.events), **event})
+            listeners = list(self._listeners)
+        # Events are published from worker threads; listeners live on the event loop
+        for loop, changed in listeners:
+            try:
+                loop.call_soon_threadsafe(changed.set)
+            except RuntimeError:
+                # The listener's loop is closed; it is removed when its stream ends
+                pass
+
+    def finish(self, status: str, result: Any = None, error: Optional[str] = None,
+               partial: bool = False) -> None:
+        """
+        Mark the job finished and publish its terminal event in one step, so
+        stream listeners never see a finished job without its final event
+
+        Args:
+            status (str): COMPLETED or FAILED
+            result (Any): Job result for completed jobs
+            error (str, optional): Error message for failed jobs
+            partial (bool): Whether a completed job's result is incomplete
+        """
+        with self._events_lock:
+            self.result = result
+            self.partial = partial
+            self.error = error
+            self.finished_at = datetime.now()
+            self.finished_monotonic = time.monotonic()
+            self.status = status
+            if status == self.COMPLETED:
+                self.publish({"event": "job_completed", "result": result, "partial": partial})
+            else:
+                self.publish({"event": "job_failed", "error": error})
+
+    async def aiter_events(self, start: int = 0, timeout: float = 15.0) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Yield progress events as they are published, ending once the job finishes
+
+        Waits on the event loop rather than blocking a thread, so an open
+        stream costs no worker for the length of the run.
+
+        Args:
+            start (int): Index of the first event to yield (for reconnects)
+            timeout (float): Seconds to wait for a new event before yielding None
+                             so callers can send keep-alives
+
+        Yields:
+            dict or None: The next event, or None when nothing arrived in time
+        """
+        listener = (asyncio.get_running_loop(), asyncio.Event())
+        changed = listener[1]
+        with self._events_lock:
+            self._listeners.append(listener)
+        try:
+            position = start
+            while True:
+                # Cleared before reading, so a publish after the read wakes the wait below
+                changed.clear()
+                with self._events_lock:
+                    pending = self.events[position:]
+                    finished = self.is_finished
+                for event in pending:
+                    yield event
+                position += len(pending)
+                if finished and position >= len(self.events):
+                    return
+                if not pending:
+                    try:
+                        await asyncio.wait_for(changed.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        yield None
+        finally:
+            with self._events_lock:
+                self._listeners.remove(listener)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the job for API responses"""
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "query": self.query,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "result": self.result,
+            "partial": self.partial,
+            "error": self.error,
+            "coalesced_requests": self.coalesced_requests
+        }
+
+
+class ResearchJobService:
+    """
+    Runs research pipelines on a bounded background worker pool.
+
+    Jobs are kept in memory; finished jobs are pruned once they are older
+    than the configured TTL so polling clients have time to fetch results.
+    """
+
+    def __init__(self,
+                 max_workers: Optional[int] = None,
+                 max_pending: Optional[int] = None,
+                 job_ttl_seconds: Optional[int] = None):
+        config = EnvUtils().get_config({
+            'RESEARCH_MAX_WORKERS': 4,
+            'RESEARCH_MAX_PENDING_JOBS': 500,
+            'RESEARCH_JOB_TTL_SECONDS': 3600
+        })
+        self.max_workers = int(max_workers or config['RESEARCH_MAX_WORKERS'])
+        self.max_pending = int(max_pending or config['RESEARCH_MAX_PENDING_JOBS'])
+        self.job_ttl_seconds = int(job_ttl_seconds or config['RESEARCH_JOB_TTL_SECONDS'])
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="research-worker"
+        )
+        self._jobs: Dict[str, ResearchJob] = {}
+        # Unfinished jobs by dedupe key, so identical requests share one run
+        self._in_flight: Dict[str, ResearchJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, query: str, runner: Callable[[ResearchJob], Any],
+               dedupe_key: Optional[str] = None,
+               priority: int = PRIORITY_INTERACTIVE) -> Tuple[ResearchJob, bool]:
+        """
+        Queue a research run and return immediately
+
+        Requests with the same dedupe_key as an unfinished job attach to that
+        job instead of starting another run.
+
+        Args:
+            query (str): Original user query, kept for status responses
+            runner (callable): Called with the job; produces the job result, or a
+                               PartialResult, and may publish progress events on it
+            dedupe_key (str, optional): Key identifying equivalent requests
+            priority (int): Rate limiter priority for the job's LLM calls
+
+        Returns:
+            tuple: (job, coalesced) where coalesced is True if the request was
+                   attached to an in-flight job
+
+        Raises:
+            JobQueueFullError: If the number of unfinished jobs hits the cap
+        """
+        with self._lock:
+            self._prune_finished()
+            leader = self._in_flight.get(dedupe_key) if dedupe_key else None
+            if leader is not None and not leader.is_finished:
+                leader.coalesced_requests += 1
+                RESEARCH_REQUESTS_COALESCED.inc()
+                return leader, True
+
+            active = sum(1 for job in self._jobs.values() if not job.is_finished)
+            if active >= self.max_pending:
+                raise JobQueueFullError(
+                    f"Too many research jobs in progress ({active}). Please retry later."
+                )
+            job = ResearchJob(uuid.uuid4().hex, query, dedupe_key, priority)
+            RESEARCH_JOBS.labels(state=ResearchJob.QUEUED).inc()
+            # Submitted under the lock, so a request coalescing onto this job
+            # always finds its completion future set
+            try:
+                job.completion = self._executor.submit(self._run, job, runner)
+            except RuntimeError:
+                # The executor has been shut down
+                RESEARCH_JOBS.labels(state=ResearchJob.QUEUED).dec()
+                raise
+            self._jobs[job.job_id] = job
+            if dedupe_key:
+                self._in_flight[dedupe_key] = job
+
+        job.completion.add_done_callback(lambda future: self._on_cancelled(job, future))
+        return job, False
+
+    def get(self, job_id: str) -> Optional[ResearchJob]:
+        """Look up a job by id"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Stop accepting work and release the worker threads"""
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _run(self, job: ResearchJob, runner: Callable[[ResearchJob], Any]) -> None:
+        RESEARCH_JOBS.labels(state=ResearchJob.QUEUED).dec()
+        RESEARCH_JOBS.labels(state=ResearchJob.RUNNING).inc()
+        job.status = ResearchJob.RUNNING
+        job.started_at = datetime.now()
+        job.publish({"event": "job_started"})
+        try:
+            with request_priority(job.priority):
+                result = runner(job)
+            if isinstance(result, PartialResult):
+                job.finish(ResearchJob.COMPLETED, result=result.result, partial=True)
+            else:
+                job.finish(ResearchJob.COMPLETED, result=result)
+        except Exception as e:
+            print(f"Research job {job.job_id} failed: {str(e)}")
+            job.finish(ResearchJob.FAILED, error=str(e))
+        finally:
+            RESEARCH_JOBS.labels(state=ResearchJob.RUNNING).dec()
+            RESEARCH_JOBS_FINISHED.labels(status=job.status).inc()
+            if job.dedupe_key:
+                with self._lock:
+                    if self._in_flight.get(job.dedupe_key) is job:
+                        del self._in_flight[job.dedupe_key]
+
+    def _on_cancelled(self, job: ResearchJob, future: Future) -> None:
+        """Fail a job whose queued run was cancelled, e.g. by shutdown, so it does not stay queued"""
+        if not future.cancelled():
+            return
+        RESEARCH_JOBS.labels(state=ResearchJob.QUEUED).dec()
+        job.finish(ResearchJob.FAILED, error="Research job was cancelled before it started")
+        RESEARCH_JOBS_FINISHED.labels(status=job.status).inc()
+        if job.dedupe_key:
+            with self._lock:
+                if self._in_flight.get(job.dedupe_key) is job:
+                    del self._in_flight[job.dedupe_key]
+
+    def _prune_finished(self) -> None:
+        """Drop finished jobs past their TTL. Caller must hold the lock."""
+        cutoff = time.monotonic() - self.job_ttl_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_monotonic is not None and job.finished_monotonic < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
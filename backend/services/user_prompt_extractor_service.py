@@ -1,11 +1,16 @@
 import json
-import requests
+import httpx
 import sys
 import os
 parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 from utils.envutils import EnvUtils
+from utils.http_transport import PerplexityTransport
+from services.local_prompt_extractor import LocalPromptExtractor
+from utils.metrics import time_stage
+from utils.deadline import DeadlineExceededError
+from utils.circuit_breaker import CircuitOpenError
 
 class UserPromptExtractor:
     def __init__(self):
@@ -16,6 +21,19 @@ class UserPromptExtractor:
         self.env_utils = EnvUtils()
         self.api_key = self.env_utils.get_required_env('PERPLEXITY_API_KEY')
         self.model = self.env_utils.get_required_env('PERPLEXITY_MODEL_NAME')
+        # Shared pooled Perplexity client
+        self.transport = PerplexityTransport()
+        # Rule-based fast path; prompts it fully understands skip the LLM call
+        config = self.env_utils.get_config({
+            'LOCAL_EXTRACTION_ENABLED': 'true',
+            'LOCAL_EXTRACTION_MIN_CONFIDENCE': 0.8
+        })
+        self.local_extractor = (
+            LocalPromptExtractor()
+            if str(config['LOCAL_EXTRACTION_ENABLED']).lower() == 'true' else None
+        )
+        self.min_local_confidence = float(config['LOCAL_EXTRACTION_MIN_CONFIDENCE'])
+
     def extract_lead_info(self, prompt):
         """
         Extract lead information from a given prompt using Perplexity API
@@ -26,12 +44,58 @@ class UserPromptExtractor:
         Returns:
             dict: Extracted lead information
         """
-        url = "https://api.perplexity.ai/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        local_result = self._extract_locally(prompt)
+        if local_result is not None:
+            return local_result
+        try:
+            with time_stage("prompt_extraction", "perplexity"):
+                response = self.transport.chat_completion(self._build_payload(prompt))
+        except (httpx.HTTPError, DeadlineExceededError, CircuitOpenError) as e:
+            print(f"API call error: {e}")
+            return self._empty_lead_info()
+        return self._parse_response(response)
+
+    async def aextract_lead_info(self, prompt):
+        """
+        Async variant of extract_lead_info, for use from async routes
         
+        Args:
+            prompt (str): Input prompt to extract information from
+        
+        Returns:
+            dict: Extracted lead information
+        """
+        local_result = self._extract_locally(prompt)
+        if local_result is not None:
+            return local_result
+        try:
+            with time_stage("prompt_extraction", "perplexity"):
+                response = await self.transport.achat_completion(self._build_payload(prompt))
+        except (httpx.HTTPError, DeadlineExceededError, CircuitOpenError) as e:
+            print(f"API call error: {e}")
+            return self._empty_lead_info()
+        return self._parse_response(response)
+
+    def _extract_locally(self, prompt):
+        """
+        Try the rule-based extractor first
+
+        Returns:
+            dict or None: Extracted lead information, or None when the local
+                          confidence is below LOCAL_EXTRACTION_MIN_CONFIDENCE
+        """
+        if self.local_extractor is None:
+            return None
+        with time_stage("prompt_extraction", "local"):
+            fields, confidence = self.local_extractor.extract(prompt)
+        if confidence < self.min_local_confidence:
+            print(f"Local extraction confidence {confidence}, falling back to LLM")
+            return None
+        print(f"Local extraction confidence {confidence}, skipping LLM call")
+        return fields
+
+    def _build_payload(self, prompt):
+        """Build the Perplexity request for extracting lead criteria from a prompt"""
         extraction_prompt = f"""
         Extract structured information from the following prompt into a JSON format. 
         The JSON should have these exact keys: "industry", "company_stage", "geography", "funding_stage", "product".
@@ -50,7 +114,7 @@ class UserPromptExtractor:
         }}
         """
         
-        payload = {
+        return {
             "model": self.model,
             "messages": [
                 {
@@ -64,49 +128,42 @@ class UserPromptExtractor:
             ],
             "max_tokens": 200
         }
+
+    def _parse_response(self, response):
+        """Parse the extracted criteria out of a Perplexity response"""
+        # Extract the content
+        content = response['choices'][0]['message']['content'].strip()
         
+        # Try to parse JSON, with fallback to a default dictionary
         try:
-            response = requests.post(url, headers=headers, json=payload)
-            response.raise_for_status()
+            # Attempt to parse the content as JSON
+            parsed_json = json.loads(content)
+            return parsed_json
+        except json.JSONDecodeError:
+            # If JSON parsing fails, try to extract JSON-like content
+            import re
             
-            # Extract the content
-            content = response.json()['choices'][0]['message']['content'].strip()
+            # Look for JSON-like content between { and }
+            json_match = re.search(r'\{[^}]+\}', content)
+            if json_match:
+                try:
+                    return json.loads(json_match.group(0))
+                except json.JSONDecodeError:
+                    pass
             
-            # Try to parse JSON, with fallback to a default dictionary
-            try:
-                # Attempt to parse the content as JSON
-                parsed_json = json.loads(content)
-                return parsed_json
-            except json.JSONDecodeError:
-                # If JSON parsing fails, try to extract JSON-like content
-                import re
-                
-                # Look for JSON-like content between { and }
-                json_match = re.search(r'\{[^}]+\}', content)
-                if json_match:
-                    try:
-                        return json.loads(json_match.group(0))
-                    except json.JSONDecodeError:
-                        pass
-                
-                # Fallback to default dictionary if parsing fails
-                print(f"Failed to parse JSON. Raw content: {content}")
-                return {
-                    "industry": "",
-                    "company_stage": "",
-                    "geography": "",
-                    "funding_stage": "",
-                    "product": ""
-                }
-        except requests.RequestException as e:
-            print(f"API call error: {e}")
-            return {
-                "industry": "",
-                "company_stage": "",
-                "geography": "",
-                "funding_stage": "",
-                "product": ""
-            }
+            # Fallback to default dictionary if parsing fails
+            print(f"Failed to parse JSON. Raw content: {content}")
+            return self._empty_lead_info()
+
+    @staticmethod
+    def _empty_lead_info():
+        return {
+            "industry": "",
+            "company_stage": "",
+            "geography": "",
+            "funding_stage": "",
+            "product": ""
+        }
 
 def main():
     # Create extractor
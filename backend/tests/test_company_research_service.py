@@ -0,0 +1,63 @@
+import asyncio
+import json
+import time
+import httpx
+import pytest
+import sys
+import os
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+from utils.result_cache import InMemoryCacheBackend, ResultCache
+from services.company_research_service import CompanyIntelligenceService
+
+COMPANIES = [{"company_name": "Example Corp", "website": "www.example.com"}]
+CRITERIA = {"industry": "retail", "geography": "California"}
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv("PERPLEXITY_API_KEY", "test-key")
+    monkeypatch.setenv("PERPLEXITY_MODEL_NAME", "sonar")
+    monkeypatch.setenv("COMPANY_STREAMING", "false")
+    service = CompanyIntelligenceService()
+    service.cache = ResultCache("test_companies", InMemoryCacheBackend(), 3600)
+
+    def unavailable(payload):
+        raise httpx.ConnectError("connection refused")
+
+    async def aunavailable(payload):
+        unavailable(payload)
+    monkeypatch.setattr(service.transport, "chat_completion", unavailable)
+    monkeypatch.setattr(service.transport, "achat_completion", aunavailable)
+    return service
+
+
+def cache_expired_entry(service):
+    key = ResultCache.make_key(industry="retail", company_name=None, product=None,
+                               company_stage=None, geography="California", funding_stage=None)
+    service.cache.backend.set(key, json.dumps(COMPANIES), time.time() - 7200)
+
+
+def test_upstream_failure_is_not_an_empty_search(service):
+    result = json.loads(service.get_company_intelligence(**CRITERIA))
+    assert result["companies"] == []
+    assert "connection refused" in result["error"]
+    assert "stale" not in result
+
+
+def test_upstream_failure_serves_expired_entry_as_stale(service):
+    cache_expired_entry(service)
+    found = []
+    result = json.loads(service.get_company_intelligence(**CRITERIA, on_company=found.append))
+    assert result["companies"] == COMPANIES and result["stale"] is True
+    assert "error" not in result
+    assert found == COMPANIES
+
+
+def test_async_upstream_failure_serves_expired_entry_as_stale(service):
+    result = json.loads(asyncio.run(service.aget_company_intelligence(**CRITERIA)))
+    assert result["companies"] == [] and "error" in result
+    cache_expired_entry(service)
+    result = json.loads(asyncio.run(service.aget_company_intelligence(**CRITERIA)))
+    assert result["companies"] == COMPANIES and result["stale"] is True
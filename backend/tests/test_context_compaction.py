@@ -0,0 +1,46 @@
+import json
+import pytest
+import sys
+import os
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+from utils.context_compaction import ContextCompactor
+
+COMPANIES = [
+    {
+        "name": f"Company {i}",
+        "website": f"www.company{i}.com",
+        "description": "Builds retail analytics software for mid-sized chains. " * 4,
+        "product_list": "Forecasting, Pricing, Inventory"
+    }
+    for i in range(10)
+]
+
+
+@pytest.mark.parametrize("budget_tokens, kept", [(800, 9), (300, 3), (120, 1)])
+def test_truncated_json_still_parses(budget_tokens, kept):
+    compacted, before, after = ContextCompactor(budget_tokens).compact([json.dumps(COMPANIES, indent=2)])
+    assert after <= budget_tokens < before
+    # Whole trailing companies are dropped; the ones kept are unchanged
+    assert json.loads(compacted) == COMPANIES[:kept]
+
+
+def test_first_item_too_long_is_cut_by_members():
+    compacted, _, _ = ContextCompactor(60).compact([json.dumps(COMPANIES)])
+    companies = json.loads(compacted)
+    assert companies == [{"name": "Company 0", "website": "www.company0.com"}]
+
+
+def test_truncated_json_next_to_prose_still_parses():
+    report = "Retail analytics is growing quickly. Chains are investing in forecasting. " * 20
+    compacted, _, after = ContextCompactor(300).compact([json.dumps(COMPANIES), report])
+    companies_part, report_part = compacted.split("\n\n", 1)
+    assert json.loads(companies_part) == COMPANIES[:len(json.loads(companies_part))]
+    assert report_part.endswith("...")
+    assert after <= 300
+
+
+def test_within_budget_is_only_trimmed():
+    compacted, _, _ = ContextCompactor(0).compact([json.dumps(COMPANIES, indent=2)])
+    assert json.loads(compacted) == COMPANIES
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import time
+import pytest
+import sys
+import os
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+from concurrent.futures import ThreadPoolExecutor
+from utils.hedging import LatencyTracker, hedged_call, ahedged_call
+
+
+class Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+    @property
+    def is_success(self):
+        return 200 <= self.status_code < 300
+
+
+def is_success(response):
+    return response.is_success
+
+
+def scripted(*steps):
+    """Call whose n-th invocation sleeps, then returns or raises, as steps[n] says"""
+    lock = threading.Lock()
+    calls = []
+
+    def call():
+        with lock:
+            delay, outcome = steps[len(calls)]
+            calls.append(outcome)
+        time.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    call.calls = calls
+    return call
+
+
+def ascripted(*steps):
+    calls = []
+
+    async def call():
+        delay, outcome = steps[len(calls)]
+        calls.append(outcome)
+        await asyncio.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    call.calls = calls
+    return call
+
+
+def test_no_delay_calls_once():
+    call = scripted((0, Response(200)))
+    response, winner = hedged_call(call, None, is_success)
+    assert response.status_code == 200 and winner is None
+    assert len(call.calls) == 1
+
+
+def test_fast_primary_is_not_hedged():
+    call = scripted((0, Response(500)))
+    response, winner = hedged_call(call, 0.2, is_success)
+    assert response.status_code == 500 and winner is None
+    assert len(call.calls) == 1
+
+
+def test_slow_primary_loses_to_hedge():
+    call = scripted((0.5, Response(200)), (0, Response(201)))
+    response, winner = hedged_call(call, 0.05, is_success)
+    assert response.status_code == 201 and winner == "hedge"
+
+
+def test_fast_error_response_does_not_beat_slower_success():
+    call = scripted((0.3, Response(200)), (0, Response(429)))
+    response, winner = hedged_call(call, 0.05, is_success)
+    assert response.status_code == 200 and winner == "primary"
+
+
+def test_raised_error_does_not_beat_slower_success():
+    call = scripted((0.3, Response(200)), (0, ConnectionError("reset")))
+    response, winner = hedged_call(call, 0.05, is_success)
+    assert response.status_code == 200 and winner == "primary"
+
+
+def test_both_failing_prefers_a_response_over_an_error():
+    call = scripted((0.2, ConnectionError("reset")), (0, Response(503)))
+    response, winner = hedged_call(call, 0.05, is_success)
+    assert response.status_code == 503 and winner == "neither"
+
+
+def test_both_raising_raises_the_primary_error():
+    call = scripted((0.2, ConnectionError("primary")), (0, TimeoutError("hedge")))
+    with pytest.raises(ConnectionError):
+        hedged_call(call, 0.05, is_success)
+
+
+def test_time_queued_for_a_worker_does_not_count_toward_delay():
+    executor = ThreadPoolExecutor(max_workers=1)
+    busy = executor.submit(time.sleep, 0.2)
+    call = scripted((0, Response(200)))
+    response, winner = hedged_call(call, 0.05, is_success, executor)
+    assert busy.done()
+    assert response.status_code == 200 and winner is None
+    assert len(call.calls) == 1
+    executor.shutdown()
+
+
+def test_async_fast_error_response_does_not_beat_slower_success():
+    call = ascripted((0.3, Response(200)), (0, Response(500)))
+    response, winner = asyncio.run(ahedged_call(call, 0.05, is_success))
+    assert response.status_code == 200 and winner == "primary"
+
+
+def test_async_slow_primary_loses_to_hedge_and_is_cancelled():
+    call = ascripted((5, Response(200)), (0, Response(201)))
+    started = time.monotonic()
+    response, winner = asyncio.run(ahedged_call(call, 0.05, is_success))
+    assert response.status_code == 201 and winner == "hedge"
+    assert time.monotonic() - started < 1
+
+
+def test_latency_tracker_needs_min_samples():
+    tracker = LatencyTracker(window=10)
+    for seconds in range(1, 5):
+        tracker.record(seconds / 10)
+    assert tracker.percentile(95, min_samples=5) is None
+    tracker.record(0.5)
+    assert tracker.percentile(95, min_samples=5) == 0.5
@@ -0,0 +1,83 @@
+import json
+import pytest
+import sys
+import os
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+import utils.http_transport as http_transport
+from utils.llm_recorder import LLMRecorder, RecordingNotFoundError
+from utils.result_cache import InMemoryCacheBackend, ResultCache
+from services.company_research_service import CompanyIntelligenceService
+
+COMPANIES = [{"company_name": "Example Corp", "website": "www.example.com"}]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """The service behind the Company Intelligence Search tool; its result is the tool output"""
+    monkeypatch.setenv("PERPLEXITY_API_KEY", "test-key")
+    monkeypatch.setenv("PERPLEXITY_MODEL_NAME", "sonar")
+    monkeypatch.setenv("COMPANY_STREAMING", "false")
+    service = CompanyIntelligenceService()
+    service.cache = ResultCache("test_companies", InMemoryCacheBackend(), 3600)
+    return service
+
+
+def live_perplexity(calls):
+    def send(payload):
+        calls.append(payload)
+        return {"choices": [{"message": {"content": json.dumps(COMPANIES)}}]}
+    return send
+
+
+def agent_request(tool_output):
+    """The agent call CrewAI makes after a tool call, with the tool output as the observation"""
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": "You are a Company Research Specialist."},
+            {"role": "user", "content": f"Observation: {tool_output}"}
+        ],
+        "temperature": 0.2
+    }
+
+
+def test_fingerprint_ignores_key_order():
+    assert LLMRecorder.fingerprint("openai", {"a": 1, "b": [1, 2]}) == \
+        LLMRecorder.fingerprint("openai", {"b": [1, 2], "a": 1})
+
+
+def test_record_then_replay_through_the_company_tool(service, tmp_path, monkeypatch):
+    path = str(tmp_path / "recordings.db")
+
+    # Record: the tool goes out to Perplexity, and the agent call after it is stored
+    recorder = LLMRecorder(LLMRecorder.RECORD, path)
+    monkeypatch.setattr(http_transport, "get_recorder", lambda: recorder)
+    calls = []
+    monkeypatch.setattr(service.transport, "_send_chat_completion", live_perplexity(calls))
+    recorded_output = service.get_company_intelligence(industry="retail", geography="California")
+    recorder.call("openai", agent_request(recorded_output), lambda: "Final Answer: []")
+    assert len(calls) == 1
+
+    # Replay in a fresh run: nothing may go out, and every call must be found
+    recorder = LLMRecorder(LLMRecorder.REPLAY, path)
+    monkeypatch.setattr(http_transport, "get_recorder", lambda: recorder)
+    service.cache = ResultCache("test_companies_replay", InMemoryCacheBackend(), 3600)
+
+    def no_network(payload):
+        raise AssertionError("replay must not call Perplexity")
+    monkeypatch.setattr(service.transport, "_send_chat_completion", no_network)
+    replayed_output = service.get_company_intelligence(industry="retail", geography="California")
+
+    assert replayed_output == recorded_output
+    assert json.loads(replayed_output)["companies"] == COMPANIES
+    answer = recorder.call("openai", agent_request(replayed_output), lambda: pytest.fail("went live"))
+    assert answer == "Final Answer: []"
+    assert recorder.stats()["replayed"] == 2
+
+
+def test_replay_miss_raises(tmp_path):
+    recorder = LLMRecorder(LLMRecorder.REPLAY, str(tmp_path / "recordings.db"))
+    with pytest.raises(RecordingNotFoundError):
+        recorder.call("openai", agent_request("{}"), lambda: "live")
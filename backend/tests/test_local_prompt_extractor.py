@@ -0,0 +1,93 @@
+import pytest
+import sys
+import os
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+from services.local_prompt_extractor import LocalPromptExtractor
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    return LocalPromptExtractor()
+
+
+@pytest.mark.parametrize("prompt, expected", [
+    (
+        "retail startups using AI in California",
+        {"industry": "retail", "company_stage": "startup", "geography": "California",
+         "funding_stage": "", "product": "AI"}
+    ),
+    (
+        "Find healthcare startups focused on telemedicine in Texas at seed stage",
+        {"industry": "healthcare", "company_stage": "startup", "geography": "Texas",
+         "funding_stage": "seed", "product": "telemedicine"}
+    ),
+    (
+        "Find Series A fintech startups in New York using blockchain for payments",
+        {"industry": "fintech", "company_stage": "startup", "geography": "New York",
+         "funding_stage": "series a", "product": "blockchain for payments"}
+    ),
+    (
+        "healthcare companies focused on telemedicine, in Texas",
+        {"industry": "healthcare", "company_stage": "", "geography": "Texas",
+         "funding_stage": "", "product": "telemedicine"}
+    ),
+    (
+        "Series B healthcare companies in Boston using AI for radiology in the US",
+        {"industry": "healthcare", "company_stage": "", "geography": "Boston",
+         "funding_stage": "series b", "product": "AI for radiology"}
+    ),
+    (
+        "fintech startups using AI for fraud detection in an APAC market",
+        {"industry": "fintech", "company_stage": "startup", "geography": "APAC",
+         "funding_stage": "", "product": "AI for fraud detection"}
+    ),
+])
+def test_product_stops_where_other_fields_start(extractor, prompt, expected):
+    fields, confidence = extractor.extract(prompt)
+    assert fields == expected
+    assert confidence == 1.0
+
+
+@pytest.mark.parametrize("prompt", [
+    "retail startups in California that are not seed funded",
+    "fintech firms not in California",
+    "healthcare startups in Europe except the UK",
+    "SaaS companies excluding enterprises",
+    "retail startups outside California",
+    "fintech startups with no Series A",
+    "retail companies that aren't using AI",
+])
+def test_negated_criteria_go_to_the_llm(extractor, prompt):
+    _, confidence = extractor.extract(prompt)
+    assert confidence == 0.0
+
+
+def test_no_code_is_not_a_negation(extractor):
+    _, confidence = extractor.extract("retail startups using no-code tools in California")
+    assert confidence == 1.0
+
+
+def test_product_keeps_prepositions_without_another_field(extractor):
+    fields, _ = extractor.extract("Find retail companies interested in AI in customer analytics")
+    assert fields["product"] == "AI in customer analytics"
+    assert fields["geography"] == ""
+
+
+def test_location_phrase_ends_product_for_unknown_place(extractor):
+    fields, confidence = extractor.extract("fintech startups focused on fraud detection based in Tulsa")
+    assert fields["product"] == "fraud detection"
+    # "Tulsa" is not in a gazetteer, so the prompt is not fully explained
+    assert confidence < 1.0
+
+
+def test_field_hit_inside_product_lowers_confidence(extractor):
+    fields, confidence = extractor.extract("SaaS companies focused on growing revenue")
+    assert fields["product"] == "growing revenue"
+    assert confidence < 1.0
+
+
+def test_missing_industry_scores_zero(extractor):
+    _, confidence = extractor.extract("companies using AI in California")
+    assert confidence == 0.0
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+import pytest
+import sys
+import os
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+from utils.deadline import Deadline, DeadlineExceededError, request_deadline
+from utils.single_flight import AsyncSingleFlight, SingleFlight
+
+
+def start_leader(flight, key, fn):
+    thread = threading.Thread(target=lambda: _swallow(flight.do, key, fn))
+    thread.start()
+    time.sleep(0.05)
+    return thread
+
+
+def _swallow(call, *args):
+    try:
+        call(*args)
+    except Exception:
+        pass
+
+
+def test_follower_shares_the_leader_result():
+    flight = SingleFlight()
+    calls = []
+    leader = start_leader(flight, "k", lambda: calls.append(1) or time.sleep(0.2) or "result")
+    assert flight.do_shared("k", lambda: calls.append(2) or "own") == ("result", True)
+    leader.join()
+    assert calls == [1]
+
+
+def test_follower_gets_the_leader_error():
+    flight = SingleFlight()
+
+    def fail():
+        time.sleep(0.2)
+        raise ValueError("upstream")
+    leader = start_leader(flight, "k", fail)
+    with pytest.raises(ValueError):
+        flight.do("k", lambda: "own")
+    leader.join()
+
+
+def test_follower_wait_is_bounded_by_its_deadline():
+    flight = SingleFlight()
+    leader = start_leader(flight, "k", lambda: time.sleep(1))
+    started = time.monotonic()
+    with request_deadline(Deadline(0.2)), pytest.raises(DeadlineExceededError):
+        flight.do("k", lambda: "own")
+    assert time.monotonic() - started < 0.5
+    leader.join()
+
+
+def test_follower_reruns_when_the_leader_hit_its_own_deadline():
+    flight = SingleFlight()
+
+    def leader_deadline():
+        time.sleep(0.2)
+        raise DeadlineExceededError("leader deadline")
+    leader = start_leader(flight, "k", leader_deadline)
+    with request_deadline(Deadline(5)):
+        assert flight.do_shared("k", lambda: "own") == ("own", False)
+    leader.join()
+
+
+def test_async_follower_shares_and_reruns_after_leader_deadline():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fetch(result, error=None):
+        calls.append(result)
+        await asyncio.sleep(0.1)
+        if error:
+            raise error
+        return result
+
+    async def main():
+        shared = await asyncio.gather(
+            flight.do_shared("k", lambda: fetch("first")),
+            flight.do_shared("k", lambda: fetch("second"))
+        )
+        leader = asyncio.ensure_future(flight.do_shared("j", lambda: fetch("late", DeadlineExceededError("x"))))
+        await asyncio.sleep(0)
+        rerun = await flight.do_shared("j", lambda: fetch("rerun"))
+        with pytest.raises(DeadlineExceededError):
+            await leader
+        return shared, rerun
+
+    shared, rerun = asyncio.run(main())
+    assert shared == [("first", False), ("first", True)]
+    assert rerun == ("rerun", False)
+    assert calls == ["first", "late", "rerun"]
+
+
+def test_async_follower_reruns_when_the_leader_is_cancelled():
+    flight = AsyncSingleFlight()
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do_shared("k", lambda: asyncio.sleep(1, "leader")))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do_shared("k", lambda: asyncio.sleep(0.05, "own")))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == ("own", False)
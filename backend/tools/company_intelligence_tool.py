@@ -1,5 +1,5 @@
 from crewai.tools import BaseTool
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, List, Optional
 from pydantic import Field, ConfigDict
 import sys
 import os
@@ -9,6 +9,7 @@ parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 from services.company_research_service import CompanyIntelligenceService
+from utils.metrics import time_stage
 
 class CompanyIntelligenceTool(BaseTool):
     model_config = ConfigDict(arbitrary_types_allowed=True)
@@ -20,6 +21,10 @@ class CompanyIntelligenceTool(BaseTool):
         "Returns detailed company information including description, headquarters, funding status, and more."
     )
     service: CompanyIntelligenceService = Field(default_factory=CompanyIntelligenceService)
+    # Receives each company found; streamed companies as soon as they have been parsed
+    on_company: Optional[Callable[[Dict[str, Any]], None]] = None
+    # Selects the companies that still need analysis; the rest are left out of the result
+    company_filter: Optional[Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]] = None
 
     def _run(
         self, 
@@ -66,8 +71,11 @@ class CompanyIntelligenceTool(BaseTool):
                 )
 
             # Perform the company intelligence search
-            result = self.service.get_company_intelligence(**clean_params)
-            
+            with time_stage("tool", self.name):
+                result = self.service.get_company_intelligence(**clean_params, on_company=self.on_company)
+
+            if self.company_filter:
+                result = self._filter_companies(result)
             return result
             
         except Exception as e:
@@ -81,6 +89,20 @@ class CompanyIntelligenceTool(BaseTool):
                 }
             }
 
+    def _filter_companies(self, result: str) -> str:
+        """Drop companies that company_filter does not select from the search result"""
+        data = json.loads(result)
+        companies = data.get("companies") or []
+        selected = self.company_filter(companies)
+        if len(selected) < len(companies):
+            data["companies"] = selected
+            data["total_companies"] = len(selected)
+            data["note"] = (
+                f"{len(companies) - len(selected)} companies were analyzed in earlier searches "
+                "and are omitted; analyze only the companies listed here"
+            )
+        return json.dumps(data, indent=2)
+
     def _format_result(self, result: str) -> Dict[str, Any]:
         """Format the result for better readability"""
         try:
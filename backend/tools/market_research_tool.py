@@ -1,6 +1,8 @@
 from crewai.tools import BaseTool
-from typing import Dict, Any, Optional
-from pydantic import Field, ConfigDict
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Any, List, Optional
+from pydantic import Field, ConfigDict, PrivateAttr
 import sys
 import os
 
@@ -11,6 +13,12 @@ if parent_dir not in sys.path:
 
 # Import the Market Research Service
 from services.market_research_service import MarketResearchService
+from services.market_report_index import get_report_index, company_query, format_chunks
+from utils.metrics import time_stage
+from utils.deadline import DeadlineExceededError, call_timeout
+
+# Shared by all tool instances; prefetches are I/O bound Perplexity calls
+_prefetch_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="market-prefetch")
 
 class MarketResearchTool(BaseTool):
     model_config = ConfigDict(arbitrary_types_allowed=True)
@@ -22,6 +30,38 @@ class MarketResearchTool(BaseTool):
         "Returns detailed market insights as a string."
     )
     service: MarketResearchService = Field(default_factory=MarketResearchService)
+    # Returns the companies found so far; when there are any, the report is
+    # cut down to the chunks that match each company instead of returned whole
+    companies: Optional[Callable[[], List[Dict[str, Any]]]] = None
+    top_k: int = 3
+    chunk_words: int = 120
+    _prefetched: Dict[str, Future] = PrivateAttr(default_factory=dict)
+
+    def prefetch(self, industry: Optional[str] = None, product: Optional[str] = None) -> None:
+        """
+        Start market research in the background so a later _run with the
+        same parameters returns without waiting on Perplexity.
+        
+        Args:
+            industry (str, optional): The target industry
+            product (str, optional): Specific product or technology
+        """
+        if not industry and not product:
+            return
+        key = self._prefetch_key(industry, product)
+        if key not in self._prefetched:
+            # Copy the context so the call keeps the request's rate limiter priority
+            self._prefetched[key] = _prefetch_executor.submit(
+                contextvars.copy_context().run,
+                self.service.generate_market_research, industry=industry, product=product
+            )
+
+    def clear_prefetched(self) -> None:
+        """Forget prefetched results, e.g. before the tool is reused for another run"""
+        self._prefetched.clear()
+
+    def _prefetch_key(self, industry: Optional[str], product: Optional[str]) -> str:
+        return self.service._normalize_query(self.service._build_search_query(industry, product))
 
     def _run(
         self, 
@@ -45,12 +85,70 @@ class MarketResearchTool(BaseTool):
                 "(industry or product)"
             )
 
+        with time_stage("tool", self.name):
+            report = self.get_report(industry, product)
+            companies = [
+                company for company in (self.companies() if self.companies else [])
+                if isinstance(company, dict)
+            ]
+            return self.relevant_excerpts(report, companies) if companies else report
+
+    def get_report(self, industry: Optional[str] = None, product: Optional[str] = None) -> str:
+        """
+        Return the full market report, from the prefetch when one was started
+
+        Waiting on the prefetch is bounded by the request deadline. A prefetch
+        that failed is retried synchronously; running out of time returns an
+        error message like the service does.
+        """
+        # Use the prefetched report when one was started for these parameters
+        prefetched = self._prefetched.get(self._prefetch_key(industry, product))
+        if prefetched is not None:
+            try:
+                return prefetched.result(timeout=call_timeout(None, "market research prefetch"))
+            except (FutureTimeoutError, DeadlineExceededError) as e:
+                return f"An error occurred while generating insights: {str(e) or 'market research timed out'}"
+            except Exception as e:
+                print(f"Market research prefetch failed, fetching again: {str(e)}")
+
         # Perform market research
         return self.service.generate_market_research(
             industry=industry, 
             product=product
         )
 
+    def search_report(self, report: str, query: str) -> List[Dict[str, str]]:
+        """Top report chunks for a query, from the report's cached BM25 index"""
+        return get_report_index(report, self.chunk_words).search(query, self.top_k)
+
+    def relevant_excerpts(self, report: str, companies: List[Dict[str, Any]]) -> str:
+        """
+        Cut the report down to the chunks relevant to each company
+
+        Chunks shared by several companies are listed once and referenced by
+        number. Falls back to the full report when nothing matches.
+        """
+        numbered = {}
+        matches = []
+        for company in companies:
+            name = company.get("name") or company.get("company_name") or "Unknown company"
+            numbers = []
+            for chunk in self.search_report(report, company_query(company) or name):
+                key = (chunk["section"], chunk["text"])
+                if key not in numbered:
+                    numbered[key] = (len(numbered) + 1, chunk)
+                numbers.append(str(numbered[key][0]))
+            matches.append(f"- {name}: {', '.join(numbers) if numbers else 'no specific excerpt'}")
+        if not numbered:
+            return report
+
+        ordered = sorted(numbered.values(), key=lambda item: item[0])
+        return (
+            "Market research excerpts relevant to the companies found:\n"
+            + format_chunks([chunk for _, chunk in ordered], [number for number, _ in ordered])
+            + "\n\nExcerpts per company:\n" + "\n".join(matches)
+        )
+
 if __name__ == "__main__":
     # Example usage
     tool = MarketResearchTool()
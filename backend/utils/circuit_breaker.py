@@ -0,0 +1,150 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+import sys
+import os
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+from utils.envutils import EnvUtils
+from utils.metrics import CIRCUIT_BREAKER_REJECTIONS, CIRCUIT_BREAKER_TRANSITIONS
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one upstream endpoint and model
+
+    After failure_threshold failures in a row the circuit opens and calls
+    fail fast with CircuitOpenError. Once recovery_seconds have passed a
+    single trial call is let through (half-open): success closes the
+    circuit, failure opens it for another recovery period.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_seconds: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.rejected = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> None:
+        """
+        Reserve a call
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with its trial call in flight
+        """
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.recovery_seconds:
+                self._transition(self.HALF_OPEN)
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            self.rejected += 1
+            retry_in = max(self.recovery_seconds - (time.monotonic() - self.opened_at), 0.0)
+        CIRCUIT_BREAKER_REJECTIONS.labels(circuit=self.name).inc()
+        raise CircuitOpenError(
+            f"Circuit {self.name} is open after {self.consecutive_failures} failures, retry in {retry_in:.0f}s"
+        )
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+            if self.state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold
+            ):
+                self.opened_at = time.monotonic()
+                self._transition(self.OPEN)
+
+    def release(self) -> None:
+        """End a reserved call that neither succeeded nor failed, e.g. a 429 or a deadline cut"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls are being rejected"""
+        with self._lock:
+            return self.state == self.OPEN and time.monotonic() - self.opened_at < self.recovery_seconds
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "rejected": self.rejected,
+                "failure_threshold": self.failure_threshold,
+                "recovery_seconds": self.recovery_seconds
+            }
+
+    def _transition(self, state: str) -> None:
+        """Caller must hold the lock"""
+        print(f"Circuit {self.name}: {self.state} -> {state}")
+        self.state = state
+        CIRCUIT_BREAKER_TRANSITIONS.labels(circuit=self.name, state=state).inc()
+
+
+_breakers: Dict[str, Optional[CircuitBreaker]] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(endpoint: str, model: str) -> Optional[CircuitBreaker]:
+    """
+    Return the shared breaker for an endpoint/model pair
+
+    Configured by CIRCUIT_BREAKER_ENABLED, CIRCUIT_FAILURE_THRESHOLD and
+    CIRCUIT_RECOVERY_SECONDS.
+
+    Args:
+        endpoint (str): Upstream endpoint, e.g. "perplexity:/chat/completions"
+        model (str): Model name
+
+    Returns:
+        CircuitBreaker or None: None when circuit breaking is disabled
+    """
+    name = f"{endpoint}:{model}"
+    with _breakers_lock:
+        if name in _breakers:
+            return _breakers[name]
+
+        config = EnvUtils().get_config({
+            'CIRCUIT_BREAKER_ENABLED': 'true',
+            'CIRCUIT_FAILURE_THRESHOLD': 5,
+            'CIRCUIT_RECOVERY_SECONDS': 30
+        })
+        breaker = CircuitBreaker(
+            name,
+            failure_threshold=int(config['CIRCUIT_FAILURE_THRESHOLD']),
+            recovery_seconds=float(config['CIRCUIT_RECOVERY_SECONDS'])
+        ) if str(config['CIRCUIT_BREAKER_ENABLED']).lower() == 'true' else None
+        _breakers[name] = breaker
+        return breaker
+
+
+def circuit_breaker_stats() -> Dict[str, Dict[str, Any]]:
+    """State of every breaker created in this process"""
+    with _breakers_lock:
+        breakers = [breaker for breaker in _breakers.values() if breaker]
+    return {breaker.name: breaker.stats() for breaker in breakers}
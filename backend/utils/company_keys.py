@@ -0,0 +1,62 @@
+import re
+from typing import Optional
+from urllib.parse import urlsplit
+
+# Legal-form suffixes that do not distinguish one company from another
+COMPANY_SUFFIXES = {
+    "inc", "incorporated", "llc", "ltd", "limited", "corp", "corporation",
+    "co", "company", "plc", "gmbh", "ag", "sa", "bv", "pvt", "pte", "lp", "llp"
+}
+
+
+def normalize_text(value: Optional[str]) -> str:
+    """Lower-case a value and collapse whitespace; None becomes ''"""
+    return " ".join(str(value).lower().split()) if value is not None else ""
+
+
+def normalize_domain(website: Optional[str]) -> str:
+    """
+    Reduce a website to its bare domain
+
+    "https://www.Instacart.com/about" and "www.instacart.com" both become
+    "instacart.com". Returns '' for empty or unparseable values.
+
+    Args:
+        website (str): Website as written by the LLM or search results
+
+    Returns:
+        str: Lower-cased domain without scheme, "www.", port or path
+    """
+    website = normalize_text(website)
+    if not website:
+        return ""
+    if "://" not in website:
+        website = "//" + website
+    try:
+        host = urlsplit(website).hostname or ""
+    except ValueError:
+        return ""
+    if host.startswith("www."):
+        host = host[len("www."):]
+    return host if "." in host else ""
+
+
+def normalize_company_name(name: Optional[str]) -> str:
+    """
+    Reduce a company name to a comparison key
+
+    Punctuation, a leading "the" and legal-form suffixes are dropped, so
+    "Instacart, Inc." and "instacart" share a key.
+
+    Args:
+        name (str): Company name
+
+    Returns:
+        str: Lower-cased words joined by single spaces
+    """
+    words = re.sub(r"[^\w\s]", " ", normalize_text(name).replace("&", " and ")).split()
+    if words and words[0] == "the":
+        words = words[1:]
+    while len(words) > 1 and words[-1] in COMPANY_SUFFIXES:
+        words = words[:-1]
+    return " ".join(words)
@@ -0,0 +1,183 @@
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+# Sentence end followed by the start of the next sentence
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+# Short "Label: value" lines carry facts (website, funding, ...) and are never shortened
+_FACT_LINE = re.compile(r"^[\w /&()-]{1,40}:\s*\S.{0,80}$")
+
+
+def _dump_json(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def estimate_text_tokens(text: str) -> int:
+    """Rough token count of a text, ~4 characters per token like the rate limiters"""
+    return (len(text) + 3) // 4
+
+
+class ContextCompactor:
+    """
+    Shrinks upstream task outputs to a token budget before they are injected
+    into the next task's prompt
+
+    Dedupe and trim always run; the later steps only run while the text is
+    still over budget:
+        1. dedupe: paragraphs repeated within or across outputs are kept once
+        2. trim: markdown decoration, separators and blank lines are dropped,
+                 JSON is re-serialized without indentation
+        3. summarize: long paragraphs are cut to their leading sentences,
+                      three, then two, then one
+        4. truncate: every paragraph is cut in proportion to its length, so no
+                     company drops out of the context entirely; JSON loses
+                     whole trailing items instead, so it still parses
+    """
+
+    def __init__(self, budget_tokens: int):
+        """
+        Args:
+            budget_tokens (int): Token budget for the compacted context; 0 means
+                                 no budget (dedupe and trim only)
+        """
+        self.budget_tokens = budget_tokens
+
+    def compact(self, texts: List[str]) -> Tuple[str, int, int]:
+        """
+        Compact upstream outputs into one context
+
+        Args:
+            texts (list): Upstream outputs, in the order they should appear
+
+        Returns:
+            tuple: (compacted text, tokens before, tokens after)
+        """
+        tokens_before = estimate_text_tokens("\n\n".join(texts))
+        seen = set()
+        sections = []
+        for text in texts:
+            paragraphs = []
+            for paragraph in self._paragraphs(self._trim(text or "")):
+                key = re.sub(r"[\W_]+", " ", paragraph.lower()).strip()
+                if key and key not in seen:
+                    seen.add(key)
+                    paragraphs.append(paragraph)
+            if paragraphs:
+                sections.append(paragraphs)
+
+        if self._over_budget(sections):
+            for sentences in (3, 2, 1):
+                sections = [[self._lead(paragraph, sentences) for paragraph in section] for section in sections]
+                if not self._over_budget(sections):
+                    break
+        if self._over_budget(sections):
+            sections = self._truncate(sections)
+
+        compacted = self._join(sections)
+        return compacted, tokens_before, estimate_text_tokens(compacted)
+
+    def _over_budget(self, sections: List[List[str]]) -> bool:
+        return bool(self.budget_tokens) and estimate_text_tokens(self._join(sections)) > self.budget_tokens
+
+    @staticmethod
+    def _join(sections: List[List[str]]) -> str:
+        return "\n\n".join("\n\n".join(section) for section in sections)
+
+    @staticmethod
+    def _trim(text: str) -> str:
+        stripped = text.replace("```json", "").replace("```", "").strip()
+        try:
+            return _dump_json(json.loads(stripped))
+        except ValueError:
+            pass
+        lines = []
+        for line in stripped.splitlines():
+            line = re.sub(r"\*\*|__", "", line)
+            line = re.sub(r"^#+\s*", "", line)
+            line = re.sub(r"[ \t]+", " ", line).strip()
+            if re.fullmatch(r"[-=*_]{3,}", line):
+                line = ""
+            lines.append(line)
+        return "\n".join(lines)
+
+    @staticmethod
+    def _paragraphs(text: str) -> List[str]:
+        return [paragraph.strip() for paragraph in re.split(r"\n\s*\n", text) if paragraph.strip()]
+
+    @staticmethod
+    def _lead(paragraph: str, sentences: int) -> str:
+        """Keep the first sentences of each prose line; fact lines and JSON stay whole"""
+        if paragraph.startswith(("[", "{")):
+            return paragraph
+        lines = []
+        for line in paragraph.splitlines():
+            if not _FACT_LINE.match(line):
+                line = " ".join(_SENTENCE_END.split(line)[:sentences])
+            lines.append(line)
+        return "\n".join(lines)
+
+    def _truncate(self, sections: List[List[str]]) -> List[List[str]]:
+        total = sum(len(paragraph) for section in sections for paragraph in section)
+        # Leave room for the paragraph separators and ellipses
+        separators = 5 * sum(len(section) for section in sections)
+        ratio = max(self.budget_tokens * 4 - separators, 0) / total if total else 1.0
+        truncated = []
+        for section in sections:
+            paragraphs = []
+            for paragraph in section:
+                limit = int(len(paragraph) * ratio)
+                if limit < len(paragraph) and paragraph.startswith(("[", "{")):
+                    paragraph = self._truncate_json(paragraph, limit)
+                if limit < len(paragraph):
+                    cut = paragraph[:limit].rsplit(" ", 1)[0] if " " in paragraph[:limit] else paragraph[:limit]
+                    paragraph = cut + "..." if cut else ""
+                if paragraph:
+                    paragraphs.append(paragraph)
+            truncated.append(paragraphs)
+        return truncated
+
+    @classmethod
+    def _truncate_json(cls, paragraph: str, limit: int) -> str:
+        """Cut a JSON paragraph to limit characters by whole items; other text is returned as is"""
+        try:
+            value = json.loads(paragraph)
+        except ValueError:
+            return paragraph
+        kept = cls._drop_trailing_items(value, limit)
+        return _dump_json(kept) if kept is not None else ""
+
+    @classmethod
+    def _drop_trailing_items(cls, value: Any, limit: int) -> Optional[Any]:
+        """
+        Largest leading part of a JSON value that serializes to at most limit
+        characters: trailing array elements and object members are dropped,
+        and a first item that is too long on its own is cut the same way
+
+        Returns:
+            The cut value, or None if not even its first item fits
+        """
+        if len(_dump_json(value)) <= limit:
+            return value
+        if isinstance(value, list):
+            items, build = value, list
+        elif isinstance(value, dict):
+            items, build = list(value.items()), dict
+        else:
+            return None
+
+        kept = []
+        for item in items:
+            if len(_dump_json(build(kept + [item]))) <= limit:
+                kept.append(item)
+                continue
+            if not kept:
+                if isinstance(value, list):
+                    first = cls._drop_trailing_items(item, limit - 2)
+                    kept = [first] if first is not None else []
+                else:
+                    key, member = item
+                    overhead = len(_dump_json({key: None})) - len("null")
+                    first = cls._drop_trailing_items(member, limit - overhead)
+                    kept = [(key, first)] if first is not None else []
+            break
+        return build(kept) if kept else None
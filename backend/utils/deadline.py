@@ -0,0 +1,94 @@
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when work is started or still running after its request deadline"""
+
+
+class Deadline:
+    """Point in time by which a research request must be answered"""
+
+    def __init__(self, seconds: float):
+        """
+        Args:
+            seconds (float): Time budget from now
+        """
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left, never negative"""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self, what: str = "request") -> None:
+        """
+        Raises:
+            DeadlineExceededError: If the deadline has passed
+        """
+        if self.expired:
+            raise DeadlineExceededError(f"{what} exceeded its {self.seconds:g}s deadline")
+
+    def timeout(self, default: Optional[float] = None, what: str = "request") -> float:
+        """
+        Timeout for one blocking call: the remaining time, capped at default
+
+        Raises:
+            DeadlineExceededError: If the deadline has passed
+        """
+        self.check(what)
+        remaining = self.remaining()
+        return min(default, remaining) if default is not None else remaining
+
+
+_request_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+
+@contextmanager
+def request_deadline(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """
+    Run the enclosed block under a deadline; None runs it without one
+
+    Like the rate limiter priority, work handed to other threads keeps the
+    deadline only if it is submitted through contextvars.copy_context().run.
+    """
+    token = _request_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _request_deadline.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _request_deadline.get()
+
+
+def call_timeout(default: Optional[float] = None, what: str = "request") -> Optional[float]:
+    """
+    Timeout for one blocking call under the current deadline
+
+    Args:
+        default (float, optional): Timeout to use without a deadline, and the cap with one
+        what (str): Name of the call, for the error message
+
+    Returns:
+        float or None: default when no deadline is set
+
+    Raises:
+        DeadlineExceededError: If the current deadline has passed
+    """
+    deadline = current_deadline()
+    return deadline.timeout(default, what) if deadline else default
+
+
+def check_deadline(what: str = "request") -> None:
+    """Raise DeadlineExceededError if the current deadline has passed"""
+    deadline = current_deadline()
+    if deadline:
+        deadline.check(what)
@@ -0,0 +1,150 @@
+import asyncio
+import contextvars
+import threading
+from collections import deque
+from concurrent.futures import Executor, FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import sys
+import os
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+# Hedged calls are I/O bound; the losing call of a pair finishes in the background.
+# Callers with their own concurrency limit (e.g. a connection pool) pass an
+# executor sized to match instead of sharing this one
+_hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+
+
+class LatencyTracker:
+    """Latencies of the most recent successful calls, for percentile-based hedge delays"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float, min_samples: int = 20) -> Optional[float]:
+        """
+        Returns:
+            float or None: The pct-th percentile latency, or None with fewer than min_samples samples
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples or len(samples) < min_samples:
+            return None
+        return samples[min(int(len(samples) * pct / 100), len(samples) - 1)]
+
+
+_trackers: Dict[str, LatencyTracker] = {}
+_trackers_lock = threading.Lock()
+
+
+def get_latency_tracker(name: str) -> LatencyTracker:
+    with _trackers_lock:
+        if name not in _trackers:
+            _trackers[name] = LatencyTracker()
+        return _trackers[name]
+
+
+def _succeeded(outcome, is_success: Optional[Callable[[Any], bool]]) -> bool:
+    """Whether a finished future or task returned a result that counts as success"""
+    return outcome.exception() is None and (is_success is None or is_success(outcome.result()))
+
+
+def _fallback(primary, hedge) -> Any:
+    """
+    Outcome of a hedged pair where neither call succeeded: a returned result
+    (e.g. an error response the caller can inspect) before an exception, the
+    primary's before the hedge's
+    """
+    for outcome in (primary, hedge):
+        if outcome.exception() is None:
+            return outcome.result()
+    return primary.result()
+
+
+def hedged_call(call: Callable[[], Any], delay: Optional[float],
+                is_success: Optional[Callable[[Any], bool]] = None,
+                executor: Optional[Executor] = None) -> Tuple[Any, Optional[str]]:
+    """
+    Run call; if it has not returned after delay seconds, start a second
+    identical call and return whichever succeeds first
+
+    A call succeeds when it returns without raising and its result passes
+    is_success, so a fast error response does not beat a slower good one.
+    The losing call is left to finish in the background. Both calls run with
+    a copy of the caller's context, so they keep its deadline and priority.
+    The delay is counted from when the primary starts running, so time spent
+    queued for a worker does not trigger a hedge.
+
+    Args:
+        call (callable): Idempotent zero-argument call
+        delay (float, optional): Seconds before hedging; None calls once, inline
+        is_success (callable, optional): Predicate on a returned result;
+                                         None accepts every result
+        executor (Executor, optional): Pool running both calls; defaults to a
+                                       shared 32-worker pool
+
+    Returns:
+        tuple: (result, winner) where winner is None if no second call was
+               started, "primary" or "hedge" for the call that succeeded, or
+               "neither" when both failed and the fallback outcome is returned
+
+    Raises:
+        Exception: The primary's error when both calls raised
+    """
+    if delay is None:
+        return call(), None
+
+    executor = executor or _hedge_executor
+    started = threading.Event()
+
+    def run_primary():
+        started.set()
+        return call()
+    primary = executor.submit(contextvars.copy_context().run, run_primary)
+    started.wait()
+    done, _ = wait([primary], timeout=delay)
+    if done:
+        return primary.result(), None
+
+    hedge = executor.submit(contextvars.copy_context().run, call)
+    pending = {primary, hedge}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if _succeeded(future, is_success):
+                return future.result(), "hedge" if future is hedge else "primary"
+    return _fallback(primary, hedge), "neither"
+
+
+async def ahedged_call(call: Callable[[], Awaitable[Any]], delay: Optional[float],
+                       is_success: Optional[Callable[[Any], bool]] = None) -> Tuple[Any, Optional[str]]:
+    """Async variant of hedged_call; the losing call is cancelled"""
+    if delay is None:
+        return await call(), None
+
+    primary = asyncio.ensure_future(call())
+    tasks = [primary]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done:
+            return primary.result(), None
+
+        hedge = asyncio.ensure_future(call())
+        tasks.append(hedge)
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if _succeeded(task, is_success):
+                    return task.result(), "hedge" if task is hedge else "primary"
+        return _fallback(primary, hedge), "neither"
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
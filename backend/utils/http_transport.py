@@ -0,0 +1,507 @@
+import asyncio
+import json
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, Optional
+import httpx
+import sys
+import os
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+from utils.envutils import EnvUtils
+from utils.rate_limiter import get_rate_limiter, estimate_tokens
+from utils.metrics import time_stage, PERPLEXITY_RESPONSES, PERPLEXITY_RETRIES, PERPLEXITY_HEDGES
+from utils.llm_recorder import get_recorder
+from utils.deadline import DeadlineExceededError, call_timeout, check_deadline, current_deadline
+from utils.circuit_breaker import get_circuit_breaker
+from utils.hedging import get_latency_tracker, hedged_call, ahedged_call
+
+# Circuit breakers and latency trackers are kept per endpoint and model
+_ENDPOINT = "perplexity:/chat/completions"
+
+
+def _http2_available() -> bool:
+    """httpx only speaks HTTP/2 when the optional h2 package is installed"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+@contextmanager
+def _deadline_errors() -> Iterator[None]:
+    """Report a timeout caused by the request deadline as DeadlineExceededError"""
+    try:
+        yield
+    except httpx.TimeoutException as e:
+        deadline = current_deadline()
+        if deadline and deadline.expired:
+            raise DeadlineExceededError("Perplexity call was cut off by the request deadline") from e
+        raise
+
+
+class PerplexityTransport:
+    """
+    Shared, connection-pooled HTTP client for the Perplexity API
+
+    One instance per process so every service reuses the same keep-alive
+    connections instead of paying a TLS handshake per call.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        """
+        Singleton implementation so all services share one connection pool
+        """
+        with cls._lock:
+            if not cls._instance:
+                cls._instance = super(PerplexityTransport, cls).__new__(cls)
+                cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        """
+        Create the pooled client on first use
+
+        Configuration (environment):
+            PERPLEXITY_BASE_URL: API base URL
+            PERPLEXITY_POOL_SIZE: Maximum open connections
+            PERPLEXITY_KEEPALIVE_CONNECTIONS: Idle connections kept alive
+            PERPLEXITY_CONNECT_TIMEOUT / PERPLEXITY_READ_TIMEOUT: Seconds; both are
+                cut to the time left when a request deadline is set
+            PERPLEXITY_HTTP2: Use HTTP/2 when available ("true"/"false")
+            PERPLEXITY_MAX_429_RETRIES: Retries after a rate-limit response
+            PERPLEXITY_MAX_RETRIES: Retries after a transport error or 5xx response
+            PERPLEXITY_RETRY_BACKOFF_SECONDS / PERPLEXITY_RETRY_MAX_BACKOFF_SECONDS:
+                Base and cap of the jittered exponential retry backoff
+            PERPLEXITY_HEDGE_ENABLED: Duplicate non-streaming calls that run past
+                the PERPLEXITY_HEDGE_PERCENTILE latency of recent calls, once
+                PERPLEXITY_HEDGE_MIN_SAMPLES calls have been seen
+        """
+        with self.__class__._lock:
+            if self._initialized:
+                return
+
+            env_utils = EnvUtils()
+            self.api_key = env_utils.get_required_env('PERPLEXITY_API_KEY')
+            config = env_utils.get_config({
+                'PERPLEXITY_BASE_URL': 'https://api.perplexity.ai',
+                'PERPLEXITY_POOL_SIZE': 20,
+                'PERPLEXITY_KEEPALIVE_CONNECTIONS': 10,
+                'PERPLEXITY_CONNECT_TIMEOUT': 10,
+                'PERPLEXITY_READ_TIMEOUT': 120,
+                'PERPLEXITY_HTTP2': 'true',
+                'PERPLEXITY_MAX_429_RETRIES': 2,
+                'PERPLEXITY_MAX_RETRIES': 2,
+                'PERPLEXITY_RETRY_BACKOFF_SECONDS': 0.5,
+                'PERPLEXITY_RETRY_MAX_BACKOFF_SECONDS': 8,
+                'PERPLEXITY_HEDGE_ENABLED': 'false',
+                'PERPLEXITY_HEDGE_PERCENTILE': 95,
+                'PERPLEXITY_HEDGE_MIN_SAMPLES': 20
+            })
+            self.max_rate_limit_retries = int(config['PERPLEXITY_MAX_429_RETRIES'])
+            self.max_retries = int(config['PERPLEXITY_MAX_RETRIES'])
+            self.max_attempts = max(self.max_rate_limit_retries, self.max_retries) + 1
+            self.retry_backoff = float(config['PERPLEXITY_RETRY_BACKOFF_SECONDS'])
+            self.retry_max_backoff = float(config['PERPLEXITY_RETRY_MAX_BACKOFF_SECONDS'])
+            self.hedge_enabled = str(config['PERPLEXITY_HEDGE_ENABLED']).lower() == 'true'
+            self.hedge_percentile = float(config['PERPLEXITY_HEDGE_PERCENTILE'])
+            self.hedge_min_samples = int(config['PERPLEXITY_HEDGE_MIN_SAMPLES'])
+            self.base_url = config['PERPLEXITY_BASE_URL']
+            # A primary and its hedge each hold a connection, so one worker per
+            # connection keeps hedged calls from queueing behind each other
+            self.hedge_executor = ThreadPoolExecutor(
+                max_workers=int(config['PERPLEXITY_POOL_SIZE']), thread_name_prefix="perplexity-hedge"
+            )
+            self.limits = httpx.Limits(
+                max_connections=int(config['PERPLEXITY_POOL_SIZE']),
+                max_keepalive_connections=int(config['PERPLEXITY_KEEPALIVE_CONNECTIONS'])
+            )
+            self.timeout = httpx.Timeout(
+                float(config['PERPLEXITY_READ_TIMEOUT']),
+                connect=float(config['PERPLEXITY_CONNECT_TIMEOUT'])
+            )
+            self.http2 = str(config['PERPLEXITY_HTTP2']).lower() == 'true' and _http2_available()
+            self.headers = {
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            }
+
+            self.client = httpx.Client(
+                base_url=self.base_url,
+                headers=self.headers,
+                http2=self.http2,
+                limits=self.limits,
+                timeout=self.timeout
+            )
+            # httpx async clients are bound to the event loop that created them
+            self._async_clients = weakref.WeakKeyDictionary()
+            self._initialized = True
+
+    def chat_completion(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        POST a chat completion request
+
+        Args:
+            payload (dict): Request body (model, messages, ...)
+
+        Returns:
+            dict: Decoded JSON response
+
+        Raises:
+            httpx.HTTPError: On transport errors or non-2xx responses
+            CircuitOpenError: If the model's circuit is open
+            RecordingNotFoundError: In replay mode for unrecorded requests
+        """
+        recorder = get_recorder()
+        if recorder:
+            return recorder.call("perplexity", payload, lambda: self._send_chat_completion(payload))
+        return self._send_chat_completion(payload)
+
+    def _send_chat_completion(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        model = payload.get("model", "")
+        limiter = get_rate_limiter("perplexity", model)
+        breaker = get_circuit_breaker(_ENDPOINT, model)
+        tokens = estimate_tokens(payload.get("messages", []), payload.get("max_tokens"))
+        tracker = get_latency_tracker(f"{_ENDPOINT}:{model}")
+
+        def post() -> httpx.Response:
+            if limiter:
+                limiter.acquire(tokens)
+            started = time.monotonic()
+            with time_stage("perplexity_http", model), _deadline_errors():
+                response = self.client.post("/chat/completions", json=payload, timeout=self._request_timeout())
+            PERPLEXITY_RESPONSES.labels(model=model, status=response.status_code).inc()
+            if response.is_success:
+                tracker.record(time.monotonic() - started)
+            return response
+
+        for attempt in range(self.max_attempts):
+            if breaker:
+                breaker.allow()
+            response, error = None, None
+            try:
+                response, winner = hedged_call(
+                    post, self._hedge_delay(tracker), lambda r: r.is_success, self.hedge_executor
+                )
+                if winner:
+                    PERPLEXITY_HEDGES.labels(model=model, winner=winner).inc()
+            except httpx.TransportError as e:
+                error = e
+            except Exception:
+                if breaker:
+                    breaker.release()
+                raise
+            delay = self._after_attempt(breaker, limiter, model, response, error, attempt)
+            if delay is None:
+                break
+            if delay:
+                time.sleep(call_timeout(delay, "Perplexity retry"))
+        if error is not None:
+            raise error
+        response.raise_for_status()
+        return response.json()
+
+    async def achat_completion(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Async variant of chat_completion, pooled per event loop
+
+        Args:
+            payload (dict): Request body (model, messages, ...)
+
+        Returns:
+            dict: Decoded JSON response
+
+        Raises:
+            httpx.HTTPError: On transport errors or non-2xx responses
+            CircuitOpenError: If the model's circuit is open
+            RecordingNotFoundError: In replay mode for unrecorded requests
+        """
+        recorder = get_recorder()
+        if recorder:
+            return await recorder.acall("perplexity", payload, lambda: self._asend_chat_completion(payload))
+        return await self._asend_chat_completion(payload)
+
+    async def _asend_chat_completion(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        model = payload.get("model", "")
+        limiter = get_rate_limiter("perplexity", model)
+        breaker = get_circuit_breaker(_ENDPOINT, model)
+        tokens = estimate_tokens(payload.get("messages", []), payload.get("max_tokens"))
+        tracker = get_latency_tracker(f"{_ENDPOINT}:{model}")
+
+        async def post() -> httpx.Response:
+            if limiter:
+                # to_thread copies the context, so the request priority carries over
+                await asyncio.to_thread(limiter.acquire, tokens)
+            started = time.monotonic()
+            with time_stage("perplexity_http", model), _deadline_errors():
+                response = await self._get_async_client().post(
+                    "/chat/completions", json=payload, timeout=self._request_timeout()
+                )
+            PERPLEXITY_RESPONSES.labels(model=model, status=response.status_code).inc()
+            if response.is_success:
+                tracker.record(time.monotonic() - started)
+            return response
+
+        for attempt in range(self.max_attempts):
+            if breaker:
+                breaker.allow()
+            response, error = None, None
+            try:
+                response, winner = await ahedged_call(post, self._hedge_delay(tracker), lambda r: r.is_success)
+                if winner:
+                    PERPLEXITY_HEDGES.labels(model=model, winner=winner).inc()
+            except httpx.TransportError as e:
+                error = e
+            except BaseException:
+                if breaker:
+                    breaker.release()
+                raise
+            delay = self._after_attempt(breaker, limiter, model, response, error, attempt)
+            if delay is None:
+                break
+            if delay:
+                await asyncio.sleep(call_timeout(delay, "Perplexity retry"))
+        if error is not None:
+            raise error
+        response.raise_for_status()
+        return response.json()
+
+    def stream_chat_completion(self, payload: Dict[str, Any]) -> Iterator[str]:
+        """
+        POST a streaming chat completion request
+
+        Streams are retried and circuit broken like other calls, but never
+        hedged, and not retried once content has been yielded.
+
+        Args:
+            payload (dict): Request body (model, messages, ...); stream is set here
+
+        Yields:
+            str: Pieces of the response content as they arrive. Recorded and
+                 replayed calls yield the whole content at once.
+
+        Raises:
+            httpx.HTTPError: On transport errors or non-2xx responses
+            CircuitOpenError: If the model's circuit is open
+            RecordingNotFoundError: In replay mode for unrecorded requests
+        """
+        payload = {**payload, "stream": True}
+        recorder = get_recorder()
+        if recorder:
+            yield recorder.call("perplexity", payload, lambda: "".join(self._send_stream(payload)))
+            return
+        yield from self._send_stream(payload)
+
+    def _send_stream(self, payload: Dict[str, Any]) -> Iterator[str]:
+        model = payload.get("model", "")
+        limiter = get_rate_limiter("perplexity", model)
+        breaker = get_circuit_breaker(_ENDPOINT, model)
+        tokens = estimate_tokens(payload.get("messages", []), payload.get("max_tokens"))
+        for attempt in range(self.max_attempts):
+            if breaker:
+                breaker.allow()
+            streaming = False
+            try:
+                if limiter:
+                    limiter.acquire(tokens)
+                with time_stage("perplexity_http", model), _deadline_errors():
+                    with self.client.stream("POST", "/chat/completions", json=payload,
+                                            timeout=self._request_timeout()) as response:
+                        PERPLEXITY_RESPONSES.labels(model=model, status=response.status_code).inc()
+                        if response.is_success:
+                            if breaker:
+                                breaker.record_success()
+                            streaming = True
+                            yield from self._stream_content(response.iter_lines())
+                            return
+                        response.read()
+                        delay = self._after_attempt(breaker, limiter, model, response, None, attempt)
+                        if delay is None:
+                            response.raise_for_status()
+            except httpx.TransportError as e:
+                if streaming:
+                    raise
+                delay = self._after_attempt(breaker, limiter, model, None, e, attempt)
+                if delay is None:
+                    raise
+            except Exception:
+                if breaker:
+                    breaker.release()
+                raise
+            if delay:
+                time.sleep(call_timeout(delay, "Perplexity retry"))
+
+    async def astream_chat_completion(self, payload: Dict[str, Any]) -> AsyncIterator[str]:
+        """Async variant of stream_chat_completion"""
+        payload = {**payload, "stream": True}
+        recorder = get_recorder()
+        if recorder:
+            async def collect():
+                return "".join([chunk async for chunk in self._asend_stream(payload)])
+            yield await recorder.acall("perplexity", payload, collect)
+            return
+        async for chunk in self._asend_stream(payload):
+            yield chunk
+
+    async def _asend_stream(self, payload: Dict[str, Any]) -> AsyncIterator[str]:
+        model = payload.get("model", "")
+        limiter = get_rate_limiter("perplexity", model)
+        breaker = get_circuit_breaker(_ENDPOINT, model)
+        tokens = estimate_tokens(payload.get("messages", []), payload.get("max_tokens"))
+        for attempt in range(self.max_attempts):
+            if breaker:
+                breaker.allow()
+            streaming = False
+            try:
+                if limiter:
+                    await asyncio.to_thread(limiter.acquire, tokens)
+                with time_stage("perplexity_http", model), _deadline_errors():
+                    async with self._get_async_client().stream("POST", "/chat/completions", json=payload,
+                                                               timeout=self._request_timeout()) as response:
+                        PERPLEXITY_RESPONSES.labels(model=model, status=response.status_code).inc()
+                        if response.is_success:
+                            if breaker:
+                                breaker.record_success()
+                            streaming = True
+                            async for line in response.aiter_lines():
+                                # Read timeouts apply per chunk, so a trickling stream is stopped here
+                                check_deadline("Perplexity stream")
+                                content = self._stream_delta(line)
+                                if content:
+                                    yield content
+                            return
+                        await response.aread()
+                        delay = self._after_attempt(breaker, limiter, model, response, None, attempt)
+                        if delay is None:
+                            response.raise_for_status()
+            except httpx.TransportError as e:
+                if streaming:
+                    raise
+                delay = self._after_attempt(breaker, limiter, model, None, e, attempt)
+                if delay is None:
+                    raise
+            except BaseException:
+                if breaker:
+                    breaker.release()
+                raise
+            if delay:
+                await asyncio.sleep(call_timeout(delay, "Perplexity retry"))
+
+    @classmethod
+    def _stream_content(cls, lines: Iterable[str]) -> Iterator[str]:
+        for line in lines:
+            # Read timeouts apply per chunk, so a trickling stream is stopped here
+            check_deadline("Perplexity stream")
+            content = cls._stream_delta(line)
+            if content:
+                yield content
+
+    @staticmethod
+    def _stream_delta(line: str) -> Optional[str]:
+        """Content of one server-sent event line, or None for anything else"""
+        if not line.startswith("data:"):
+            return None
+        data = line[len("data:"):].strip()
+        if not data or data == "[DONE]":
+            return None
+        choices = json.loads(data).get("choices") or []
+        if not choices:
+            return None
+        return (choices[0].get("delta") or {}).get("content")
+
+    def _after_attempt(self, breaker, limiter, model: str, response: Optional[httpx.Response],
+                       error: Optional[Exception], attempt: int) -> Optional[float]:
+        """
+        Record an attempt's outcome on the circuit breaker and decide on a retry
+
+        A 429 pauses the shared limiter for Retry-After seconds and is neither
+        a success nor a failure for the breaker. Transport errors and 5xx
+        responses count as failures and are retried with full-jitter
+        exponential backoff.
+
+        Returns:
+            float or None: Seconds to wait before retrying (0 when the limiter
+                           already holds the retry back), or None if the
+                           response or error should be returned as-is
+        """
+        if response is not None and response.status_code == 429:
+            if breaker:
+                breaker.release()
+            if attempt >= self.max_rate_limit_retries:
+                return None
+            try:
+                retry_after = float(response.headers.get("retry-after", 1))
+            except ValueError:
+                retry_after = 1.0
+            print(f"Perplexity rate limited, retrying in {retry_after}s")
+            PERPLEXITY_RETRIES.labels(model=model, reason="rate_limited").inc()
+            if limiter:
+                limiter.penalize(retry_after)
+                return 0.0
+            # Spread callers that were limited together
+            return retry_after + random.uniform(0, retry_after / 2)
+
+        failed = error is not None or response.status_code >= 500
+        if breaker:
+            if failed:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+        if not failed or attempt >= self.max_retries:
+            return None
+        delay = random.uniform(0, min(self.retry_max_backoff, self.retry_backoff * 2 ** attempt))
+        reason = type(error).__name__ if error is not None else f"HTTP {response.status_code}"
+        print(f"Perplexity call failed ({reason}), retrying in {delay:.2f}s")
+        PERPLEXITY_RETRIES.labels(model=model, reason="error").inc()
+        return delay
+
+    def _hedge_delay(self, tracker) -> Optional[float]:
+        """Seconds after which a call gets a duplicate, or None when hedging is off or has too few samples"""
+        if not self.hedge_enabled:
+            return None
+        return tracker.percentile(self.hedge_percentile, self.hedge_min_samples)
+
+    def _request_timeout(self) -> httpx.Timeout:
+        """
+        The configured timeouts, cut to the time left before the request deadline
+
+        Raises:
+            DeadlineExceededError: If the deadline has already passed
+        """
+        deadline = current_deadline()
+        if deadline is None:
+            return self.timeout
+        remaining = deadline.timeout(what="Perplexity call")
+        return httpx.Timeout(min(self.timeout.read, remaining), connect=min(self.timeout.connect, remaining))
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                http2=self.http2,
+                limits=self.limits,
+                timeout=self.timeout
+            )
+            self._async_clients[loop] = client
+        return client
+
+    def close(self) -> None:
+        """Close pooled connections"""
+        self.client.close()
+
+    async def aclose(self) -> None:
+        """Close the async pool of the running event loop"""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
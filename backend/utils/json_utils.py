@@ -0,0 +1,152 @@
+import ast
+import json
+import re
+from typing import Any, List
+
+
+def strip_code_fences(text: str) -> str:
+    """
+    Remove markdown code block markers that LLMs wrap around JSON
+
+    Args:
+        text (str): Raw LLM output
+
+    Returns:
+        str: Output without ``` / ```json markers, stripped of whitespace
+    """
+    return text.replace("```json", "").replace("```", "").strip()
+
+
+def parse_json_tolerant(text: str) -> Any:
+    """
+    Parse JSON produced by an LLM, repairing common defects locally
+
+    Tries, in order: plain parsing; the outermost array/object cut out of
+    surrounding prose; smart quotes and trailing commas fixed; Python literal
+    syntax (single quotes, True/None); and finally the complete items of a
+    truncated array.
+
+    Args:
+        text (str): Raw LLM output
+
+    Returns:
+        Any: Parsed JSON value
+
+    Raises:
+        ValueError: If no repair produces valid JSON
+    """
+    cleaned = strip_code_fences(text)
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError as e:
+        first_error = e
+
+    starts = [index for index in (cleaned.find("["), cleaned.find("{")) if index != -1]
+    if not starts:
+        raise ValueError(f"No JSON found in output: {first_error}")
+    start = min(starts)
+    closing = "]" if cleaned[start] == "[" else "}"
+    end = cleaned.rfind(closing)
+    candidate = cleaned[start:end + 1] if end > start else cleaned[start:]
+
+    repaired = (candidate.replace("\u201c", '"').replace("\u201d", '"')
+                .replace("\u2018", "'").replace("\u2019", "'"))
+    repaired = re.sub(r",\s*([\]}])", r"\1", repaired)
+    for attempt in (candidate, repaired):
+        try:
+            return json.loads(attempt)
+        except json.JSONDecodeError:
+            pass
+    try:
+        value = ast.literal_eval(repaired)
+        if isinstance(value, (list, dict)):
+            return value
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        pass
+
+    # Truncated output: keep the array items that did complete
+    if cleaned[start] == "[":
+        parser = JSONArrayStreamParser()
+        try:
+            items = parser.feed(cleaned[start:])
+        except json.JSONDecodeError:
+            items = []
+        if items:
+            return items
+    raise ValueError(f"Output is not valid JSON: {first_error}")
+
+
+class JSONArrayStreamParser:
+    """
+    Incremental parser for a JSON array of objects arriving in chunks
+
+    Each top-level object is returned as soon as its closing brace arrives,
+    so callers can act on the first items while the rest is still being
+    generated. Text before the opening bracket (such as a ```json fence)
+    is skipped.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._position = 0
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._item_start = None
+
+    @property
+    def finished(self) -> bool:
+        """True once the closing bracket of the array has been seen"""
+        return self._finished
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        Consume the next chunk of text
+
+        Args:
+            chunk (str): Next piece of the streamed output
+
+        Returns:
+            list: Objects completed by this chunk, in order
+
+        Raises:
+            json.JSONDecodeError: If a completed object is not valid JSON
+        """
+        self._buffer += chunk
+        items = []
+        while self._position < len(self._buffer) and not self._finished:
+            char = self._buffer[self._position]
+            if not self._started:
+                self._started = char == "["
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0:
+                    self._item_start = self._position
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0 and char == "]":
+                    self._finished = True
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        items.append(json.loads(self._buffer[self._item_start:self._position + 1]))
+                        self._item_start = None
+            self._position += 1
+
+        # Drop consumed text that no pending item needs
+        keep_from = self._item_start if self._item_start is not None else self._position
+        self._buffer = self._buffer[keep_from:]
+        self._position -= keep_from
+        if self._item_start is not None:
+            self._item_start = 0
+        return items
@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import sys
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+from utils.envutils import EnvUtils
+
+
+class RecordingNotFoundError(Exception):
+    """Raised in replay mode when a request has no recorded response"""
+
+
+class LLMRecorder:
+    """
+    Record/replay layer for outbound LLM calls
+
+    Responses are stored zlib-compressed in SQLite, keyed by a fingerprint
+    of the provider and the request body. Modes:
+        record: always call the API and store the response
+        replay: serve stored responses only; a missing one raises
+                RecordingNotFoundError
+        replay_or_record: serve stored responses and record the misses
+    """
+
+    RECORD = "record"
+    REPLAY = "replay"
+    REPLAY_OR_RECORD = "replay_or_record"
+
+    def __init__(self, mode: str, path: str, replay_latency: str = "0"):
+        """
+        Args:
+            mode (str): record, replay or replay_or_record
+            path (str): SQLite file holding the recordings
+            replay_latency (str): Milliseconds to wait before serving a replayed
+                                  response, or "recorded" to wait as long as the
+                                  original call took
+        """
+        if mode not in (self.RECORD, self.REPLAY, self.REPLAY_OR_RECORD):
+            raise ValueError(f"Unknown LLM record mode '{mode}'")
+        self.mode = mode
+        self.path = path
+        self.replay_latency = replay_latency
+        self.replayed = 0
+        self.recorded = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_recordings ("
+                "fingerprint TEXT PRIMARY KEY, provider TEXT NOT NULL, model TEXT, "
+                "response BLOB NOT NULL, latency_ms REAL NOT NULL, recorded_at REAL NOT NULL)"
+            )
+
+    @staticmethod
+    def fingerprint(provider: str, request: Dict[str, Any]) -> str:
+        """Stable hash of a request; key order and whitespace do not matter"""
+        canonical = json.dumps({"provider": provider, "request": request},
+                               sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def call(self, provider: str, request: Dict[str, Any], send: Callable[[], Any]) -> Any:
+        """
+        Serve a request from the recordings or through send()
+
+        Args:
+            provider (str): "perplexity" or "openai"
+            request (dict): Request body; everything that affects the response
+            send (callable): Performs the real call and returns a JSON-serializable response
+
+        Returns:
+            The recorded or live response
+
+        Raises:
+            RecordingNotFoundError: In replay mode when nothing was recorded
+        """
+        fingerprint = self.fingerprint(provider, request)
+        entry = self._lookup(fingerprint)
+        if entry is not None:
+            response, delay = entry
+            if delay:
+                time.sleep(delay)
+            return response
+
+        started = time.perf_counter()
+        response = send()
+        self._store(fingerprint, provider, request, response, time.perf_counter() - started)
+        return response
+
+    async def acall(self, provider: str, request: Dict[str, Any], send: Callable[[], Awaitable[Any]]) -> Any:
+        """Async variant of call; send returns an awaitable"""
+        fingerprint = self.fingerprint(provider, request)
+        entry = await asyncio.to_thread(self._lookup, fingerprint)
+        if entry is not None:
+            response, delay = entry
+            if delay:
+                await asyncio.sleep(delay)
+            return response
+
+        started = time.perf_counter()
+        response = await send()
+        await asyncio.to_thread(
+            self._store, fingerprint, provider, request, response, time.perf_counter() - started
+        )
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stored = self._conn.execute("SELECT COUNT(*) FROM llm_recordings").fetchone()[0]
+        return {"mode": self.mode, "stored": stored, "replayed": self.replayed, "recorded": self.recorded}
+
+    def _lookup(self, fingerprint: str) -> Optional[Tuple[Any, float]]:
+        """Return (response, replay delay seconds), or None if the call must go out"""
+        if self.mode == self.RECORD:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, latency_ms FROM llm_recordings WHERE fingerprint = ?", (fingerprint,)
+            ).fetchone()
+        if row is None:
+            if self.mode == self.REPLAY:
+                raise RecordingNotFoundError(
+                    f"No recorded response for request {fingerprint[:12]} in {self.path}"
+                )
+            return None
+
+        with self._lock:
+            self.replayed += 1
+        if self.replay_latency == "recorded":
+            delay = row[1] / 1000.0
+        else:
+            delay = float(self.replay_latency) / 1000.0
+        return json.loads(zlib.decompress(row[0]).decode("utf-8")), delay
+
+    def _store(self, fingerprint: str, provider: str, request: Dict[str, Any],
+               response: Any, latency: float) -> None:
+        blob = zlib.compress(json.dumps(response, separators=(",", ":")).encode("utf-8"))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_recordings "
+                "(fingerprint, provider, model, response, latency_ms, recorded_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (fingerprint, provider, request.get("model"), blob, latency * 1000.0, time.time())
+            )
+            self.recorded += 1
+
+
+_recorder: Optional[LLMRecorder] = None
+_recorder_loaded = False
+_recorder_lock = threading.Lock()
+
+
+def get_recorder() -> Optional[LLMRecorder]:
+    """
+    Return the process-wide recorder, or None when recording is off
+
+    Configuration (environment):
+        LLM_RECORD_MODE: off, record, replay or replay_or_record
+        LLM_RECORD_PATH: SQLite file for the recordings
+        LLM_REPLAY_LATENCY: Replay delay in milliseconds, or "recorded"
+    """
+    global _recorder, _recorder_loaded
+    with _recorder_lock:
+        if not _recorder_loaded:
+            config = EnvUtils().get_config({
+                'LLM_RECORD_MODE': 'off',
+                'LLM_RECORD_PATH': os.path.join(os.path.dirname(__file__), '..', 'cache', 'llm_recordings.db'),
+                'LLM_REPLAY_LATENCY': '0'
+            })
+            mode = str(config['LLM_RECORD_MODE']).lower()
+            if mode != 'off':
+                _recorder = LLMRecorder(mode, config['LLM_RECORD_PATH'], str(config['LLM_REPLAY_LATENCY']))
+                print(f"LLM {mode} mode using {config['LLM_RECORD_PATH']}")
+            _recorder_loaded = True
+        return _recorder
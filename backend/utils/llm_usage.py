@@ -0,0 +1,170 @@
+import contextvars
+import json
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+import sys
+import os
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+from utils.envutils import EnvUtils
+
+# USD per million tokens: (prompt, cached prompt, completion)
+DEFAULT_LLM_PRICES = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4-turbo": (10.00, 10.00, 30.00),
+    "gpt-4": (30.00, 30.00, 60.00),
+    "gpt-3.5-turbo": (0.50, 0.50, 1.50)
+}
+
+_prices: Optional[Dict[str, Tuple[float, float, float]]] = None
+_agents: Dict[str, Dict[str, Any]] = {}
+_agents_lock = threading.Lock()
+
+_tracked_usage = contextvars.ContextVar("tracked_llm_usage", default=None)
+_tracked_usage_lock = threading.Lock()
+
+
+@contextmanager
+def track_llm_usage() -> Iterator[Dict[str, int]]:
+    """
+    Count the token usage of every ResearchLLM call made in the enclosed block
+
+    Like the request deadline, work handed to other threads is counted only
+    if it is submitted through contextvars.copy_context().run.
+
+    Yields:
+        dict: Running totals in the shape record_token_usage expects, updated
+              as each call returns
+    """
+    totals = {
+        "total_tokens": 0, "prompt_tokens": 0, "cached_prompt_tokens": 0,
+        "completion_tokens": 0, "successful_requests": 0
+    }
+    token = _tracked_usage.set(totals)
+    try:
+        yield totals
+    finally:
+        _tracked_usage.reset(token)
+
+
+def add_llm_usage(usage: Any) -> None:
+    """
+    Add one completion's usage to the totals of the enclosing track_llm_usage block
+
+    Args:
+        usage: The usage object of a litellm/OpenAI chat completion response
+    """
+    totals = _tracked_usage.get()
+    if totals is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    with _tracked_usage_lock:
+        totals["total_tokens"] += getattr(usage, "total_tokens", 0) or 0
+        totals["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+        totals["cached_prompt_tokens"] += getattr(details, "cached_tokens", 0) or 0
+        totals["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+        totals["successful_requests"] += 1
+
+
+def _price_table() -> Dict[str, Tuple[float, float, float]]:
+    """Default prices merged with LLM_PRICES, a JSON object of model -> [prompt, cached, completion]"""
+    global _prices
+    if _prices is None:
+        prices = dict(DEFAULT_LLM_PRICES)
+        overrides = EnvUtils().get_config({'LLM_PRICES': ''})['LLM_PRICES']
+        if overrides:
+            try:
+                prices.update({model: tuple(map(float, price)) for model, price in json.loads(overrides).items()})
+            except (ValueError, TypeError) as e:
+                print(f"Ignoring invalid LLM_PRICES: {str(e)}")
+        _prices = prices
+    return _prices
+
+
+def model_price(model: str) -> Optional[Tuple[float, float, float]]:
+    """
+    Price of a model, matched on the longest known name prefix so dated
+    snapshots ("gpt-4o-mini-2024-07-18") and provider prefixes
+    ("openai/gpt-4o") resolve to their base model
+
+    Returns:
+        tuple or None: (prompt, cached prompt, completion) USD per million tokens
+    """
+    name = model.split("/")[-1].lower()
+    prices = _price_table()
+    for known in sorted(prices, key=len, reverse=True):
+        if name.startswith(known):
+            return prices[known]
+    return None
+
+
+def llm_cost(model: str, usage: Dict[str, int]) -> Optional[float]:
+    """
+    Cost of token usage in USD
+
+    Args:
+        model (str): LLM model name
+        usage (dict): prompt_tokens (including cached ones), cached_prompt_tokens
+                      and completion_tokens
+
+    Returns:
+        float or None: None when the model has no known price
+    """
+    price = model_price(model)
+    if price is None:
+        return None
+    cached = usage.get("cached_prompt_tokens") or 0
+    prompt = max((usage.get("prompt_tokens") or 0) - cached, 0)
+    completion = usage.get("completion_tokens") or 0
+    return (prompt * price[0] + cached * price[1] + completion * price[2]) / 1_000_000
+
+
+def record_agent_usage(agent: str, model: str, usage: Dict[str, int], seconds: Optional[float] = None) -> None:
+    """
+    Add one agent run to the per-agent usage report
+
+    Args:
+        agent (str): Agent role
+        model (str): LLM model name
+        usage (dict): Token usage of the run, as passed to record_token_usage
+        seconds (float, optional): Task duration of the run
+    """
+    cost = llm_cost(model, usage)
+    with _agents_lock:
+        entry = _agents.setdefault(f"{agent}|{model}", {
+            "agent": agent, "model": model, "runs": 0, "seconds": 0.0, "requests": 0,
+            "prompt_tokens": 0, "cached_prompt_tokens": 0, "completion_tokens": 0,
+            "cost_usd": 0.0 if cost is not None else None
+        })
+        if seconds is not None:
+            entry["runs"] += 1
+            entry["seconds"] += seconds
+        entry["requests"] += usage.get("successful_requests") or 0
+        for token_type in ("prompt_tokens", "cached_prompt_tokens", "completion_tokens"):
+            entry[token_type] += usage.get(token_type) or 0
+        if cost is not None:
+            entry["cost_usd"] += cost
+
+
+def llm_usage_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Latency and cost per agent and model since the process started
+
+    Returns:
+        dict: Keyed by "agent|model"; cost_usd is None for models without a known price
+    """
+    with _agents_lock:
+        entries = {key: dict(entry) for key, entry in _agents.items()}
+    for entry in entries.values():
+        runs, cost = entry["runs"], entry["cost_usd"]
+        entry["avg_seconds_per_run"] = round(entry["seconds"] / runs, 3) if runs else None
+        entry["avg_cost_usd_per_run"] = round(cost / runs, 6) if runs and cost is not None else None
+        entry["seconds"] = round(entry["seconds"], 3)
+        entry["cost_usd"] = round(cost, 6) if cost is not None else None
+    return entries
@@ -0,0 +1,172 @@
+from typing import Dict, Optional, Tuple
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+import sys
+import os
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+from utils.result_cache import cache_stats
+from utils.rate_limiter import rate_limiter_stats
+from utils.llm_usage import llm_cost, record_agent_usage
+
+# Pipeline stages range from sub-millisecond cache hits to multi-minute crew tasks
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+STAGE_DURATION = Histogram(
+    "salessphere_stage_duration_seconds",
+    "Latency of pipeline stages",
+    ["stage", "name"],
+    buckets=_LATENCY_BUCKETS
+)
+LLM_TOKENS = Counter(
+    "salessphere_llm_tokens_total",
+    "LLM tokens used by crew agents",
+    ["agent", "model", "type"]
+)
+LLM_REQUESTS = Counter(
+    "salessphere_llm_requests_total",
+    "Successful LLM requests made by crew agents",
+    ["agent", "model"]
+)
+LLM_COST = Counter(
+    "salessphere_llm_cost_usd_total",
+    "Estimated LLM cost in USD of crew agents, for models with a known price",
+    ["agent", "model"]
+)
+PERPLEXITY_RESPONSES = Counter(
+    "salessphere_perplexity_responses_total",
+    "Perplexity HTTP responses by status code",
+    ["model", "status"]
+)
+PERPLEXITY_RETRIES = Counter(
+    "salessphere_perplexity_retries_total",
+    "Perplexity calls retried after an error, by reason",
+    ["model", "reason"]
+)
+PERPLEXITY_HEDGES = Counter(
+    "salessphere_perplexity_hedges_total",
+    "Perplexity calls that went past the hedge delay and got a duplicate, by which call succeeded (or neither)",
+    ["model", "winner"]
+)
+CIRCUIT_BREAKER_TRANSITIONS = Counter(
+    "salessphere_circuit_breaker_transitions_total",
+    "Circuit breaker state changes",
+    ["circuit", "state"]
+)
+CIRCUIT_BREAKER_REJECTIONS = Counter(
+    "salessphere_circuit_breaker_rejections_total",
+    "Calls failed fast because their circuit was open",
+    ["circuit"]
+)
+RESEARCH_JOBS = Gauge(
+    "salessphere_research_jobs",
+    "Research jobs currently queued or running",
+    ["state"]
+)
+RESEARCH_JOBS_FINISHED = Counter(
+    "salessphere_research_jobs_finished_total",
+    "Research jobs that finished, by outcome",
+    ["status"]
+)
+OUTPUT_REASKS = Counter(
+    "salessphere_output_reasks_total",
+    "LLM calls made to correct invalid task output",
+    ["stage"]
+)
+COMPANY_INDEX_LOOKUPS = Counter(
+    "salessphere_company_index_lookups_total",
+    "Company index lookups by result: fresh analyses are reused, stale and new companies are researched",
+    ["result"]
+)
+CONTEXT_TOKENS_SAVED = Counter(
+    "salessphere_context_tokens_saved_total",
+    "Estimated prompt tokens removed by context compaction",
+    ["stage"]
+)
+RESEARCH_REQUESTS_COALESCED = Counter(
+    "salessphere_research_requests_coalesced_total",
+    "Research requests attached to an identical in-flight job"
+)
+
+
+def time_stage(stage: str, name: str):
+    """
+    Time the enclosed block into the stage latency histogram
+
+    Args:
+        stage (str): Pipeline stage, e.g. "prompt_extraction", "tool", "perplexity_http"
+        name (str): What ran within the stage, e.g. a tool or model name
+
+    Returns:
+        Context manager (also usable as a decorator)
+    """
+    return STAGE_DURATION.labels(stage=stage, name=name).time()
+
+
+def observe_stage(stage: str, name: str, seconds: Optional[float]) -> None:
+    """Record an already measured stage duration; None is ignored"""
+    if seconds is not None:
+        STAGE_DURATION.labels(stage=stage, name=name).observe(seconds)
+
+
+def record_token_usage(agent: str, model: str, usage: Dict[str, int], seconds: Optional[float] = None) -> None:
+    """
+    Add an agent's token usage and cost to the counters and the per-agent report
+
+    Args:
+        agent (str): Agent role
+        model (str): LLM model name
+        usage (dict): prompt_tokens, cached_prompt_tokens, completion_tokens and
+                      successful_requests used since the last report
+        seconds (float, optional): Duration of the task the usage belongs to
+    """
+    for token_type in ("prompt_tokens", "cached_prompt_tokens", "completion_tokens"):
+        if usage.get(token_type):
+            LLM_TOKENS.labels(agent=agent, model=model, type=token_type.replace("_tokens", "")).inc(usage[token_type])
+    if usage.get("successful_requests"):
+        LLM_REQUESTS.labels(agent=agent, model=model).inc(usage["successful_requests"])
+    cost = llm_cost(model, usage)
+    if cost:
+        LLM_COST.labels(agent=agent, model=model).inc(cost)
+    record_agent_usage(agent, model, usage, seconds)
+
+
+class _StatsCollector:
+    """Exports cache and rate limiter stats, which are computed at scrape time"""
+
+    def collect(self):
+        hits = CounterMetricFamily("salessphere_cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("salessphere_cache_misses", "Cache misses", labels=["cache"])
+        hit_ratio = GaugeMetricFamily("salessphere_cache_hit_ratio", "Cache hit ratio", labels=["cache"])
+        entries = GaugeMetricFamily("salessphere_cache_entries", "Cached entries", labels=["cache"])
+        for name, stats in cache_stats().items():
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            hit_ratio.add_metric([name], stats["hit_ratio"])
+            entries.add_metric([name], stats["size"])
+        yield from (hits, misses, hit_ratio, entries)
+
+        waiting = GaugeMetricFamily(
+            "salessphere_rate_limiter_waiting", "Calls queued at a rate limiter", labels=["limiter"]
+        )
+        wait_seconds = CounterMetricFamily(
+            "salessphere_rate_limiter_wait_seconds", "Time spent queued at a rate limiter", labels=["limiter"]
+        )
+        for name, stats in rate_limiter_stats().items():
+            waiting.add_metric([name], stats["waiting"])
+            wait_seconds.add_metric([name], stats["total_wait_seconds"])
+        yield from (waiting, wait_seconds)
+
+
+REGISTRY.register(_StatsCollector())
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Render all metrics in the Prometheus text format
+
+    Returns:
+        tuple: (body bytes, content type)
+    """
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
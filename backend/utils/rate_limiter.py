@@ -0,0 +1,214 @@
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+import sys
+import os
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+from utils.envutils import EnvUtils
+from utils.deadline import DeadlineExceededError, current_deadline
+
+# Lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+_request_priority = contextvars.ContextVar("request_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def request_priority(priority: int) -> Iterator[None]:
+    """
+    Run the enclosed block with the given rate limiter priority
+
+    Work handed to other threads keeps the priority only if it is submitted
+    through contextvars.copy_context().run.
+    """
+    token = _request_priority.set(priority)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
+def current_priority() -> int:
+    return _request_priority.get()
+
+
+def estimate_tokens(messages: List[Dict[str, Any]], max_tokens: Optional[int] = None) -> int:
+    """
+    Rough token estimate for a chat request: ~4 characters per prompt token
+    plus the completion budget
+    """
+    prompt_chars = sum(len(str(message.get("content") or "")) for message in messages)
+    return prompt_chars // 4 + (max_tokens or 500)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute token buckets with a priority queue
+
+    Callers block in acquire() until both buckets can cover the request.
+    Waiters are served strictly by (priority, arrival), so interactive calls
+    overtake queued batch calls.
+    """
+
+    def __init__(self, name: str, requests_per_minute: float, tokens_per_minute: float):
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_allowance = float(requests_per_minute)
+        self._token_allowance = float(tokens_per_minute)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+
+        self._condition = threading.Condition()
+        self._waiters: List[tuple] = []
+        self._sequence = itertools.count()
+
+        self.acquired = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def acquire(self, tokens: int = 0, priority: Optional[int] = None) -> float:
+        """
+        Block until the call may proceed
+
+        Args:
+            tokens (int): Estimated tokens the call will consume
+            priority (int, optional): Queue priority; defaults to the current
+                                      request_priority context
+
+        Returns:
+            float: Seconds spent waiting
+
+        Raises:
+            DeadlineExceededError: If the request deadline passes while waiting
+        """
+        priority = current_priority() if priority is None else priority
+        deadline = current_deadline()
+        # A single call larger than the whole bucket would otherwise wait forever
+        tokens = min(tokens, self.tokens_per_minute)
+        ticket = (priority, next(self._sequence))
+        started = time.monotonic()
+
+        with self._condition:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    self._refill()
+                    wait = self._wait_time(tokens) if self._waiters[0] == ticket else 1.0
+                    if wait <= 0:
+                        self._request_allowance -= 1
+                        self._token_allowance -= tokens
+                        break
+                    if deadline is not None:
+                        if deadline.expired:
+                            raise DeadlineExceededError(
+                                f"Request deadline passed while waiting on the {self.name} rate limiter"
+                            )
+                        wait = min(wait, deadline.remaining())
+                    self._condition.wait(wait)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+            waited = time.monotonic() - started
+            self.acquired += 1
+            self.total_wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        return waited
+
+    def penalize(self, retry_after: float) -> None:
+        """Stop handing out capacity for retry_after seconds, e.g. after a 429"""
+        with self._condition:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            self._request_allowance = min(self._request_allowance, 0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue-wait metrics"""
+        with self._condition:
+            return {
+                "requests_per_minute": self.requests_per_minute,
+                "tokens_per_minute": self.tokens_per_minute,
+                "waiting": len(self._waiters),
+                "acquired": self.acquired,
+                "total_wait_seconds": round(self.total_wait_seconds, 3),
+                "avg_wait_seconds": round(self.total_wait_seconds / self.acquired, 3) if self.acquired else 0.0,
+                "max_wait_seconds": round(self.max_wait_seconds, 3)
+            }
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._request_allowance = min(
+            max(float(self.requests_per_minute), 1.0),
+            self._request_allowance + elapsed * self.requests_per_minute / 60.0
+        )
+        self._token_allowance = min(
+            float(self.tokens_per_minute),
+            self._token_allowance + elapsed * self.tokens_per_minute / 60.0
+        )
+
+    def _wait_time(self, tokens: int) -> float:
+        """Seconds until both buckets can cover the call (<= 0 means now)"""
+        now = time.monotonic()
+        if self._blocked_until > now:
+            return self._blocked_until - now
+        request_wait = (1 - self._request_allowance) * 60.0 / self.requests_per_minute
+        token_wait = (tokens - self._token_allowance) * 60.0 / self.tokens_per_minute
+        return max(request_wait, token_wait, 0.0)
+
+
+_limiters: Dict[str, Optional[RateLimiter]] = {}
+_limiters_lock = threading.Lock()
+
+_DEFAULT_LIMITS = {
+    "perplexity": {"RPM": 50, "TPM": 200000},
+    "openai": {"RPM": 500, "TPM": 150000}
+}
+
+
+def get_rate_limiter(provider: str, model: str) -> Optional[RateLimiter]:
+    """
+    Return the shared limiter for a provider/model pair
+
+    Limits come from <PROVIDER>_RPM and <PROVIDER>_TPM and apply to each
+    model separately. A limit of 0 disables limiting for that provider.
+
+    Args:
+        provider (str): "perplexity" or "openai"
+        model (str): Model name
+
+    Returns:
+        RateLimiter or None: None when limiting is disabled
+    """
+    name = f"{provider}:{model}"
+    with _limiters_lock:
+        if name in _limiters:
+            return _limiters[name]
+
+        prefix = provider.upper()
+        defaults = _DEFAULT_LIMITS.get(provider, {"RPM": 60, "TPM": 100000})
+        config = EnvUtils().get_config({
+            f'{prefix}_RPM': defaults["RPM"],
+            f'{prefix}_TPM': defaults["TPM"]
+        })
+        rpm = float(config[f'{prefix}_RPM'])
+        tpm = float(config[f'{prefix}_TPM'])
+        limiter = RateLimiter(name, rpm, tpm) if rpm > 0 and tpm > 0 else None
+        _limiters[name] = limiter
+        return limiter
+
+
+def rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats for every active limiter in this process"""
+    with _limiters_lock:
+        limiters = [limiter for limiter in _limiters.values() if limiter]
+    return {limiter.name: limiter.stats() for limiter in limiters}
@@ -0,0 +1,386 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+import sys
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+from utils.envutils import EnvUtils
+from utils.single_flight import SingleFlight
+
+
+class CacheBackend(ABC):
+    """
+    Storage interface for ResultCache
+
+    Entries are (value, stored_at) pairs where stored_at is a Unix timestamp.
+    Backends are responsible for LRU ordering and enforcing their size cap.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: str, stored_at: float) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """Process-local LRU backend"""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: str, stored_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """On-disk LRU backend, shared across processes and restarts"""
+
+    def __init__(self, path: str, table: str = "cache", max_entries: int = 10000):
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "stored_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{table}_last_access ON {table} (last_access)"
+            )
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute(
+                    f"UPDATE {self.table} SET last_access = ? WHERE key = ?",
+                    (time.time(), key)
+                )
+            return (row[0], row[1]) if row else None
+
+    def set(self, key: str, value: str, stored_at: float) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, stored_at, time.time())
+            )
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+class ResultCache:
+    """
+    TTL cache on top of a pluggable backend, with hit/miss counters
+    """
+
+    def __init__(self, name: str, backend: CacheBackend, ttl_seconds: float):
+        self.name = name
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.stale_fallbacks = 0
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def make_key(**criteria: Any) -> str:
+        """
+        Build a cache key from search criteria
+
+        Values are lower-cased with whitespace collapsed, and empty values
+        are dropped, so "Retail " and "retail" share an entry.
+        """
+        normalized = {}
+        for name, value in criteria.items():
+            if value is None:
+                continue
+            value = " ".join(str(value).lower().split())
+            if value:
+                normalized[name] = value
+        return json.dumps(normalized, sort_keys=True)
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return the cached value, or None if missing or older than the TTL
+
+        Expired entries stay in the backend until evicted, as a fallback for
+        get_stale while the upstream is unavailable.
+        """
+        entry = self.backend.get(key)
+        if entry is not None and time.time() - entry[1] > self.ttl_seconds:
+            entry = None
+        self._record(entry is not None)
+        return entry[0] if entry else None
+
+    def get_stale(self, key: str) -> Optional[Tuple[str, float]]:
+        """
+        Return a cached value regardless of its age, e.g. while the upstream
+        is failing
+
+        Returns:
+            tuple or None: (value, age in seconds)
+        """
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+        with self._stats_lock:
+            self.stale_fallbacks += 1
+        return entry[0], time.time() - entry[1]
+
+    def set(self, key: str, value: str) -> None:
+        self.backend.set(key, value, time.time())
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stale_fallbacks": self.stale_fallbacks,
+            "size": len(self.backend),
+            "ttl_seconds": self.ttl_seconds
+        }
+
+    def _record(self, hit: bool) -> None:
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+class StaleWhileRevalidateCache(ResultCache):
+    """
+    ResultCache that keeps serving entries past their freshness window
+
+    Entries younger than fresh_seconds are served as-is. Older entries (up to
+    the hard TTL) are still served immediately while a background thread
+    reloads them, so callers only wait on a cold miss.
+    """
+
+    def __init__(self, name: str, backend: CacheBackend, ttl_seconds: float, fresh_seconds: float):
+        super().__init__(name, backend, ttl_seconds)
+        self.fresh_seconds = fresh_seconds
+        self.stale_hits = 0
+        self.refreshes = 0
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        # Concurrent cold misses for one key share a single load
+        self._loads = SingleFlight()
+
+    def get_or_load(self, key: str, loader: Callable[[], str]) -> str:
+        """
+        Return the cached value for key, loading it on a miss
+
+        Args:
+            key (str): Cache key
+            loader (callable): Produces a fresh value; exceptions propagate on a
+                               cold miss and are logged during background refreshes
+
+        Returns:
+            str: Cached or freshly loaded value
+        """
+        value = self.lookup(key, loader)
+        if value is None:
+            value = self._loads.do(key, lambda: self._load_and_store(key, loader))
+        return value
+
+    def _load_and_store(self, key: str, loader: Callable[[], str]) -> str:
+        value = loader()
+        self.set(key, value)
+        return value
+
+    def lookup(self, key: str, refresh: Callable[[], str]) -> Optional[str]:
+        """
+        Return the cached value without loading on a miss
+
+        Stale entries are returned and refreshed in the background with
+        refresh. Callers that get None must load and set the value themselves,
+        which lets async callers await their own loader.
+        """
+        entry = self.backend.get(key)
+        age = time.time() - entry[1] if entry else None
+        if entry is None or age > self.ttl_seconds:
+            self._record(False)
+            return None
+
+        self._record(True)
+        if age > self.fresh_seconds:
+            with self._stats_lock:
+                self.stale_hits += 1
+            self._refresh_in_background(key, refresh)
+        return entry[0]
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats.update({
+            "stale_hits": self.stale_hits,
+            "refreshes": self.refreshes,
+            "fresh_seconds": self.fresh_seconds
+        })
+        return stats
+
+    def _refresh_in_background(self, key: str, loader: Callable[[], str]) -> None:
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.set(key, loader())
+                with self._stats_lock:
+                    self.refreshes += 1
+            except Exception as e:
+                print(f"Background refresh of {self.name} entry failed: {e}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name=f"{self.name}-refresh", daemon=True).start()
+
+
+_caches: Dict[str, ResultCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(name: str, env_prefix: str, default_ttl_seconds: int = 86400,
+              default_max_entries: int = 1000, default_backend: str = 'memory',
+              default_fresh_seconds: Optional[int] = None) -> ResultCache:
+    """
+    Return the process-wide cache with the given name, creating it on first use
+
+    Configuration is read from environment variables prefixed with env_prefix:
+    <PREFIX>_BACKEND ("memory" or "sqlite"), <PREFIX>_TTL_SECONDS,
+    <PREFIX>_MAX_ENTRIES and <PREFIX>_PATH (SQLite file). Caches created with
+    a freshness window are stale-while-revalidate caches and also read
+    <PREFIX>_FRESH_SECONDS.
+
+    Args:
+        name (str): Cache name, also used as the SQLite table name
+        env_prefix (str): Prefix of the configuration variables
+        default_ttl_seconds (int): TTL when not configured
+        default_max_entries (int): Size cap when not configured
+        default_backend (str): Backend when not configured
+        default_fresh_seconds (int, optional): Freshness window; when set a
+                                               StaleWhileRevalidateCache is created
+
+    Returns:
+        ResultCache: The shared cache instance
+    """
+    with _caches_lock:
+        if name in _caches:
+            return _caches[name]
+
+        config = EnvUtils().get_config({
+            f'{env_prefix}_BACKEND': default_backend,
+            f'{env_prefix}_TTL_SECONDS': default_ttl_seconds,
+            f'{env_prefix}_MAX_ENTRIES': default_max_entries,
+            f'{env_prefix}_PATH': os.path.join(os.path.dirname(__file__), '..', 'cache', 'salessphere_cache.db'),
+            f'{env_prefix}_FRESH_SECONDS': default_fresh_seconds
+        })
+        max_entries = int(config[f'{env_prefix}_MAX_ENTRIES'])
+        backend_type = str(config[f'{env_prefix}_BACKEND']).lower()
+        if backend_type == 'sqlite':
+            backend = SQLiteCacheBackend(config[f'{env_prefix}_PATH'], table=name, max_entries=max_entries)
+        elif backend_type == 'memory':
+            backend = InMemoryCacheBackend(max_entries=max_entries)
+        else:
+            raise ValueError(f"Unknown cache backend '{backend_type}' for {env_prefix}_BACKEND")
+
+        ttl_seconds = float(config[f'{env_prefix}_TTL_SECONDS'])
+        if config[f'{env_prefix}_FRESH_SECONDS'] is not None:
+            cache = StaleWhileRevalidateCache(
+                name, backend, ttl_seconds, float(config[f'{env_prefix}_FRESH_SECONDS'])
+            )
+        else:
+            cache = ResultCache(name, backend, ttl_seconds)
+        _caches[name] = cache
+        return cache
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats for every cache created in this process"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {cache.name: cache.stats() for cache in caches}
+
+
+def clear_caches() -> None:
+    """Empty every cache created in this process, e.g. between benchmark runs"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    for cache in caches:
+        cache.backend.clear()
@@ -0,0 +1,162 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+import sys
+import os
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+from utils.deadline import DeadlineExceededError, call_timeout, current_deadline
+
+
+def _leader_deadline_only(error: BaseException) -> bool:
+    """True if a leader's error was its own deadline while the caller still has time"""
+    if not isinstance(error, DeadlineExceededError):
+        return False
+    deadline = current_deadline()
+    return deadline is None or not deadline.expired
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key into one execution
+
+    The first caller runs the function; callers arriving while it runs wait
+    and receive the same result (or exception). Waiting is bounded by the
+    caller's request deadline, and a follower whose leader ran out of its own
+    deadline runs the function itself. Nothing is remembered once the call
+    finishes, so this complements a cache rather than replacing it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn for key unless an identical call is already in flight
+
+        Args:
+            key: Identity of the call
+            fn (callable): Zero-argument function producing the result
+
+        Returns:
+            Any: Result of fn, possibly computed by another thread
+        """
+        return self.do_shared(key, fn)[0]
+
+    def do_shared(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Like do, but also report whether the result came from another caller's run
+
+        Followers get the result without fn's side effects, so callers that
+        rely on them (e.g. progress callbacks) can replay them.
+
+        Returns:
+            tuple: (result, shared) where shared is True if this caller waited
+                   on another caller's run instead of running fn itself
+
+        Raises:
+            DeadlineExceededError: If the caller's deadline passes while it waits
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = _Call()
+                    self._calls[key] = call
+            if leader:
+                break
+
+            if not call.done.wait(call_timeout(None, "waiting for an identical call")):
+                raise DeadlineExceededError("Identical call did not finish before the request deadline")
+            if call.error is None:
+                return call.result, True
+            if not _leader_deadline_only(call.error):
+                raise call.error
+            # The leader ran out of its own time; try again, as leader if nobody else is
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines: concurrent awaits of the same key on one
+    event loop share one execution. Waiting is bounded by the caller's
+    request deadline; a follower whose leader ran out of its own deadline or
+    was cancelled runs the function itself.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], asyncio.Future] = {}
+
+    async def do_shared(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Await fn() for key unless an identical call is already in flight
+
+        Args:
+            key: Identity of the call
+            fn (callable): Zero-argument function returning the awaitable to run
+
+        Returns:
+            tuple: (result, shared) where shared is True if this caller waited
+                   on another caller's run instead of running fn itself
+
+        Raises:
+            DeadlineExceededError: If the caller's deadline passes while it waits
+        """
+        # Futures belong to one loop, so calls on different loops never coalesce
+        loop = asyncio.get_running_loop()
+        call_key = (loop, key)
+        while call_key in self._calls:
+            call = self._calls[call_key]
+            try:
+                # Shielded, so a follower timing out does not cancel the leader's result
+                result = await asyncio.wait_for(
+                    asyncio.shield(call), call_timeout(None, "waiting for an identical call")
+                )
+            except DeadlineExceededError as e:
+                # Checked first: it is a TimeoutError too
+                if not _leader_deadline_only(e):
+                    raise
+            except asyncio.TimeoutError:
+                raise DeadlineExceededError("Identical call did not finish before the request deadline")
+            except asyncio.CancelledError:
+                if not call.cancelled():
+                    raise
+            else:
+                return result, True
+
+        call = loop.create_future()
+        # Retrieve the error even when nobody waited on it, so asyncio does not log it
+        call.add_done_callback(lambda future: future.cancelled() or future.exception())
+        self._calls[call_key] = call
+        try:
+            result = await fn()
+            call.set_result(result)
+            return result, False
+        except asyncio.CancelledError:
+            call.cancel()
+            raise
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        finally:
+            del self._calls[call_key]
@@ -1,24 +1,45 @@
 # src/services/api.js
 const API_URL = 'http://localhost:8000'
+const POLL_INTERVAL_MS = 2000
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms))
+
+const fetchJson = async (url, options = {}) => {
+  const response = await fetch(url, {
+    ...options,
+    headers: {
+      'Content-Type': 'application/json',
+      'Accept': 'application/json'
+    }
+  })
+
+  if (!response.ok) {
+    throw new Error('API request failed')
+  }
+
+  return await response.json()
+}
 
 export const searchLeads = async (query) => {
   try {
-    const response = await fetch(`${API_URL}/research`, {
+    // Research runs in the background; poll the job until it finishes
+    let job = await fetchJson(`${API_URL}/research`, {
       method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-        'Accept': 'application/json'
-      },
       body: JSON.stringify({ query })
     })
 
-    if (!response.ok) {
-      throw new Error('API request failed')
+    while (job.status === 'queued' || job.status === 'running') {
+      await sleep(POLL_INTERVAL_MS)
+      job = await fetchJson(`${API_URL}/research/${job.job_id}`)
+    }
+
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Research job failed')
     }
 
-    return await response.json()
+    return job.result
   } catch (error) {
     console.error('API Error:', error)
     throw error
   }
-}
\ No newline at end of file
+}